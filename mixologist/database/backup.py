@@ -0,0 +1,271 @@
+"""Stream the recipe and image stores to and from gzip-compressed NDJSON.
+
+``export`` writes ``recipes.ndjson.gz`` (from Postgres) and
+``images.ndjson.gz`` (from MongoDB, GridFS images included) into a
+directory, one JSON object per line, reading in batches so memory stays
+bounded however large the stores are. Each file is written under a
+temporary name and renamed when complete.
+
+``import`` loads those files into another node with bulk inserts. Cache keys
+that already exist are skipped, never overwritten. Progress is recorded in
+``import.checkpoint.json`` next to the files after every batch, so an
+interrupted import resumes where it stopped; pass ``--restart`` to ignore it.
+
+Usage:
+    python -m mixologist.database.backup export BACKUP_DIR [--only recipes|images] [--batch-size 200]
+    python -m mixologist.database.backup import BACKUP_DIR [--only recipes|images] [--batch-size 200] [--restart]
+"""
+import argparse
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .config import get_db_session, get_mongo_collection
+from .service import DatabaseService
+from ..services.image_cache_service import build_image_storage_fields, delete_gridfs_blob, read_image_bytes
+
+logger = logging.getLogger(__name__)
+
+DATASETS = ("recipes", "images")
+CHECKPOINT_FILE = "import.checkpoint.json"
+
+# Fields rebuilt from the image bytes on import, or specific to the source node
+IMAGE_EXPORT_SKIP_FIELDS = {
+    "_id", "data", "gridfs_id", "b64_data", "content_type", "byte_size", "width", "height",
+    "hit_count", "last_accessed_at",
+}
+
+
+def backup_path(backup_dir: str, dataset: str) -> str:
+    return os.path.join(backup_dir, f"{dataset}.ndjson.gz")
+
+
+async def write_ndjson(path: str, records: AsyncIterator[Dict[str, Any]]) -> int:
+    """Write records as gzip-compressed NDJSON, replacing ``path`` only once complete."""
+    tmp_path = f"{path}.tmp"
+    count = 0
+    try:
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            async for record in records:
+                f.write(json.dumps(record, default=str))
+                f.write("\n")
+                count += 1
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def read_ndjson_batches(path: str, batch_size: int, skip: int = 0) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """Yield ``(lines_read, batch)`` from a gzip NDJSON file, after skipping ``skip`` lines."""
+    lines_read = 0
+    batch = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            lines_read += 1
+            if lines_read <= skip or not line.strip():
+                continue
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield lines_read, batch
+                batch = []
+    if batch or lines_read > skip:
+        yield lines_read, batch
+
+
+def load_checkpoint(backup_dir: str) -> Dict[str, int]:
+    try:
+        with open(os.path.join(backup_dir, CHECKPOINT_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoint(backup_dir: str, checkpoint: Dict[str, int]) -> None:
+    path = os.path.join(backup_dir, CHECKPOINT_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def image_backup_entry(doc: Dict[str, Any], data: bytes) -> Dict[str, Any]:
+    """Backup line for an image document: its metadata plus base64 image bytes."""
+    entry = {key: value for key, value in doc.items() if key not in IMAGE_EXPORT_SKIP_FIELDS}
+    if isinstance(entry.get("stored_at"), datetime):
+        entry["stored_at"] = entry["stored_at"].isoformat()
+    entry["data"] = base64.b64encode(data).decode("ascii")
+    return entry
+
+
+def decode_image_backup_entry(entry: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+    """Split a backup line into document metadata and image bytes, checking the SHA-256."""
+    doc = dict(entry)
+    data = base64.b64decode(doc.pop("data"))
+    expected_sha256 = doc.pop("sha256", None)
+    if isinstance(doc.get("stored_at"), str):
+        doc["stored_at"] = datetime.fromisoformat(doc["stored_at"])
+    if expected_sha256 is not None and hashlib.sha256(data).hexdigest() != expected_sha256:
+        raise ValueError(f"SHA-256 mismatch for image {doc.get('cache_key')}")
+    return doc, data
+
+
+async def iter_recipes(batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+    after_id = 0
+    while True:
+        async with get_db_session() as session:
+            rows = await DatabaseService(session).get_recipes_after(after_id, batch_size)
+        for row in rows:
+            yield {"cache_key": row["cache_key"], "recipe_data": row["recipe_data"]}
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1]["id"]
+
+
+async def iter_images(batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+    async with get_mongo_collection() as collection:
+        cursor = collection.find({}).sort("cache_key", 1).batch_size(batch_size)
+        async for doc in cursor:
+            data = await read_image_bytes(doc)
+            if data is None:
+                logger.warning(f"Skipping image without data: {doc.get('cache_key')}")
+                continue
+            yield image_backup_entry(doc, data)
+
+
+async def export_backup(backup_dir: str, datasets=DATASETS, batch_size: int = 200) -> Dict[str, int]:
+    """Export the selected datasets into ``backup_dir``."""
+    os.makedirs(backup_dir, exist_ok=True)
+    summary = {}
+    if "recipes" in datasets:
+        summary["recipes"] = await write_ndjson(backup_path(backup_dir, "recipes"), iter_recipes(batch_size))
+    if "images" in datasets:
+        summary["images"] = await write_ndjson(backup_path(backup_dir, "images"), iter_images(batch_size))
+    # A fresh export invalidates import progress recorded against the old files
+    checkpoint = load_checkpoint(backup_dir)
+    if any(dataset in checkpoint for dataset in summary):
+        save_checkpoint(backup_dir, {k: v for k, v in checkpoint.items() if k not in summary})
+    logger.info(f"Export complete: {summary}")
+    return summary
+
+
+async def import_recipe_batch(batch: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """Insert a batch of recipes. Returns (inserted, failed)."""
+    async with get_db_session() as session:
+        inserted = await DatabaseService(session).insert_recipes(batch)
+    if inserted is None:
+        return 0, len(batch)
+    return inserted, 0
+
+
+async def import_image_batch(batch: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """Insert a batch of images that are not stored yet. Returns (inserted, failed)."""
+    failed = 0
+    async with get_mongo_collection() as collection:
+        cache_keys = [entry["cache_key"] for entry in batch]
+        existing = {
+            doc["cache_key"]
+            async for doc in collection.find({"cache_key": {"$in": cache_keys}}, projection={"cache_key": 1})
+        }
+        operations = []
+        # Operation index -> GridFS blob uploaded for it
+        uploaded = {}
+        for entry in batch:
+            if entry["cache_key"] in existing:
+                continue
+            try:
+                doc, data = decode_image_backup_entry(entry)
+                # Uploads to GridFS for large images, so only done for keys we will insert
+                storage_fields, _ = await build_image_storage_fields(doc["cache_key"], data)
+            except Exception as e:
+                logger.error(f"Could not import image {entry.get('cache_key')}: {e}")
+                failed += 1
+                continue
+            if "gridfs_id" in storage_fields:
+                uploaded[len(operations)] = storage_fields["gridfs_id"]
+            # $setOnInsert keeps an image stored concurrently by this node
+            operations.append(UpdateOne(
+                {"cache_key": doc["cache_key"]},
+                {"$setOnInsert": {**doc, **storage_fields}},
+                upsert=True,
+            ))
+        if not operations:
+            return 0, failed
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            upserted = {item["index"] for item in e.details.get("upserted", [])}
+            await delete_unused_import_blobs(uploaded, upserted)
+            raise
+        await delete_unused_import_blobs(uploaded, set(result.upserted_ids))
+        return result.upserted_count, failed
+
+
+async def delete_unused_import_blobs(uploaded: Dict[int, Any], upserted: set) -> int:
+    """Delete GridFS blobs uploaded for operations that did not insert their image.
+
+    An upsert does nothing when another writer stored the key between the
+    ``existing`` check and the bulk write, leaving its blob unreferenced.
+    """
+    unused = [gridfs_id for index, gridfs_id in uploaded.items() if index not in upserted]
+    for gridfs_id in unused:
+        await delete_gridfs_blob(gridfs_id)
+    if unused:
+        logger.warning(f"Deleted {len(unused)} GridFS blobs for images stored concurrently during import")
+    return len(unused)
+
+
+IMPORTERS = {
+    "recipes": import_recipe_batch,
+    "images": import_image_batch,
+}
+
+
+async def import_backup(backup_dir: str, datasets=DATASETS, batch_size: int = 200, restart: bool = False) -> Dict[str, Dict[str, int]]:
+    """Import the selected datasets from ``backup_dir``, resuming from its checkpoint."""
+    checkpoint = {} if restart else load_checkpoint(backup_dir)
+    summary = {}
+    for dataset in datasets:
+        path = backup_path(backup_dir, dataset)
+        if not os.path.exists(path):
+            logger.warning(f"No {dataset} backup at {path}, skipping")
+            continue
+        counts = {"inserted": 0, "skipped": 0, "failed": 0, "resumed_at_line": checkpoint.get(dataset, 0)}
+        for lines_read, batch in read_ndjson_batches(path, batch_size, skip=checkpoint.get(dataset, 0)):
+            if batch:
+                inserted, failed = await IMPORTERS[dataset](batch)
+                counts["inserted"] += inserted
+                counts["failed"] += failed
+                counts["skipped"] += len(batch) - inserted - failed
+            checkpoint[dataset] = lines_read
+            save_checkpoint(backup_dir, checkpoint)
+            logger.info(f"Imported {dataset} through line {lines_read}: {counts}")
+        summary[dataset] = counts
+    logger.info(f"Import complete: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("backup_dir", help="Directory holding recipes.ndjson.gz and images.ndjson.gz")
+    parser.add_argument("--only", choices=DATASETS, help="Export or import just one dataset")
+    parser.add_argument("--batch-size", type=int, default=200, help="Records read or inserted per batch")
+    parser.add_argument("--restart", action="store_true", help="Import from the start, ignoring the checkpoint")
+    args = parser.parse_args()
+    selected = (args.only,) if args.only else DATASETS
+    if args.command == "export":
+        print(asyncio.run(export_backup(args.backup_dir, selected, args.batch_size)))
+    else:
+        print(asyncio.run(import_backup(args.backup_dir, selected, args.batch_size, args.restart)))
@@ -0,0 +1,109 @@
+"""Convert base64 image documents in MongoDB to binary storage.
+
+Documents written before binary storage keep their image as base64 text in
+``b64_data``. This migration rewrites them in place, in batches, as BSON
+Binary (or GridFS for large images). It only selects documents that still
+have ``b64_data``, so an interrupted run can simply be started again.
+
+Usage:
+    python -m mixologist.database.migrate_images [--batch-size 200]
+"""
+import argparse
+import asyncio
+import base64
+import logging
+
+from pymongo import UpdateOne
+
+from .config import get_mongo_collection
+from ..services.image_cache_service import build_image_storage_fields, delete_gridfs_blob
+
+logger = logging.getLogger(__name__)
+
+async def delete_unclaimed_gridfs_blobs(collection, uploaded: dict) -> int:
+    """Delete GridFS blobs uploaded for documents whose conditional update did not apply.
+
+    ``uploaded`` maps document ``_id`` to the ``gridfs_id`` uploaded for it.
+    A blob is unclaimed when its document no longer references it, e.g.
+    because the document changed between the read and the update.
+    """
+    docs = await collection.find(
+        {"_id": {"$in": list(uploaded)}}, projection={"gridfs_id": 1}
+    ).to_list(len(uploaded))
+    claimed = {doc.get("gridfs_id") for doc in docs}
+    unclaimed = [gridfs_id for gridfs_id in uploaded.values() if gridfs_id not in claimed]
+    for gridfs_id in unclaimed:
+        await delete_gridfs_blob(gridfs_id)
+    if unclaimed:
+        logger.warning(f"Deleted {len(unclaimed)} GridFS blobs for images that changed during migration")
+    return len(unclaimed)
+
+async def migrate_images_to_binary(batch_size: int = 200) -> dict:
+    """Migrate every base64 image document to binary storage."""
+    migrated = 0
+    failed = 0
+    orphaned_blobs = 0
+    bytes_before = 0
+    bytes_after = 0
+    last_id = None
+
+    async with get_mongo_collection() as collection:
+        while True:
+            query = {"b64_data": {"$exists": True}}
+            if last_id is not None:
+                # Skip documents that failed earlier in this run
+                query["_id"] = {"$gt": last_id}
+            docs = await collection.find(
+                query, projection={"cache_key": 1, "b64_data": 1}
+            ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+
+            operations = []
+            uploaded = {}
+            for doc in docs:
+                cache_key = doc.get("cache_key", str(doc["_id"]))
+                try:
+                    data = base64.b64decode(doc["b64_data"])
+                    storage_fields, unset_fields = await build_image_storage_fields(cache_key, data)
+                except Exception as e:
+                    logger.error(f"Could not convert image {cache_key}: {e}")
+                    failed += 1
+                    continue
+                if "gridfs_id" in storage_fields:
+                    uploaded[doc["_id"]] = storage_fields["gridfs_id"]
+                operations.append(UpdateOne(
+                    # Only rewrite the document if it was not changed since we read it
+                    {"_id": doc["_id"], "b64_data": doc["b64_data"]},
+                    {"$set": storage_fields, "$unset": unset_fields},
+                ))
+                bytes_before += len(doc["b64_data"])
+                bytes_after += len(data)
+
+            if operations:
+                try:
+                    result = await collection.bulk_write(operations, ordered=False)
+                    migrated += result.modified_count
+                finally:
+                    # Large images are uploaded before the update, which may not match
+                    if uploaded:
+                        orphaned_blobs += await delete_unclaimed_gridfs_blobs(collection, uploaded)
+
+            last_id = docs[-1]["_id"]
+            logger.info(f"Migrated {migrated} images to binary storage so far ({failed} failed)")
+
+    summary = {
+        "migrated": migrated,
+        "failed": failed,
+        "orphaned_blobs_deleted": orphaned_blobs,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+    }
+    logger.info(f"Image binary migration complete: {summary}")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=200, help="Documents converted per bulk write")
+    args = parser.parse_args()
+    print(asyncio.run(migrate_images_to_binary(batch_size=args.batch_size)))
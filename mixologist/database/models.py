@@ -79,4 +79,27 @@ class RecipeImage(Base):
     
     # Relationships
     recipe = relationship("Recipe", back_populates="images")
-    image = relationship("Image", back_populates="recipes") 
\ No newline at end of file
+    image = relationship("Image", back_populates="recipes") 
+
+class ImageJob(Base):
+    """Durable image generation job, deduplicated by image cache key."""
+    __tablename__ = "image_jobs"
+
+    id = Column(Integer, primary_key=True)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)
+    kind = Column(String(20), nullable=False)  # cocktail or specialized
+    params = Column(Text, nullable=False)  # JSON encoded keyword arguments for the stream function
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    last_error = Column(Text)
+    worker_id = Column(String(100))
+    available_at = Column(TIMESTAMP, default=func.now())
+    started_at = Column(TIMESTAMP)
+    finished_at = Column(TIMESTAMP)
+    created_at = Column(TIMESTAMP, default=func.now())
+    updated_at = Column(TIMESTAMP, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('idx_image_jobs_claim', 'status', 'available_at'),
+    )
@@ -1,16 +1,40 @@
 """Database service layer for recipe and image operations."""
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, func, text
+from sqlalchemy import select, update, and_, or_, func, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, timedelta
 from pathlib import Path
 import logging
 import json
 
-from .models import Recipe, Image, RecipeImage
+from .models import Recipe, Image, RecipeImage, ImageJob, USE_SQLITE
 
 logger = logging.getLogger(__name__)
 
+def recipe_search_text(recipe_data: Dict[str, Any]) -> str:
+    """Text indexed in a recipe's search vector: name, ingredient names and primary flavors."""
+    search_text_parts = [recipe_data.get('drink_name', '')]
+
+    # Add ingredient names to search text
+    ingredients = recipe_data.get('ingredients', [])
+    if ingredients:
+        for ingredient in ingredients:
+            if isinstance(ingredient, dict):
+                search_text_parts.append(ingredient.get('name', ''))
+            else:
+                search_text_parts.append(str(ingredient))
+
+    # Add flavor profile to search text
+    flavor_profile = recipe_data.get('flavor_profile', {})
+    if isinstance(flavor_profile, dict):
+        primary_flavors = flavor_profile.get('primary_flavors', [])
+        if primary_flavors:
+            search_text_parts.extend(primary_flavors)
+
+    return ' '.join(filter(None, search_text_parts))
+
 class DatabaseService:
     """Service class for database operations."""
     
@@ -71,25 +95,7 @@ class DatabaseService:
                 self.session.add(recipe)
             
             # Update search vector
-            search_text_parts = [recipe_data.get('drink_name', '')]
-            
-            # Add ingredient names to search text
-            ingredients = recipe_data.get('ingredients', [])
-            if ingredients:
-                for ingredient in ingredients:
-                    if isinstance(ingredient, dict):
-                        search_text_parts.append(ingredient.get('name', ''))
-                    else:
-                        search_text_parts.append(str(ingredient))
-            
-            # Add flavor profile to search text
-            flavor_profile = recipe_data.get('flavor_profile', {})
-            if isinstance(flavor_profile, dict):
-                primary_flavors = flavor_profile.get('primary_flavors', [])
-                if primary_flavors:
-                    search_text_parts.extend(primary_flavors)
-            
-            search_text = ' '.join(filter(None, search_text_parts))
+            search_text = recipe_search_text(recipe_data)
             
             if existing_recipe:
                 # Update search vector for existing recipe
@@ -172,6 +178,67 @@ class DatabaseService:
             logger.error(f"Error getting all recipes: {e}")
             return []
     
+    async def get_recipes_after(self, after_id: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        """Get recipes with ``id`` above ``after_id`` in id order, for streaming every recipe."""
+        try:
+            stmt = (
+                select(Recipe.id, Recipe.cache_key, Recipe.recipe_data)
+                .where(Recipe.id > after_id)
+                .order_by(Recipe.id)
+                .limit(limit)
+            )
+            result = await self.session.execute(stmt)
+            return [
+                {"id": row.id, "cache_key": row.cache_key, "recipe_data": row.recipe_data}
+                for row in result.all()
+            ]
+        except Exception as e:
+            logger.error(f"Error getting recipes after id {after_id}: {e}")
+            return []
+
+    async def insert_recipes(self, records: List[Dict[str, Any]]) -> Optional[int]:
+        """Bulk insert ``{"cache_key", "recipe_data"}`` records, skipping cache keys that exist.
+
+        Returns the number of recipes inserted, or None if the batch failed.
+        """
+        try:
+            cache_keys = [record["cache_key"] for record in records]
+            result = await self.session.execute(select(Recipe.cache_key).where(Recipe.cache_key.in_(cache_keys)))
+            existing = set(result.scalars().all())
+            new_records = {}
+            for record in records:
+                if record["cache_key"] not in existing:
+                    new_records.setdefault(record["cache_key"], record["recipe_data"])
+            if not new_records:
+                return 0
+            self.session.add_all([
+                Recipe(
+                    cache_key=cache_key,
+                    drink_name=recipe_data.get("drink_name", ""),
+                    recipe_data=recipe_data,
+                    alcohol_content=recipe_data.get("alcohol_content"),
+                    difficulty_rating=recipe_data.get("difficulty_rating"),
+                    preparation_time_minutes=recipe_data.get("preparation_time_minutes"),
+                    serving_glass=recipe_data.get("serving_glass")
+                )
+                for cache_key, recipe_data in new_records.items()
+            ])
+            await self.session.flush()
+            if not USE_SQLITE:
+                await self.session.execute(
+                    text("UPDATE recipes SET search_vector = to_tsvector('english', :search_text) WHERE cache_key = :cache_key"),
+                    [
+                        {"search_text": recipe_search_text(recipe_data), "cache_key": cache_key}
+                        for cache_key, recipe_data in new_records.items()
+                    ]
+                )
+            await self.session.commit()
+            return len(new_records)
+        except Exception as e:
+            logger.error(f"Error inserting {len(records)} recipes: {e}")
+            await self.session.rollback()
+            return None
+
     # Image operations
     async def get_image_by_cache_key(self, cache_key: str) -> Optional[str]:
         """Get image file content by cache key (maintains current API compatibility)."""
@@ -270,6 +337,208 @@ class DatabaseService:
             logger.error(f"Error getting images by category {category}: {e}")
             return []
     
+    # Image job operations
+    @staticmethod
+    def _image_job_dict(job: ImageJob) -> Dict[str, Any]:
+        return {
+            'id': job.id,
+            'cache_key': job.cache_key,
+            'kind': job.kind,
+            'params': json.loads(job.params),
+            'status': job.status,
+            'attempts': job.attempts,
+            'max_attempts': job.max_attempts,
+            'last_error': job.last_error,
+            'worker_id': job.worker_id,
+            'available_at': job.available_at.isoformat() if job.available_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+        }
+
+    async def enqueue_image_job(
+        self, cache_key: str, kind: str, params: Dict[str, Any], max_attempts: int = 3
+    ) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """Queue an image job, or return the existing job for the same cache key.
+
+        Returns ``(job, created)``. A finished job is queued again, since the
+        caller only enqueues when the image is not cached.
+        """
+        try:
+            logger.debug(f"Enqueueing image job for cache_key: {cache_key}")
+            result = await self.session.execute(select(ImageJob).where(ImageJob.cache_key == cache_key))
+            job = result.scalar_one_or_none()
+            now = datetime.now()
+            if job is not None:
+                if job.status in ("succeeded", "failed"):
+                    job.status = "queued"
+                    job.kind = kind
+                    job.params = json.dumps(params)
+                    job.attempts = 0
+                    job.max_attempts = max_attempts
+                    job.last_error = None
+                    job.available_at = now
+                    job.finished_at = None
+                    await self.session.commit()
+                    logger.info(f"Re-queued finished image job {job.id} for cache_key: {cache_key}")
+                    return self._image_job_dict(job), True
+                return self._image_job_dict(job), False
+
+            job = ImageJob(
+                cache_key=cache_key,
+                kind=kind,
+                params=json.dumps(params),
+                status="queued",
+                attempts=0,
+                max_attempts=max_attempts,
+                available_at=now,
+                created_at=now,
+            )
+            self.session.add(job)
+            try:
+                await self.session.commit()
+            except IntegrityError:
+                # Another worker queued the same cache key first
+                await self.session.rollback()
+                result = await self.session.execute(select(ImageJob).where(ImageJob.cache_key == cache_key))
+                return self._image_job_dict(result.scalar_one()), False
+            logger.info(f"Queued image job {job.id} for cache_key: {cache_key}")
+            return self._image_job_dict(job), True
+        except Exception as e:
+            logger.error(f"Error enqueueing image job {cache_key}: {e}")
+            await self.session.rollback()
+            return None
+
+    async def claim_image_job(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest available queued job to running."""
+        try:
+            now = datetime.now()
+            result = await self.session.execute(
+                select(ImageJob.id)
+                .where(and_(ImageJob.status == "queued", ImageJob.available_at <= now))
+                .order_by(ImageJob.id)
+                .limit(5)
+            )
+            for job_id in result.scalars().all():
+                # The status guard makes the claim safe without row locks, on SQLite too
+                claimed = await self.session.execute(
+                    update(ImageJob)
+                    .where(and_(ImageJob.id == job_id, ImageJob.status == "queued"))
+                    .values(
+                        status="running",
+                        attempts=ImageJob.attempts + 1,
+                        worker_id=worker_id,
+                        started_at=now,
+                        updated_at=now,
+                    )
+                )
+                await self.session.commit()
+                if claimed.rowcount == 1:
+                    job = await self.session.get(ImageJob, job_id, populate_existing=True)
+                    logger.debug(f"Worker {worker_id} claimed image job {job_id}")
+                    return self._image_job_dict(job)
+            return None
+        except Exception as e:
+            logger.error(f"Error claiming image job: {e}")
+            await self.session.rollback()
+            return None
+
+    async def finish_image_job(
+        self, job_id: int, error: Optional[str] = None, retry_delay_seconds: float = 0
+    ) -> Optional[Dict[str, Any]]:
+        """Mark a running job as succeeded, or record a failed attempt.
+
+        A failed job is queued again after ``retry_delay_seconds`` until it
+        has used all of its attempts.
+        """
+        try:
+            job = await self.session.get(ImageJob, job_id)
+            if job is None:
+                return None
+            now = datetime.now()
+            if error is None:
+                job.status = "succeeded"
+                job.last_error = None
+                job.finished_at = now
+            elif job.attempts < job.max_attempts:
+                job.status = "queued"
+                job.last_error = error
+                job.available_at = now + timedelta(seconds=retry_delay_seconds)
+            else:
+                job.status = "failed"
+                job.last_error = error
+                job.finished_at = now
+            job.updated_at = now
+            await self.session.commit()
+            logger.info(f"Image job {job_id} is now {job.status} after {job.attempts} attempt(s)")
+            return self._image_job_dict(job)
+        except Exception as e:
+            logger.error(f"Error finishing image job {job_id}: {e}")
+            await self.session.rollback()
+            return None
+
+    async def release_image_job(self, job_id: int) -> bool:
+        """Queue a running job again without counting its attempt (its worker is shutting down)."""
+        try:
+            now = datetime.now()
+            result = await self.session.execute(
+                update(ImageJob)
+                .where(and_(ImageJob.id == job_id, ImageJob.status == "running"))
+                .values(
+                    status="queued",
+                    worker_id=None,
+                    attempts=ImageJob.attempts - 1,
+                    available_at=now,
+                    updated_at=now,
+                )
+            )
+            await self.session.commit()
+            if result.rowcount:
+                logger.info(f"Released image job {job_id} back to the queue")
+            return result.rowcount == 1
+        except Exception as e:
+            logger.error(f"Error releasing image job {job_id}: {e}")
+            await self.session.rollback()
+            return False
+
+    async def get_image_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Get an image job by id."""
+        try:
+            job = await self.session.get(ImageJob, job_id, populate_existing=True)
+            return self._image_job_dict(job) if job else None
+        except Exception as e:
+            logger.error(f"Error getting image job {job_id}: {e}")
+            return None
+
+    async def reset_stale_image_jobs(self, stale_after_seconds: float) -> int:
+        """Queue running jobs again whose worker has not finished them in time."""
+        try:
+            cutoff = datetime.now() - timedelta(seconds=stale_after_seconds)
+            result = await self.session.execute(
+                update(ImageJob)
+                .where(and_(ImageJob.status == "running", ImageJob.started_at < cutoff))
+                .values(status="queued", worker_id=None, last_error="worker timed out")
+            )
+            await self.session.commit()
+            if result.rowcount:
+                logger.warning(f"Re-queued {result.rowcount} stale image jobs")
+            return result.rowcount
+        except Exception as e:
+            logger.error(f"Error resetting stale image jobs: {e}")
+            await self.session.rollback()
+            return 0
+
+    async def get_image_job_counts(self) -> Dict[str, int]:
+        """Count image jobs by status."""
+        try:
+            result = await self.session.execute(
+                select(ImageJob.status, func.count(ImageJob.id)).group_by(ImageJob.status)
+            )
+            return {status: count for status, count in result.all()}
+        except Exception as e:
+            logger.error(f"Error counting image jobs: {e}")
+            return {}
+
     # Statistics and utility methods
     async def get_recipe_count(self) -> int:
         """Get total number of recipes."""
@@ -1,23 +1,56 @@
-from fastapi import FastAPI, Form, HTTPException, File, UploadFile
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Form, HTTPException, File, UploadFile, Request
+from fastapi.responses import StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import json
 import logging
 import base64
+import os
+import time
+from functools import partial
 from typing import Optional, List, Dict
 from .services.openai_service import (
     get_completion_from_messages,
+    stream_recipe_fields,
+    parse_recipe_arguments,
+    get_core_recipe_arguments,
+    enrich_recipe_arguments,
     generate_image_stream,
     generate_specialized_image_stream,
     generate_method_image_stream,
+    get_cached_step_images,
+    step_image_hash,
+    technique_library_key,
     generate_recipe_cache_key,
+    generate_cache_key,
+    generate_specialized_cache_key,
+    normalize_image_ingredients,
+    get_cached_image,
     get_cached_recipe,
     save_recipe_to_cache,
     parse_ingredient_name,
+    clean_ingredient_image_subject,
     normalize_glass_name,
     MongoDBImageService,
 )
 from .services.inventory_service import InventoryService
+from .services.concurrency import SingleFlight, StreamBroadcaster, merge_streams
+from .services.image_variant_service import IMAGE_VARIANTS, get_image_variant_record
+from .services.image_cache_service import image_access_tracker, image_memory_cache
+from .services.image_eviction import image_eviction_sweeper
+from .services.image_store import MongoImageStore, image_store
+from .services.prompt_memo import prompt_memo
+from .services.image_failures import ImageGenerationUnavailable, image_generation_guard
+from .services.image_job_queue import image_job_queue
+from .services.openai_scheduler import OpenAIFlowMiddleware, openai_scheduler
+from .services.llm_call_policy import call_policy_stats
+from .services.openai_client import openai_clients
+from .services.catalog_prewarm import (
+    CATALOG_PREWARM_CONCURRENCY, CATALOG_PREWARM_RATE_PER_MINUTE, catalog_prewarmer, technique_library_items
+)
+from .services.sse import PARTIAL_IMAGE_FRAME, STREAM_COMPLETE_EVENT, PayloadEventFrame, sse_event
+from .services.http_utils import IMMUTABLE_CACHE_CONTROL, etag_for_digest, etag_matches, parse_byte_range
+from .models.get_recipe_params import CoreRecipeParams, RECIPE_ENRICHMENT_SECTIONS
 from .models.inventory_models import (
     InventoryAddRequest, InventoryUpdateRequest, ImageRecognitionRequest,
     InventoryFilterRequest, QuantityDescription, IngredientCategory
@@ -38,14 +71,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Queue each client's OpenAI calls as their own flow, so one busy client cannot crowd out the rest
+app.add_middleware(OpenAIFlowMiddleware)
+
+# Concurrent recipe requests for the same cache key share one LLM call
+recipe_flight = SingleFlight("recipes")
+# ...and concurrent /create/stream requests share one streamed completion
+recipe_stream_broadcaster = StreamBroadcaster("recipe_stream")
+# ...and concurrent requests to enrich the same recipe share one set of enrichment calls
+recipe_enrichment_flight = SingleFlight("recipe_enrichment")
+
+# Default number of images /generate_recipe_visuals generates at once
+RECIPE_VISUALS_MAX_CONCURRENCY = int(os.getenv("RECIPE_VISUALS_MAX_CONCURRENCY", "4"))
+
+# Page sizes for GET /images/by_category/{category}
+IMAGE_LIST_DEFAULT_PAGE_SIZE = int(os.getenv("IMAGE_LIST_DEFAULT_PAGE_SIZE", "50"))
+IMAGE_LIST_MAX_PAGE_SIZE = int(os.getenv("IMAGE_LIST_MAX_PAGE_SIZE", "200"))
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on application startup."""
     logging.info("Starting Mixologist API...")
+    # Access tracking and budget eviction work on the MongoDB image collection only
+    if isinstance(image_store, MongoImageStore):
+        image_access_tracker.start()
+        image_eviction_sweeper.start()
+    else:
+        logging.info("Local image store selected: not starting the image access tracker or eviction sweeper")
+    # Index creation waits on MongoDB, so don't hold up startup for it
+    asyncio.ensure_future(image_store.ensure_indexes())
+    asyncio.ensure_future(prompt_memo.ensure_indexes())
+    asyncio.ensure_future(openai_clients.prewarm())
     try:
         success = await initialize_app_database()
         if success:
             logging.info("Database initialization completed successfully")
+            image_job_queue.start()
         else:
             logging.warning("Database initialization completed with warnings")
     except Exception as e:
@@ -54,6 +115,14 @@ async def startup_event():
         # Don't prevent startup, just log the error
         logging.warning("Application starting without database - falling back to file-based caching")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers; unfinished image jobs are picked up after restart."""
+    await image_job_queue.stop()
+    image_eviction_sweeper.stop()
+    await image_access_tracker.stop()
+    await openai_clients.aclose()
+
 @app.get("/")
 async def home():
     return {"message": "Welcome to the Mixologist API"}
@@ -137,19 +206,345 @@ async def get_recipe_stats():
             "error": str(e)
         }
 
-@app.get("/images/by_category/{category}")
-async def get_images_by_category(category: str):
-    """Get all images by category from MongoDB."""
+@app.get("/recipes/coalescing_stats")
+async def get_recipe_coalescing_stats():
+    """Get single-flight statistics for recipe generation."""
+    return recipe_flight.stats()
+
+@app.post("/image_jobs")
+async def create_image_job(kind: str = Form(...), params: str = Form(...)):
+    """Queue a durable image generation job.
+
+    ``kind`` is ``cocktail`` (generate_image_stream arguments) or
+    ``specialized`` (generate_specialized_image_stream arguments) and
+    ``params`` is the JSON encoded keyword arguments.
+    """
     try:
-        images = await MongoDBImageService.get_images_by_category(category)
-        return {
-            "category": category,
-            "images": images,
-            "total": len(images)
+        job_params = json.loads(params)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON format: {str(e)}")
+    try:
+        job = await image_job_queue.enqueue(kind, job_params)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image job: {str(e)}")
+    if job is None:
+        raise HTTPException(status_code=500, detail="Error queueing image job")
+    return job
+
+@app.get("/image_jobs/stats")
+async def get_image_job_stats():
+    """Get image job counts by status and worker pool state."""
+    return await image_job_queue.stats()
+
+@app.get("/image_jobs/{job_id}")
+async def get_image_job(job_id: int):
+    """Get the status of an image job."""
+    job = await image_job_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Image job not found")
+    return job
+
+@app.get("/image_jobs/{job_id}/stream")
+async def stream_image_job(job_id: int):
+    """Follow an image job over SSE until its image is available."""
+    job = await image_job_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Image job not found")
+    return StreamingResponse(
+        image_job_queue.stream_job(job),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
         }
+    )
+
+@app.get("/images/eviction")
+async def get_image_eviction_stats():
+    """Get the image storage budget, eviction policy and last sweep report."""
+    return image_eviction_sweeper.stats()
+
+@app.post("/images/eviction/sweep")
+async def run_image_eviction_sweep(dry_run: bool = Form(default=False)):
+    """Evict cold images now; ``dry_run`` reports what would be reclaimed.
+
+    Eviction works on the MongoDB image collection, so with the local image
+    store this returns 409.
+    """
+    if not isinstance(image_store, MongoImageStore):
+        raise HTTPException(status_code=409, detail="Image eviction is not available with the local image store")
+    try:
+        return await image_eviction_sweeper.sweep(dry_run=dry_run)
     except Exception as e:
-        logging.error(f"Error getting images by category: {e}")
-        raise HTTPException(status_code=500, detail=f"Error getting images: {str(e)}")
+        logging.error(f"Error sweeping images: {e}")
+        raise HTTPException(status_code=500, detail=f"Error sweeping images: {str(e)}")
+
+@app.get("/images/cache_stats")
+async def get_image_cache_stats():
+    """Get hit/miss/eviction counters for the in-process image cache tier."""
+    return image_memory_cache.stats()
+
+@app.get("/images/prompt_memo_stats")
+async def get_prompt_memo_stats():
+    """Hit/miss counters for memoized prompt refinements."""
+    return prompt_memo.stats()
+
+@app.get("/images/failure_stats")
+async def get_image_failure_stats():
+    """Negative cache size and per-category circuit breaker states for image generation."""
+    return image_generation_guard.stats()
+
+@app.get("/openai/scheduler_stats")
+async def get_openai_scheduler_stats():
+    """Per-model OpenAI concurrency, queue depth per priority lane, waits and rate-limit budgets."""
+    return openai_scheduler.stats()
+
+@app.get("/openai/call_policy_stats")
+async def get_openai_call_policy_stats():
+    """Per-policy deadlines, retries, hedges, latency percentiles and which attempt won."""
+    return call_policy_stats()
+
+@app.get("/openai/pool_stats")
+async def get_openai_pool_stats():
+    """Connection pool of the shared OpenAI client: in-use and idle connections, queued requests, churn."""
+    return openai_clients.stats()
+
+@app.post("/images/prewarm")
+async def start_catalog_prewarm(
+    rate_per_minute: float = Form(default=CATALOG_PREWARM_RATE_PER_MINUTE),
+    concurrency: int = Form(default=CATALOG_PREWARM_CONCURRENCY),
+    technique_library: bool = Form(default=False)
+):
+    """Start generating missing ingredient, glassware, garnish and equipment images in the background.
+
+    With ``technique_library=true`` it builds the technique image library instead.
+    """
+    items = technique_library_items() if technique_library else None
+    started = catalog_prewarmer.start(rate_per_minute=rate_per_minute, concurrency=concurrency, items=items)
+    return {"started": started, "progress": catalog_prewarmer.progress}
+
+@app.get("/images/prewarm")
+async def get_catalog_prewarm_progress():
+    """Get progress of the catalog image pre-warm job."""
+    return {"running": catalog_prewarmer.running, "progress": catalog_prewarmer.progress}
+
+@app.post("/images/prewarm/stop")
+async def stop_catalog_prewarm():
+    """Stop a running catalog pre-warm; starting it again resumes with the remaining images."""
+    return {"stopped": catalog_prewarmer.stop()}
+
+def image_error_event(error: Exception, **fields) -> dict:
+    """SSE error event for a failed image stream, with ``retry_after`` when generation was skipped."""
+    event = {"type": "error", **fields, "message": str(error)}
+    if isinstance(error, ImageGenerationUnavailable):
+        event["retry_after"] = round(error.retry_after, 1)
+    return event
+
+def encode_image_cursor(cache_key: str) -> str:
+    return base64.urlsafe_b64encode(cache_key.encode()).decode("ascii").rstrip("=")
+
+def decode_image_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def image_listing_entry(doc: dict) -> dict:
+    """Metadata returned by the image listing for one stored image."""
+    created_at = doc.get("stored_at")
+    entry = {
+        "cache_key": doc["cache_key"],
+        "category": doc.get("category"),
+        "byte_size": doc.get("byte_size"),
+        "content_type": doc.get("content_type"),
+        "width": doc.get("width"),
+        "height": doc.get("height"),
+        "created_at": created_at.isoformat() if hasattr(created_at, "isoformat") else created_at,
+        "url": image_url(doc["cache_key"]),
+    }
+    if doc.get("variant_of"):
+        entry["variant_of"] = doc["variant_of"]
+        entry["variant"] = doc.get("variant")
+    return entry
+
+@app.get("/images/by_category/{category}")
+async def get_images_by_category(
+    category: str,
+    cursor: Optional[str] = None,
+    limit: int = IMAGE_LIST_DEFAULT_PAGE_SIZE,
+    include_variants: bool = False,
+):
+    """List image metadata by category (or ``all``), one page at a time.
+
+    Returns no image data: fetch each image from its ``url``. Pass the
+    returned ``next_cursor`` as ``cursor`` to get the next page; it is
+    null on the last page. ``limit`` is capped at IMAGE_LIST_MAX_PAGE_SIZE.
+    """
+    limit = max(1, min(limit, IMAGE_LIST_MAX_PAGE_SIZE))
+    after = decode_image_cursor(cursor) if cursor else None
+    try:
+        # One extra row tells us whether another page follows
+        docs = await image_store.list(category, after=after, limit=limit + 1, include_variants=include_variants)
+    except Exception as e:
+        logging.error(f"Error listing images by category: {e}")
+        raise HTTPException(status_code=500, detail=f"Error listing images: {str(e)}")
+    page = docs[:limit]
+    next_cursor = encode_image_cursor(page[-1]["cache_key"]) if len(docs) > limit else None
+    return {
+        "category": category,
+        "images": [image_listing_entry(doc) for doc in page],
+        "count": len(page),
+        "next_cursor": next_cursor,
+    }
+
+def image_url(cache_key: str) -> str:
+    """URL of the binary image endpoint for a cache key."""
+    return f"/images/{cache_key}"
+
+async def cached_image_url_events(cache_key: str) -> List[bytes]:
+    """SSE events pointing the client at GET /images/{cache_key}, or [] if it is not cached."""
+    if not await image_store.exists(cache_key):
+        return []
+    url_event = {"type": "image_url", "cache_key": cache_key, "url": image_url(cache_key)}
+    return [sse_event(url_event), STREAM_COMPLETE_EVENT]
+
+async def queued_image_events(kind: str, params: dict):
+    """Enqueue a durable image job and stream its progress as SSE events.
+
+    The job keeps running if the client disconnects, so reconnecting (or any
+    other client asking for the same image) picks up where it left off.
+    """
+    job = await image_job_queue.enqueue(kind, params)
+    if job is None:
+        raise Exception("Could not queue image job")
+    queued_event = {"type": "job_queued", "job_id": job.get("id"), "cache_key": job["cache_key"], "status": job["status"]}
+    yield sse_event(queued_event)
+    async for event in image_job_queue.stream_job(job):
+        yield event
+
+@app.get("/images/{cache_key}")
+async def get_image_bytes(cache_key: str, request: Request, variant: Optional[str] = None):
+    """Serve a cached image as raw bytes with ETag, Range and immutable caching.
+
+    ``variant`` selects a configured rendition such as ``thumb_96``.
+    """
+    if variant:
+        if variant not in IMAGE_VARIANTS:
+            raise HTTPException(status_code=400, detail=f"Unknown image variant: {variant}")
+        record = await get_image_variant_record(cache_key, variant)
+    else:
+        record = await image_store.get(cache_key)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    data = record["data"]
+    etag = etag_for_digest(record["sha256"])
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_byte_range(range_header, len(data))
+        except ValueError:
+            pass  # Serve the full image for ranges we do not handle
+        else:
+            if byte_range is None:
+                return Response(
+                    status_code=416,
+                    headers={**headers, "Content-Range": f"bytes */{len(data)}"},
+                )
+
+    if byte_range is not None:
+        start, end = byte_range
+        return Response(
+            content=data[start:end + 1],
+            status_code=206,
+            media_type=record["content_type"],
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{len(data)}"},
+        )
+
+    return Response(content=data, media_type=record["content_type"], headers=headers)
+
+def drink_recipe_messages(drink_query: str, ingredients_part: str = "") -> list:
+    """Chat messages asking for the recipe of a named drink."""
+    user_query = f"""
+    I want you to act like the world's most important bartender. 
+    You're the bartender that will carry on the culture of bartending for the entire world. 
+    I'm going to tell you the name of a drink, and you need to create the best representation of that drink based on its name alone. 
+    It's possible that this drink is unknown; you will still respond. 
+    {ingredients_part}
+    The drink I want you to tell me about is: {drink_query}
+    """
+    return [{"role": "user", "content": user_query}]
+
+def recipe_response_data(recipe) -> dict:
+    """The recipe as returned by /create and stored in the recipe cache."""
+    return {
+        # Original fields from OpenAI
+        "drink_name": recipe.drink_name,
+        "alcohol_content": recipe.alcohol_content,
+        "serving_glass": recipe.serving_glass,
+        "rim": 'Salted' if recipe.rim else 'No salt',
+        "ingredients": recipe.ingredients,
+        "steps": recipe.steps,
+        "garnish": recipe.garnish,
+        "drink_image_description": recipe.drink_image_description,
+        "drink_history": recipe.drink_history,
+
+        # Enhanced fields
+        "brand_recommendations": recipe.brand_recommendations,
+        "ingredient_substitutions": recipe.ingredient_substitutions,
+        "related_cocktails": recipe.related_cocktails,
+        "difficulty_rating": recipe.difficulty_rating,
+        "preparation_time_minutes": recipe.preparation_time_minutes,
+        "equipment_needed": recipe.equipment_needed,
+        "flavor_profile": recipe.flavor_profile,
+        "serving_size_base": recipe.serving_size_base,
+        "phonetic_pronunciations": recipe.phonetic_pronunciations,
+        "enhanced_steps": recipe.enhanced_steps,
+        "suggested_variations": recipe.suggested_variations,
+        "food_pairings": recipe.food_pairings,
+        "optimal_serving_temperature": recipe.optimal_serving_temperature,
+        "skill_level_recommendation": recipe.skill_level_recommendation,
+        "drink_trivia": recipe.drink_trivia
+    }
+
+def core_recipe_data(core_arguments: dict) -> dict:
+    """Recipe data for a core-only recipe, with every enrichment section pending."""
+    recipe_data = recipe_response_data(parse_recipe_arguments(core_arguments))
+    recipe_data["enrichment_pending"] = list(RECIPE_ENRICHMENT_SECTIONS)
+    return recipe_data
+
+async def enrich_cached_recipe(cache_key: str, recipe_data: dict, sections: Optional[List[str]] = None) -> dict:
+    """Generate the recipe's pending enrichment sections (all, or only ``sections``) and merge them into the cache.
+
+    Sections that fail stay in ``enrichment_pending`` so they can be requested again.
+    """
+    pending = [section for section in recipe_data.get("enrichment_pending", []) if sections is None or section in sections]
+    if not pending:
+        return recipe_data
+
+    async def enrich():
+        enrichments = await enrich_recipe_arguments(recipe_data, pending)
+        # Merge into the latest cached copy, which may have gained other sections meanwhile
+        latest = await get_cached_recipe(cache_key) or recipe_data
+        merged = dict(latest)
+        for fields in enrichments.values():
+            merged.update({field: value for field, value in fields.items() if value not in (None, "", [], {})})
+        merged["enrichment_pending"] = [section for section in latest.get("enrichment_pending", []) if section not in enrichments]
+        await save_recipe_to_cache(cache_key, merged)
+        return merged
+
+    return await recipe_enrichment_flight.do(f"{cache_key}:{','.join(pending)}", enrich)
 
 @app.post("/create")
 async def create_drink(drink_query: str = Form(...)):
@@ -159,80 +554,145 @@ async def create_drink(drink_query: str = Form(...)):
         cache_key = generate_recipe_cache_key(drink_query)
         print(f"--- Generated recipe cache key: {cache_key} for query: {drink_query} ---")
         
-        # Check for cached recipe first
-        cached_recipe = await get_cached_recipe(cache_key)
-        if cached_recipe:
-            print(f"--- Found cached recipe for {drink_query}, returning cached data ---")
-            return cached_recipe
+        async def build_recipe():
+            # Check for cached recipe first
+            cached_recipe = await get_cached_recipe(cache_key)
+            if cached_recipe:
+                print(f"--- Found cached recipe for {drink_query}, returning cached data ---")
+                # A core recipe from /create/core: fill in the rest before returning it
+                if cached_recipe.get("enrichment_pending"):
+                    return await enrich_cached_recipe(cache_key, cached_recipe)
+                return cached_recipe
         
-        print(f"--- No cached recipe found for {drink_query}, generating new recipe ---")
+            print(f"--- No cached recipe found for {drink_query}, generating new recipe ---")
         
-        # Check if user wants inventory-limited recipes
-        limit_to_inventory = False  # Can be passed as parameter later
-        ingredients_part = ""
+            # Check if user wants inventory-limited recipes
+            limit_to_inventory = False  # Can be passed as parameter later
+            ingredients_part = ""
         
-        if limit_to_inventory:
-            try:
-                from .services.inventory_service import InventoryService
-                available_items = await InventoryService.get_all_items()
-                if available_items:
-                    available_ingredients = [item.name for item in available_items if item.quantity not in ['empty', 'almost_empty']]
-                    ingredients_part = f"Limit ingredients to only what I have available: {', '.join(available_ingredients)}\n"
-            except:
-                pass  # Fallback to normal recipe generation
+            if limit_to_inventory:
+                try:
+                    from .services.inventory_service import InventoryService
+                    available_items = await InventoryService.get_all_items()
+                    if available_items:
+                        available_ingredients = [item.name for item in available_items if item.quantity not in ['empty', 'almost_empty']]
+                        ingredients_part = f"Limit ingredients to only what I have available: {', '.join(available_ingredients)}\n"
+                except:
+                    pass  # Fallback to normal recipe generation
         
-        # Restore proper OpenAI prompt
-        user_query = f"""
-        I want you to act like the world's most important bartender. 
-        You're the bartender that will carry on the culture of bartending for the entire world. 
-        I'm going to tell you the name of a drink, and you need to create the best representation of that drink based on its name alone. 
-        It's possible that this drink is unknown; you will still respond. 
-        {ingredients_part}
-        The drink I want you to tell me about is: {drink_query}
-        """
+            recipe = await get_completion_from_messages(drink_recipe_messages(drink_query, ingredients_part))
         
-        recipe = await get_completion_from_messages([{"role": "user", "content": user_query}])
+            recipe_data = recipe_response_data(recipe)
         
-        # Enhanced recipe data with all new fields
-        recipe_data = {
-            # Original fields from OpenAI
-            "drink_name": recipe.drink_name,
-            "alcohol_content": recipe.alcohol_content,
-            "serving_glass": recipe.serving_glass,
-            "rim": 'Salted' if recipe.rim else 'No salt',
-            "ingredients": recipe.ingredients,
-            "steps": recipe.steps,
-            "garnish": recipe.garnish,
-            "drink_image_description": recipe.drink_image_description,
-            "drink_history": recipe.drink_history,
-            
-            # Enhanced fields (using placeholder data until AI generates them)
-            "brand_recommendations": recipe.brand_recommendations,
-            "ingredient_substitutions": recipe.ingredient_substitutions,
-            "related_cocktails": recipe.related_cocktails,
-            "difficulty_rating": recipe.difficulty_rating,
-            "preparation_time_minutes": recipe.preparation_time_minutes,
-            "equipment_needed": recipe.equipment_needed,
-            "flavor_profile": recipe.flavor_profile,
-            "serving_size_base": recipe.serving_size_base,
-            "phonetic_pronunciations": recipe.phonetic_pronunciations,
-            "enhanced_steps": recipe.enhanced_steps,
-            "suggested_variations": recipe.suggested_variations,
-            "food_pairings": recipe.food_pairings,
-            "optimal_serving_temperature": recipe.optimal_serving_temperature,
-            "skill_level_recommendation": recipe.skill_level_recommendation,
-            "drink_trivia": recipe.drink_trivia
-        }
+            # Save the new recipe to cache
+            await save_recipe_to_cache(cache_key, recipe_data)
         
-        # Save the new recipe to cache
-        await save_recipe_to_cache(cache_key, recipe_data)
-        
-        return recipe_data
+            return recipe_data
+
+        return await recipe_flight.do(cache_key, build_recipe)
     except Exception as e:
         logging.error(f"Error creating drink recipe: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating recipe: {str(e)}")
 
 
+@app.post("/create/core")
+async def create_drink_core(drink_query: str = Form(...)):
+    """Create only the core recipe (name, ingredients, steps, glass, garnish) for a fast first response.
+
+    The sections still to be generated are listed in ``enrichment_pending``;
+    fetch them with ``POST /recipes/enrich``. A cached recipe is returned as it is.
+    """
+    try:
+        cache_key = generate_recipe_cache_key(drink_query)
+
+        async def build_core_recipe():
+            cached_recipe = await get_cached_recipe(cache_key)
+            if cached_recipe:
+                return cached_recipe
+            core_arguments = await get_core_recipe_arguments(drink_recipe_messages(drink_query))
+            recipe_data = core_recipe_data(core_arguments)
+            await save_recipe_to_cache(cache_key, recipe_data)
+            return recipe_data
+
+        # Not shared with /create, which must return the full recipe
+        return await recipe_flight.do(f"core:{cache_key}", build_core_recipe)
+    except Exception as e:
+        logging.error(f"Error creating core drink recipe: {e}")
+        raise HTTPException(status_code=500, detail=f"Error creating recipe: {str(e)}")
+
+@app.post("/recipes/enrich")
+async def enrich_drink_recipe(drink_query: str = Form(...), sections: Optional[str] = Form(default=None)):
+    """Generate a cached recipe's pending enrichment sections concurrently and merge them into it.
+
+    ``sections`` is a comma separated subset of the enrichment sections
+    (``background``, ``technique``, ``pairings``); all pending sections by default.
+    """
+    requested = None
+    if sections:
+        requested = [section.strip() for section in sections.split(",") if section.strip()]
+        unknown = [section for section in requested if section not in RECIPE_ENRICHMENT_SECTIONS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown enrichment sections: {', '.join(unknown)}")
+
+    cache_key = generate_recipe_cache_key(drink_query)
+    recipe_data = await get_cached_recipe(cache_key)
+    if not recipe_data:
+        raise HTTPException(status_code=404, detail="Recipe not found; create it first")
+    try:
+        return await enrich_cached_recipe(cache_key, recipe_data, requested)
+    except Exception as e:
+        logging.error(f"Error enriching drink recipe: {e}")
+        raise HTTPException(status_code=500, detail=f"Error enriching recipe: {str(e)}")
+
+@app.post("/create/stream")
+async def create_drink_stream(drink_query: str = Form(...)):
+    """Stream a drink recipe over SSE, one event per field as soon as the model has written it.
+
+    Sends a ``recipe_field`` event (``field``, ``value``) for each top-level
+    ``GetRecipeParams`` field in the order the model writes them, then
+    ``recipe_complete`` with the same recipe ``/create`` returns, which is
+    saved to the recipe cache. A cached recipe is sent as ``recipe_complete``
+    right away; a cached core recipe from ``/create/core`` first has its core
+    fields sent as ``recipe_field`` events while the pending sections are
+    generated.
+    """
+    cache_key = generate_recipe_cache_key(drink_query)
+
+    async def stream_recipe():
+        arguments = {}
+        async for field, value in stream_recipe_fields(drink_recipe_messages(drink_query)):
+            arguments[field] = value
+            yield sse_event({"type": "recipe_field", "field": field, "value": value})
+        recipe_data = recipe_response_data(parse_recipe_arguments(arguments))
+        await save_recipe_to_cache(cache_key, recipe_data)
+        yield sse_event({"type": "recipe_complete", "recipe": recipe_data, "cached": False})
+
+    async def event_stream():
+        try:
+            cached_recipe = await get_cached_recipe(cache_key)
+            if cached_recipe:
+                if cached_recipe.get("enrichment_pending"):
+                    for field in CoreRecipeParams.model_fields:
+                        if field in cached_recipe:
+                            yield sse_event({"type": "recipe_field", "field": field, "value": cached_recipe[field]})
+                    cached_recipe = await enrich_cached_recipe(cache_key, cached_recipe)
+                yield sse_event({"type": "recipe_complete", "recipe": cached_recipe, "cached": True})
+                return
+            async for frame in recipe_stream_broadcaster.subscribe(cache_key, stream_recipe):
+                yield frame
+        except Exception as e:
+            logging.error(f"Error streaming drink recipe: {e}")
+            yield sse_event({"type": "error", "message": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
 @app.post("/create_from_description")
 async def create_drink_from_description(drink_description: str = Form(...)):
     """Create a custom drink from a free form description."""
@@ -240,48 +700,51 @@ async def create_drink_from_description(drink_description: str = Form(...)):
         cache_key = generate_recipe_cache_key(drink_description)
         print(f"--- Generated recipe cache key: {cache_key} for description ---")
 
-        cached_recipe = await get_cached_recipe(cache_key)
-        if cached_recipe:
-            print("--- Found cached recipe for description, returning cached data ---")
-            return cached_recipe
+        async def build_recipe():
+            cached_recipe = await get_cached_recipe(cache_key)
+            if cached_recipe:
+                print("--- Found cached recipe for description, returning cached data ---")
+                return cached_recipe
 
-        user_query = f"""
-        I want you to act like the world's most important bartender.
-        I'm going to describe the kind of cocktail I want. Use these preferences to invent a brand new drink with a unique name.
-        Description: {drink_description}
-        """
+            user_query = f"""
+            I want you to act like the world's most important bartender.
+            I'm going to describe the kind of cocktail I want. Use these preferences to invent a brand new drink with a unique name.
+            Description: {drink_description}
+            """
 
-        recipe = await get_completion_from_messages([{"role": "user", "content": user_query}])
-
-        recipe_data = {
-            "drink_name": recipe.drink_name,
-            "alcohol_content": recipe.alcohol_content,
-            "serving_glass": recipe.serving_glass,
-            "rim": 'Salted' if recipe.rim else 'No salt',
-            "ingredients": recipe.ingredients,
-            "steps": recipe.steps,
-            "garnish": recipe.garnish,
-            "drink_image_description": recipe.drink_image_description,
-            "drink_history": recipe.drink_history,
-            "brand_recommendations": recipe.brand_recommendations,
-            "ingredient_substitutions": recipe.ingredient_substitutions,
-            "related_cocktails": recipe.related_cocktails,
-            "difficulty_rating": recipe.difficulty_rating,
-            "preparation_time_minutes": recipe.preparation_time_minutes,
-            "equipment_needed": recipe.equipment_needed,
-            "flavor_profile": recipe.flavor_profile,
-            "serving_size_base": recipe.serving_size_base,
-            "phonetic_pronunciations": recipe.phonetic_pronunciations,
-            "enhanced_steps": recipe.enhanced_steps,
-            "suggested_variations": recipe.suggested_variations,
-            "food_pairings": recipe.food_pairings,
-            "optimal_serving_temperature": recipe.optimal_serving_temperature,
-            "skill_level_recommendation": recipe.skill_level_recommendation,
-            "drink_trivia": recipe.drink_trivia,
-        }
+            recipe = await get_completion_from_messages([{"role": "user", "content": user_query}])
 
-        await save_recipe_to_cache(cache_key, recipe_data)
-        return recipe_data
+            recipe_data = {
+                "drink_name": recipe.drink_name,
+                "alcohol_content": recipe.alcohol_content,
+                "serving_glass": recipe.serving_glass,
+                "rim": 'Salted' if recipe.rim else 'No salt',
+                "ingredients": recipe.ingredients,
+                "steps": recipe.steps,
+                "garnish": recipe.garnish,
+                "drink_image_description": recipe.drink_image_description,
+                "drink_history": recipe.drink_history,
+                "brand_recommendations": recipe.brand_recommendations,
+                "ingredient_substitutions": recipe.ingredient_substitutions,
+                "related_cocktails": recipe.related_cocktails,
+                "difficulty_rating": recipe.difficulty_rating,
+                "preparation_time_minutes": recipe.preparation_time_minutes,
+                "equipment_needed": recipe.equipment_needed,
+                "flavor_profile": recipe.flavor_profile,
+                "serving_size_base": recipe.serving_size_base,
+                "phonetic_pronunciations": recipe.phonetic_pronunciations,
+                "enhanced_steps": recipe.enhanced_steps,
+                "suggested_variations": recipe.suggested_variations,
+                "food_pairings": recipe.food_pairings,
+                "optimal_serving_temperature": recipe.optimal_serving_temperature,
+                "skill_level_recommendation": recipe.skill_level_recommendation,
+                "drink_trivia": recipe.drink_trivia,
+            }
+
+            await save_recipe_to_cache(cache_key, recipe_data)
+            return recipe_data
+
+        return await recipe_flight.do(cache_key, build_recipe)
     except Exception as e:
         logging.error(f"Error creating custom drink: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating recipe: {str(e)}")
@@ -294,9 +757,17 @@ async def generate_image_route(
     serving_glass: str = Form(...),
     steps: str = Form(default=""),
     garnish: str = Form(default=""),
-    equipment_needed: str = Form(default="")
+    equipment_needed: str = Form(default=""),
+    prefer_url: bool = Form(default=False),
+    durable: bool = Form(default=False)
 ):
-    """Generate a drink infographic image with streaming partial updates."""
+    """Generate a drink infographic image with streaming partial updates.
+
+    With ``prefer_url`` an already cached image is returned as an
+    ``image_url`` event pointing at GET /images/{cache_key}. With
+    ``durable`` the generation runs as a background job that survives the
+    client disconnecting.
+    """
     print("--- generate_image_route (infographic streaming) called ---")
     
     try:
@@ -312,6 +783,27 @@ async def generate_image_route(
 
         async def event_stream():
             try:
+                if prefer_url:
+                    cache_key = generate_cache_key(image_description, drink_query, normalize_image_ingredients(ingredients_list), serving_glass)
+                    url_events = await cached_image_url_events(cache_key)
+                    if url_events:
+                        for url_event in url_events:
+                            yield url_event
+                        return
+
+                if durable:
+                    async for job_event in queued_image_events("cocktail", {
+                        "prompt": image_description,
+                        "drink_name": drink_query,
+                        "ingredients": ingredients_list,
+                        "serving_glass": serving_glass,
+                        "steps": steps_list,
+                        "garnish": garnish_list,
+                        "equipment_needed": equipment_list,
+                    }):
+                        yield job_event
+                    return
+
                 print(f"--- Starting OpenAI infographic image stream for: {drink_query} ---")
                 async for b64_image_chunk in generate_image_stream(
                     image_description,
@@ -322,20 +814,20 @@ async def generate_image_route(
                     garnish=garnish_list,
                     equipment_needed=equipment_list,
                 ):
-                    sse_event = {"type": "partial_image", "b64_data": b64_image_chunk}
-                    yield f"data: {json.dumps(sse_event)}\n\n"
+                    for frame in PARTIAL_IMAGE_FRAME.frames(b64_image_chunk):
+                        yield frame
                 
                 # After the stream from OpenAI is finished, send a completion event
                 print(f"--- Finished streaming partial infographic images for: {drink_query} ---")
-                yield f"data: {json.dumps({'type': 'stream_complete'})}\n\n"
+                yield STREAM_COMPLETE_EVENT
 
             except Exception as e:
                 print(f"!!! EXCEPTION in event_stream for generate_image_route: {type(e).__name__} - {str(e)} !!!")
                 import traceback
                 traceback.print_exc()
                 # Send an error event over SSE
-                error_event = {"type": "error", "message": str(e)}
-                yield f"data: {json.dumps(error_event)}\n\n"
+                error_event = image_error_event(e)
+                yield sse_event(error_event)
 
         return StreamingResponse(
             event_stream(),
@@ -489,20 +981,36 @@ async def submit_recipe_variation(
 @app.post("/generate_ingredient_image")
 async def generate_ingredient_image(
     ingredient_name: str = Form(...),
-    drink_context: str = Form(default="")
+    drink_context: str = Form(default=""),
+    prefer_url: bool = Form(default=False),
+    durable: bool = Form(default=False)
 ):
     """Generate a standalone ingredient image for reuse across recipes."""
     print(f"--- generate_ingredient_image called for: {ingredient_name} ---")
     
     try:
         # Clean the ingredient name - remove qualifiers and containers
-        clean_name = ingredient_name.replace("Fresh ", "").replace("Dry ", "").replace("Simple ", "").strip()
-        
-        # Remove bottle/container references for pure ingredient images
-        clean_name = clean_name.replace(" bottle", "").replace(" can", "").replace(" jar", "")
+        clean_name = clean_ingredient_image_subject(ingredient_name)
 
         async def event_stream():
             try:
+                if prefer_url:
+                    url_events = await cached_image_url_events(generate_specialized_cache_key(clean_name, "ingredients", "", "ingredient"))
+                    if url_events:
+                        for url_event in url_events:
+                            yield url_event
+                        return
+
+                if durable:
+                    async for job_event in queued_image_events("specialized", {
+                        "subject": clean_name,
+                        "category": "ingredients",
+                        "additional_context": "",
+                        "cache_prefix": "ingredient",
+                    }):
+                        yield job_event
+                    return
+
                 print(f"--- Starting ingredient image stream for: {clean_name} ---")
                 async for b64_image_chunk in generate_specialized_image_stream(
                     subject=clean_name,
@@ -510,18 +1018,18 @@ async def generate_ingredient_image(
                     additional_context="",  # No additional context for reusable images
                     cache_prefix="ingredient"
                 ):
-                    sse_event = {"type": "partial_image", "b64_data": b64_image_chunk}
-                    yield f"data: {json.dumps(sse_event)}\n\n"
+                    for frame in PARTIAL_IMAGE_FRAME.frames(b64_image_chunk):
+                        yield frame
                 
                 print(f"--- Finished streaming ingredient image for: {clean_name} ---")
-                yield f"data: {json.dumps({'type': 'stream_complete'})}\n\n"
+                yield STREAM_COMPLETE_EVENT
 
             except Exception as e:
                 print(f"!!! EXCEPTION in ingredient image stream: {type(e).__name__} - {str(e)} !!!")
                 import traceback
                 traceback.print_exc()
-                error_event = {"type": "error", "message": str(e)}
-                yield f"data: {json.dumps(error_event)}\n\n"
+                error_event = image_error_event(e)
+                yield sse_event(error_event)
 
         return StreamingResponse(
             event_stream(),
@@ -541,7 +1049,9 @@ async def generate_ingredient_image(
 @app.post("/generate_glassware_image")
 async def generate_glassware_image(
     glass_type: str = Form(...),
-    drink_context: str = Form(default="")
+    drink_context: str = Form(default=""),
+    prefer_url: bool = Form(default=False),
+    durable: bool = Form(default=False)
 ):
     """Generate a standalone glassware image for reuse across recipes."""
     print(f"--- generate_glassware_image called for: {glass_type} ---")
@@ -552,6 +1062,23 @@ async def generate_glassware_image(
 
         async def event_stream():
             try:
+                if prefer_url:
+                    url_events = await cached_image_url_events(generate_specialized_cache_key(normalized_glass, "glassware", "", "glassware"))
+                    if url_events:
+                        for url_event in url_events:
+                            yield url_event
+                        return
+
+                if durable:
+                    async for job_event in queued_image_events("specialized", {
+                        "subject": normalized_glass,
+                        "category": "glassware",
+                        "additional_context": "",
+                        "cache_prefix": "glassware",
+                    }):
+                        yield job_event
+                    return
+
                 print(f"--- Starting glassware image stream for: {normalized_glass} ---")
                 async for b64_image_chunk in generate_specialized_image_stream(
                     subject=normalized_glass,
@@ -559,18 +1086,18 @@ async def generate_glassware_image(
                     additional_context="",  # No additional context for reusable images
                     cache_prefix="glassware"
                 ):
-                    sse_event = {"type": "partial_image", "b64_data": b64_image_chunk}
-                    yield f"data: {json.dumps(sse_event)}\n\n"
+                    for frame in PARTIAL_IMAGE_FRAME.frames(b64_image_chunk):
+                        yield frame
                 
                 print(f"--- Finished streaming glassware image for: {normalized_glass} ---")
-                yield f"data: {json.dumps({'type': 'stream_complete'})}\n\n"
+                yield STREAM_COMPLETE_EVENT
 
             except Exception as e:
                 print(f"!!! EXCEPTION in glassware image stream: {type(e).__name__} - {str(e)} !!!")
                 import traceback
                 traceback.print_exc()
-                error_event = {"type": "error", "message": str(e)}
-                yield f"data: {json.dumps(error_event)}\n\n"
+                error_event = image_error_event(e)
+                yield sse_event(error_event)
 
         return StreamingResponse(
             event_stream(),
@@ -590,7 +1117,9 @@ async def generate_glassware_image(
 @app.post("/generate_garnish_image")
 async def generate_garnish_image(
     garnish_description: str = Form(...),
-    preparation_method: str = Form(default="")
+    preparation_method: str = Form(default=""),
+    prefer_url: bool = Form(default=False),
+    durable: bool = Form(default=False)
 ):
     """Generate a standalone garnish image for reuse across recipes."""
     print(f"--- generate_garnish_image called for: {garnish_description} ---")
@@ -603,6 +1132,23 @@ async def generate_garnish_image(
 
         async def event_stream():
             try:
+                if prefer_url:
+                    url_events = await cached_image_url_events(generate_specialized_cache_key(garnish_text, "garnish", "", "garnish"))
+                    if url_events:
+                        for url_event in url_events:
+                            yield url_event
+                        return
+
+                if durable:
+                    async for job_event in queued_image_events("specialized", {
+                        "subject": garnish_text,
+                        "category": "garnish",
+                        "additional_context": "",
+                        "cache_prefix": "garnish",
+                    }):
+                        yield job_event
+                    return
+
                 print(f"--- Starting garnish image stream for: {garnish_text} ---")
                 async for b64_image_chunk in generate_specialized_image_stream(
                     subject=garnish_text,
@@ -610,18 +1156,18 @@ async def generate_garnish_image(
                     additional_context="",  # No additional context for reusable images
                     cache_prefix="garnish"
                 ):
-                    sse_event = {"type": "partial_image", "b64_data": b64_image_chunk}
-                    yield f"data: {json.dumps(sse_event)}\n\n"
+                    for frame in PARTIAL_IMAGE_FRAME.frames(b64_image_chunk):
+                        yield frame
                 
                 print(f"--- Finished streaming garnish image for: {garnish_text} ---")
-                yield f"data: {json.dumps({'type': 'stream_complete'})}\n\n"
+                yield STREAM_COMPLETE_EVENT
 
             except Exception as e:
                 print(f"!!! EXCEPTION in garnish image stream: {type(e).__name__} - {str(e)} !!!")
                 import traceback
                 traceback.print_exc()
-                error_event = {"type": "error", "message": str(e)}
-                yield f"data: {json.dumps(error_event)}\n\n"
+                error_event = image_error_event(e)
+                yield sse_event(error_event)
 
         return StreamingResponse(
             event_stream(),
@@ -641,7 +1187,9 @@ async def generate_garnish_image(
 @app.post("/generate_equipment_image")
 async def generate_equipment_image(
     equipment_name: str = Form(...),
-    equipment_type: str = Form(default="")
+    equipment_type: str = Form(default=""),
+    prefer_url: bool = Form(default=False),
+    durable: bool = Form(default=False)
 ):
     """Generate a standalone equipment image for reuse across recipes."""
     print(f"--- generate_equipment_image called for: {equipment_name} ---")
@@ -652,6 +1200,23 @@ async def generate_equipment_image(
 
         async def event_stream():
             try:
+                if prefer_url:
+                    url_events = await cached_image_url_events(generate_specialized_cache_key(clean_name, "equipment", "", "equipment"))
+                    if url_events:
+                        for url_event in url_events:
+                            yield url_event
+                        return
+
+                if durable:
+                    async for job_event in queued_image_events("specialized", {
+                        "subject": clean_name,
+                        "category": "equipment",
+                        "additional_context": "",
+                        "cache_prefix": "equipment",
+                    }):
+                        yield job_event
+                    return
+
                 print(f"--- Starting equipment image stream for: {clean_name} ---")
                 async for b64_image_chunk in generate_specialized_image_stream(
                     subject=clean_name,
@@ -659,18 +1224,18 @@ async def generate_equipment_image(
                     additional_context="",  # No additional context for reusable images
                     cache_prefix="equipment"
                 ):
-                    sse_event = {"type": "partial_image", "b64_data": b64_image_chunk}
-                    yield f"data: {json.dumps(sse_event)}\n\n"
+                    for frame in PARTIAL_IMAGE_FRAME.frames(b64_image_chunk):
+                        yield frame
                 
                 print(f"--- Finished streaming equipment image for: {clean_name} ---")
-                yield f"data: {json.dumps({'type': 'stream_complete'})}\n\n"
+                yield STREAM_COMPLETE_EVENT
 
             except Exception as e:
                 print(f"!!! EXCEPTION in equipment image stream: {type(e).__name__} - {str(e)} !!!")
                 import traceback
                 traceback.print_exc()
-                error_event = {"type": "error", "message": str(e)}
-                yield f"data: {json.dumps(error_event)}\n\n"
+                error_event = image_error_event(e)
+                yield sse_event(error_event)
 
         return StreamingResponse(
             event_stream(),
@@ -711,16 +1276,16 @@ async def generate_method_image(
                     ingredients=ingredient_list,
                     equipment=equipment_list,
                 ):
-                    sse_event = {"type": "partial_image", "b64_data": b64_chunk}
-                    yield f"data: {json.dumps(sse_event)}\n\n"
+                    for frame in PARTIAL_IMAGE_FRAME.frames(b64_chunk):
+                        yield frame
 
-                yield f"data: {json.dumps({'type': 'stream_complete'})}\n\n"
+                yield STREAM_COMPLETE_EVENT
             except Exception as e:
                 print(f"!!! EXCEPTION in method image stream: {type(e).__name__} - {str(e)} !!!")
                 import traceback
                 traceback.print_exc()
-                error_event = {"type": "error", "message": str(e)}
-                yield f"data: {json.dumps(error_event)}\n\n"
+                error_event = image_error_event(e)
+                yield sse_event(error_event)
 
         return StreamingResponse(
             event_stream(),
@@ -737,12 +1302,105 @@ async def generate_method_image(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error generating method image: {str(e)}")
 
+@app.post("/generate_method_images")
+async def generate_method_images(
+    steps: str = Form(...),
+    drink_name: str = Form(default=""),
+    ingredients: str = Form(default=""),
+    equipment: str = Form(default=""),
+    max_concurrency: int = Form(default=RECIPE_VISUALS_MAX_CONCURRENCY),
+):
+    """Generate images for all of a recipe's method steps on one SSE stream.
+
+    ``steps`` is a JSON list of step texts. Cached step images are resolved
+    in two batched lookups and sent first; the rest are generated
+    concurrently. Steps with the same canonical text share one generation.
+    Every event carries the ``step_index`` it belongs to, and each step ends
+    with a ``step_complete`` event.
+    """
+    try:
+        step_list = json.loads(steps)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="steps must be a JSON list of strings")
+    if not isinstance(step_list, list) or not all(isinstance(step, str) for step in step_list):
+        raise HTTPException(status_code=400, detail="steps must be a JSON list of strings")
+
+    ingredient_list = [i.strip() for i in ingredients.split(",") if i.strip()] if ingredients else []
+    equipment_list = [e.strip() for e in equipment.split(",") if e.strip()] if equipment else []
+
+    async def event_stream():
+        started_at = time.monotonic()
+        frames = [PayloadEventFrame(type="partial_image", step_index=index) for index in range(len(step_list))]
+        try:
+            cached = await get_cached_step_images(step_list)
+            for step_index, b64_image in sorted(cached.items()):
+                for frame in frames[step_index].frames(b64_image):
+                    yield frame
+                yield sse_event({"type": "step_complete", "step_index": step_index, "cached": True})
+
+            # Group the misses so repeated steps (and steps showing the same library technique) are generated once
+            misses: Dict[str, List[int]] = {}
+            for step_index, step_text in enumerate(step_list):
+                if step_index not in cached:
+                    group = technique_library_key(step_text) or step_image_hash(step_text)
+                    misses.setdefault(group, []).append(step_index)
+            sources = [
+                (
+                    tuple(indices),
+                    partial(
+                        generate_method_image_stream,
+                        step_list[indices[0]],
+                        indices[0],
+                        drink_name=drink_name,
+                        ingredients=ingredient_list,
+                        equipment=equipment_list,
+                        check_cache=False,
+                    ),
+                )
+                for indices in misses.values()
+            ]
+            async for merged in merge_streams(sources, max_concurrency):
+                for step_index in merged.tag:
+                    if not merged.done:
+                        for frame in frames[step_index].frames(merged.item):
+                            yield frame
+                    elif merged.error:
+                        yield sse_event({"type": "error", "step_index": step_index, "message": str(merged.error)})
+                    else:
+                        yield sse_event({"type": "step_complete", "step_index": step_index, "cached": False})
+
+            complete_event = {
+                "type": "stream_complete",
+                "cached_steps": len(cached),
+                "generated_steps": len(step_list) - len(cached),
+                "total_seconds": round(time.monotonic() - started_at, 3),
+            }
+            yield sse_event(complete_event)
+        except Exception as e:
+            print(f"!!! EXCEPTION in method images stream: {type(e).__name__} - {str(e)} !!!")
+            yield sse_event({"type": "error", "message": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
 @app.post("/generate_recipe_visuals")
 async def generate_recipe_visuals(
     recipe_data: str = Form(...),
-    image_types: str = Form(default="cocktail,ingredients,glassware")
+    image_types: str = Form(default="cocktail,ingredients,glassware"),
+    max_concurrency: int = Form(default=RECIPE_VISUALS_MAX_CONCURRENCY)
 ):
-    """Generate multiple images for a complete recipe visual package."""
+    """Generate multiple images for a complete recipe visual package.
+
+    Components are generated concurrently (at most ``max_concurrency`` at a
+    time) and their partial images are interleaved onto one SSE stream.
+    Components that are already cached are sent first.
+    """
     print(f"--- generate_recipe_visuals called with types: {image_types} ---")
     
     try:
@@ -754,94 +1412,150 @@ async def generate_recipe_visuals(
         
         # Parse requested image types
         requested_types = [t.strip() for t in image_types.split(",")]
-        
+
+        # Each component is (component_id, cache_key, stream_factory, event_fields)
+        components = []
+
+        if "cocktail" in requested_types:
+            components.append((
+                "cocktail",
+                generate_cache_key(
+                    recipe.get('drink_image_description', ''),
+                    recipe.get('drink_name', ''),
+                    normalize_image_ingredients(recipe.get('ingredients', [])),
+                    recipe.get('serving_glass', '')
+                ),
+                partial(
+                    generate_image_stream,
+                    prompt=recipe.get('drink_image_description', ''),
+                    drink_name=recipe.get('drink_name', ''),
+                    ingredients=recipe.get('ingredients', []),
+                    serving_glass=recipe.get('serving_glass', '')
+                ),
+                {"type": "cocktail_image", "image_type": "cocktail"},
+            ))
+
+        def add_specialized(component_id, subject, category, additional_context, cache_prefix, event_fields):
+            components.append((
+                component_id,
+                generate_specialized_cache_key(subject, category, additional_context, cache_prefix),
+                partial(
+                    generate_specialized_image_stream,
+                    subject=subject,
+                    category=category,
+                    additional_context=additional_context,
+                    cache_prefix=cache_prefix
+                ),
+                event_fields,
+            ))
+
+        if "ingredients" in requested_types:
+            ingredients = recipe.get('ingredients', [])[:3]  # Limit to first 3 ingredients
+            for i, ingredient in enumerate(ingredients):
+                ingredient_name = parse_ingredient_name(ingredient)
+                add_specialized(
+                    f"ingredient_{i}",
+                    f"{ingredient_name} bottle",
+                    "ingredients",
+                    f"for {recipe.get('drink_name', '')} cocktail",
+                    "ingredient",
+                    {
+                        "type": "ingredient_image",
+                        "image_type": "ingredient",
+                        "ingredient_name": ingredient_name,
+                        "ingredient_index": i,
+                    },
+                )
+
+        if "glassware" in requested_types:
+            glass_type = recipe.get('serving_glass', '')
+            if glass_type:
+                normalized_glass = normalize_glass_name(glass_type)
+                add_specialized(
+                    "glassware",
+                    normalized_glass,
+                    "glassware",
+                    f"perfect for {recipe.get('drink_name', '')}",
+                    "glassware",
+                    {"type": "glassware_image", "image_type": "glassware", "glass_type": normalized_glass},
+                )
+
+        if "garnish" in requested_types:
+            garnishes = recipe.get('garnish', [])
+            if garnishes and len(garnishes) > 0:
+                garnish = garnishes[0] if isinstance(garnishes, list) else str(garnishes)
+                add_specialized(
+                    "garnish",
+                    garnish,
+                    "garnish",
+                    "cocktail garnish, fresh and vibrant",
+                    "garnish",
+                    {"type": "garnish_image", "image_type": "garnish", "garnish_description": garnish},
+                )
+
         async def event_stream():
             try:
-                # Generate main cocktail image first (highest priority)
-                if "cocktail" in requested_types:
-                    print(f"--- Generating cocktail image for: {recipe.get('drink_name', 'Unknown')} ---")
-                    async for b64_chunk in generate_image_stream(
-                        prompt=recipe.get('drink_image_description', ''),
-                        drink_name=recipe.get('drink_name', ''),
-                        ingredients=recipe.get('ingredients', []),
-                        serving_glass=recipe.get('serving_glass', '')
-                    ):
-                        sse_event = {"type": "cocktail_image", "image_type": "cocktail", "b64_data": b64_chunk}
-                        yield f"data: {json.dumps(sse_event)}\n\n"
-                
-                # Generate ingredient images
-                if "ingredients" in requested_types:
-                    ingredients = recipe.get('ingredients', [])[:3]  # Limit to first 3 ingredients
-                    for i, ingredient in enumerate(ingredients):
-                        ingredient_name = parse_ingredient_name(ingredient)
-                        print(f"--- Generating ingredient image {i+1}/{len(ingredients)} for: {ingredient_name} ---")
-                        
-                        async for b64_chunk in generate_specialized_image_stream(
-                            subject=f"{ingredient_name} bottle",
-                            category="ingredients",
-                            additional_context=f"for {recipe.get('drink_name', '')} cocktail",
-                            cache_prefix="ingredient"
-                        ):
-                            sse_event = {
-                                "type": "ingredient_image", 
-                                "image_type": "ingredient",
-                                "ingredient_name": ingredient_name,
-                                "ingredient_index": i,
-                                "b64_data": b64_chunk
-                            }
-                            yield f"data: {json.dumps(sse_event)}\n\n"
-                
-                # Generate glassware image
-                if "glassware" in requested_types:
-                    glass_type = recipe.get('serving_glass', '')
-                    if glass_type:
-                        normalized_glass = normalize_glass_name(glass_type)
-                        print(f"--- Generating glassware image for: {normalized_glass} ---")
-                        
-                        async for b64_chunk in generate_specialized_image_stream(
-                            subject=normalized_glass,
-                            category="glassware",
-                            additional_context=f"perfect for {recipe.get('drink_name', '')}",
-                            cache_prefix="glassware"
-                        ):
-                            sse_event = {
-                                "type": "glassware_image",
-                                "image_type": "glassware", 
-                                "glass_type": normalized_glass,
-                                "b64_data": b64_chunk
-                            }
-                            yield f"data: {json.dumps(sse_event)}\n\n"
-                
-                # Generate garnish image
-                if "garnish" in requested_types:
-                    garnishes = recipe.get('garnish', [])
-                    if garnishes and len(garnishes) > 0:
-                        garnish = garnishes[0] if isinstance(garnishes, list) else str(garnishes)
-                        print(f"--- Generating garnish image for: {garnish} ---")
-                        
-                        async for b64_chunk in generate_specialized_image_stream(
-                            subject=garnish,
-                            category="garnish",
-                            additional_context="cocktail garnish, fresh and vibrant",
-                            cache_prefix="garnish"
-                        ):
-                            sse_event = {
-                                "type": "garnish_image",
-                                "image_type": "garnish",
-                                "garnish_description": garnish,
-                                "b64_data": b64_chunk
-                            }
-                            yield f"data: {json.dumps(sse_event)}\n\n"
+                started_at = time.monotonic()
+                timings = {}
+
+                # Send cached components immediately, ahead of anything that needs generating
+                cached_images = await asyncio.gather(
+                    *(get_cached_image(cache_key) for _, cache_key, _, _ in components)
+                )
+                uncached = []
+                for (component_id, _, stream_factory, event_fields), cached_image in zip(components, cached_images):
+                    if cached_image:
+                        for frame in PayloadEventFrame(**event_fields).frames(cached_image):
+                            yield frame
+                        timings[component_id] = {
+                            "seconds": round(time.monotonic() - started_at, 3),
+                            "cached": True,
+                            "status": "ok",
+                        }
+                    else:
+                        uncached.append((component_id, stream_factory, event_fields))
+
+                print(f"--- {len(components) - len(uncached)} cached, generating {len(uncached)} recipe visuals (max {max_concurrency} at once) ---")
+
+                event_fields_by_id = {component_id: event_fields for component_id, _, event_fields in uncached}
+                frame_by_id = {component_id: PayloadEventFrame(**event_fields) for component_id, _, event_fields in uncached}
+                async for merged in merge_streams(
+                    [(component_id, stream_factory) for component_id, stream_factory, _ in uncached],
+                    max_concurrency,
+                ):
+                    if not merged.done:
+                        for frame in frame_by_id[merged.tag].frames(merged.item):
+                            yield frame
+                        continue
+
+                    timings[merged.tag] = {
+                        "seconds": round(time.monotonic() - started_at, 3),
+                        "cached": False,
+                        "status": "error" if merged.error else "ok",
+                    }
+                    if merged.error:
+                        print(f"!!! EXCEPTION generating {merged.tag} visual: {type(merged.error).__name__} - {str(merged.error)} !!!")
+                        error_event = image_error_event(
+                            merged.error,
+                            image_type=event_fields_by_id[merged.tag]["image_type"],
+                            component=merged.tag,
+                        )
+                        yield sse_event(error_event)
                 
                 print(f"--- Finished generating recipe visuals package ---")
-                yield f"data: {json.dumps({'type': 'all_complete'})}\n\n"
+                complete_event = {
+                    "type": "all_complete",
+                    "timings": timings,
+                    "total_seconds": round(time.monotonic() - started_at, 3),
+                }
+                yield sse_event(complete_event)
 
             except Exception as e:
                 print(f"!!! EXCEPTION in recipe visuals generation: {type(e).__name__} - {str(e)} !!!")
                 import traceback
                 traceback.print_exc()
-                error_event = {"type": "error", "message": str(e)}
-                yield f"data: {json.dumps(error_event)}\n\n"
+                error_event = image_error_event(e)
+                yield sse_event(error_event)
 
         return StreamingResponse(
             event_stream(),
@@ -1102,103 +1816,106 @@ async def create_drink_with_inventory_filter(
         cache_key = generate_recipe_cache_key(drink_query + cache_key_suffix)
         print(f"--- Generated inventory-aware cache key: {cache_key} for query: {drink_query} ---")
         
-        # Check for cached recipe first
-        cached_recipe = await get_cached_recipe(cache_key)
-        if cached_recipe:
-            print(f"--- Found cached inventory-aware recipe for {drink_query}, returning cached data ---")
-            return cached_recipe
+        async def build_recipe():
+            # Check for cached recipe first
+            cached_recipe = await get_cached_recipe(cache_key)
+            if cached_recipe:
+                print(f"--- Found cached inventory-aware recipe for {drink_query}, returning cached data ---")
+                return cached_recipe
         
-        print(f"--- No cached inventory-aware recipe found for {drink_query}, generating new recipe ---")
+            print(f"--- No cached inventory-aware recipe found for {drink_query}, generating new recipe ---")
         
-        # Get available inventory
-        ingredients_part = ""
-        availability_context = ""
+            # Get available inventory
+            ingredients_part = ""
+            availability_context = ""
         
-        if limit_to_inventory:
-            try:
-                available_items = await InventoryService.get_all_items()
-                if available_items:
-                    # Get available ingredients (not empty or almost empty)
-                    available_ingredients = [
-                        item.name for item in available_items 
-                        if item.quantity not in ['empty', 'almost_empty']
-                    ]
+            if limit_to_inventory:
+                try:
+                    available_items = await InventoryService.get_all_items()
+                    if available_items:
+                        # Get available ingredients (not empty or almost empty)
+                        available_ingredients = [
+                            item.name for item in available_items 
+                            if item.quantity not in ['empty', 'almost_empty']
+                        ]
                     
-                    if available_ingredients:
-                        ingredients_part = f"IMPORTANT: Only use ingredients I have available: {', '.join(available_ingredients)}\n"
-                        availability_context = "Focus on creating a recipe using only the available ingredients listed above."
+                        if available_ingredients:
+                            ingredients_part = f"IMPORTANT: Only use ingredients I have available: {', '.join(available_ingredients)}\n"
+                            availability_context = "Focus on creating a recipe using only the available ingredients listed above."
                         
-                        if allow_substitutions:
-                            availability_context += " If you need to make substitutions, suggest common alternatives that might be available."
+                            if allow_substitutions:
+                                availability_context += " If you need to make substitutions, suggest common alternatives that might be available."
+                        else:
+                            ingredients_part = "No ingredients currently available in inventory.\n"
+                            availability_context = "Suggest a simple recipe with common ingredients that the user should stock."
                     else:
-                        ingredients_part = "No ingredients currently available in inventory.\n"
-                        availability_context = "Suggest a simple recipe with common ingredients that the user should stock."
-                else:
-                    availability_context = "Inventory is empty. Suggest essential ingredients for this drink."
-            except Exception as e:
-                print(f"Error getting inventory: {e}")
-                # Fallback to normal recipe generation
+                        availability_context = "Inventory is empty. Suggest essential ingredients for this drink."
+                except Exception as e:
+                    print(f"Error getting inventory: {e}")
+                    # Fallback to normal recipe generation
         
-        # Enhanced OpenAI prompt with inventory awareness
-        user_query = f"""
-        I want you to act like the world's most important bartender. 
-        You're the bartender that will carry on the culture of bartending for the entire world. 
-        I'm going to tell you the name of a drink, and you need to create the best representation of that drink based on its name alone. 
-        It's possible that this drink is unknown; you will still respond. 
-        {ingredients_part}
-        {availability_context}
-        The drink I want you to tell me about is: {drink_query}
-        """
+            # Enhanced OpenAI prompt with inventory awareness
+            user_query = f"""
+            I want you to act like the world's most important bartender. 
+            You're the bartender that will carry on the culture of bartending for the entire world. 
+            I'm going to tell you the name of a drink, and you need to create the best representation of that drink based on its name alone. 
+            It's possible that this drink is unknown; you will still respond. 
+            {ingredients_part}
+            {availability_context}
+            The drink I want you to tell me about is: {drink_query}
+            """
         
-        recipe = await get_completion_from_messages([{"role": "user", "content": user_query}])
+            recipe = await get_completion_from_messages([{"role": "user", "content": user_query}])
         
-        # Enhanced recipe data with inventory context
-        recipe_data = {
-            # Original fields from OpenAI
-            "drink_name": recipe.drink_name,
-            "alcohol_content": recipe.alcohol_content,
-            "serving_glass": recipe.serving_glass,
-            "rim": 'Salted' if recipe.rim else 'No salt',
-            "ingredients": recipe.ingredients,
-            "steps": recipe.steps,
-            "garnish": recipe.garnish,
-            "drink_image_description": recipe.drink_image_description,
-            "drink_history": recipe.drink_history,
+            # Enhanced recipe data with inventory context
+            recipe_data = {
+                # Original fields from OpenAI
+                "drink_name": recipe.drink_name,
+                "alcohol_content": recipe.alcohol_content,
+                "serving_glass": recipe.serving_glass,
+                "rim": 'Salted' if recipe.rim else 'No salt',
+                "ingredients": recipe.ingredients,
+                "steps": recipe.steps,
+                "garnish": recipe.garnish,
+                "drink_image_description": recipe.drink_image_description,
+                "drink_history": recipe.drink_history,
             
-            # Enhanced fields
-            "brand_recommendations": recipe.brand_recommendations,
-            "ingredient_substitutions": recipe.ingredient_substitutions,
-            "related_cocktails": recipe.related_cocktails,
-            "difficulty_rating": recipe.difficulty_rating,
-            "preparation_time_minutes": recipe.preparation_time_minutes,
-            "equipment_needed": recipe.equipment_needed,
-            "flavor_profile": recipe.flavor_profile,
-            "serving_size_base": recipe.serving_size_base,
-            "phonetic_pronunciations": recipe.phonetic_pronunciations,
-            "enhanced_steps": recipe.enhanced_steps,
-            "suggested_variations": recipe.suggested_variations,
-            "food_pairings": recipe.food_pairings,
-            "optimal_serving_temperature": recipe.optimal_serving_temperature,
-            "skill_level_recommendation": recipe.skill_level_recommendation,
-            "drink_trivia": recipe.drink_trivia,
+                # Enhanced fields
+                "brand_recommendations": recipe.brand_recommendations,
+                "ingredient_substitutions": recipe.ingredient_substitutions,
+                "related_cocktails": recipe.related_cocktails,
+                "difficulty_rating": recipe.difficulty_rating,
+                "preparation_time_minutes": recipe.preparation_time_minutes,
+                "equipment_needed": recipe.equipment_needed,
+                "flavor_profile": recipe.flavor_profile,
+                "serving_size_base": recipe.serving_size_base,
+                "phonetic_pronunciations": recipe.phonetic_pronunciations,
+                "enhanced_steps": recipe.enhanced_steps,
+                "suggested_variations": recipe.suggested_variations,
+                "food_pairings": recipe.food_pairings,
+                "optimal_serving_temperature": recipe.optimal_serving_temperature,
+                "skill_level_recommendation": recipe.skill_level_recommendation,
+                "drink_trivia": recipe.drink_trivia,
             
-            # Inventory-specific fields
-            "created_with_inventory_filter": limit_to_inventory,
-            "allows_substitutions": allow_substitutions,
-        }
+                # Inventory-specific fields
+                "created_with_inventory_filter": limit_to_inventory,
+                "allows_substitutions": allow_substitutions,
+            }
         
-        # Check availability of this recipe if inventory filtering was used
-        if limit_to_inventory:
-            try:
-                availability = await InventoryService.check_recipe_availability(recipe.ingredients)
-                recipe_data["inventory_availability"] = availability
-            except Exception as e:
-                print(f"Error checking recipe availability: {e}")
+            # Check availability of this recipe if inventory filtering was used
+            if limit_to_inventory:
+                try:
+                    availability = await InventoryService.check_recipe_availability(recipe.ingredients)
+                    recipe_data["inventory_availability"] = availability
+                except Exception as e:
+                    print(f"Error checking recipe availability: {e}")
         
-        # Save the new recipe to cache
-        await save_recipe_to_cache(cache_key, recipe_data)
+            # Save the new recipe to cache
+            await save_recipe_to_cache(cache_key, recipe_data)
         
-        return recipe_data
+            return recipe_data
+
+        return await recipe_flight.do(cache_key, build_recipe)
     except Exception as e:
         logging.error(f"Error creating inventory-aware drink recipe: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating recipe: {str(e)}")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model
 from typing import List, Dict, Optional
 
 class Ingredient(BaseModel):
@@ -78,3 +78,41 @@ class GetRecipeParams(BaseModel):
     skill_level_recommendation: str = Field("", description="Recommended skill level for home bartenders")
     drink_trivia: List[TriviaFact] = Field(default_factory=list, description="3-5 interesting trivia facts about the drink covering history, culture, ingredients, celebrities, or fun preparation facts")
 
+
+def _recipe_section_model(name: str, field_names: List[str], doc: str):
+    """A model with a subset of GetRecipeParams' fields, sharing their types and descriptions."""
+    fields = {field: (GetRecipeParams.model_fields[field].annotation, GetRecipeParams.model_fields[field]) for field in field_names}
+    return create_model(name, __doc__=doc, **fields)
+
+
+# Tiered recipe generation: a compact core recipe first, then the enrichment
+# sections generated concurrently and merged into it.
+CoreRecipeParams = _recipe_section_model(
+    "CoreRecipeParams",
+    ["drink_name", "ingredients", "alcohol_content", "steps", "rim", "garnish", "serving_glass", "drink_image_description"],
+    "The core recipe a user needs to make the drink.",
+)
+RecipeBackgroundParams = _recipe_section_model(
+    "RecipeBackgroundParams",
+    ["drink_history", "drink_trivia", "phonetic_pronunciations", "related_cocktails"],
+    "History, trivia, pronunciations and related cocktails.",
+)
+RecipeTechniqueParams = _recipe_section_model(
+    "RecipeTechniqueParams",
+    [
+        "enhanced_steps", "equipment_needed", "difficulty_rating", "preparation_time_minutes",
+        "skill_level_recommendation", "optimal_serving_temperature", "serving_size_base",
+    ],
+    "Detailed technique, equipment, difficulty and serving information.",
+)
+RecipePairingParams = _recipe_section_model(
+    "RecipePairingParams",
+    ["flavor_profile", "brand_recommendations", "ingredient_substitutions", "suggested_variations", "food_pairings"],
+    "Flavor profile, brands, substitutions, variations and food pairings.",
+)
+
+RECIPE_ENRICHMENT_SECTIONS = {
+    "background": RecipeBackgroundParams,
+    "technique": RecipeTechniqueParams,
+    "pairings": RecipePairingParams,
+}
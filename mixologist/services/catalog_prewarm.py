@@ -0,0 +1,248 @@
+"""Pre-generate the reusable catalog images referenced by stored recipes.
+
+Ingredient, glassware, garnish and equipment images are cached by subject
+name, so one image serves every recipe that uses the item. This job walks
+the ``recipes`` table, derives the same cache keys the ``/generate_*_image``
+routes use, and generates every image that is not cached yet, so
+interactive requests rarely wait on image generation for common items.
+
+Generation is rate limited and runs a few items at a time. The job is
+resumable: every item is checked against the image cache before it is
+generated, so a stopped or crashed run can simply be started again and
+will only do the remaining work.
+
+``--technique-library`` builds the fixed technique images used for common
+method steps (shake, stir, strain into a coupe...) instead.
+
+Usage:
+    python -m mixologist.services.catalog_prewarm [--rate-per-minute 10] [--concurrency 2] [--dry-run] [--technique-library]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Optional
+
+from .openai_service import (
+    TECHNIQUE_LIBRARY,
+    TECHNIQUE_LIBRARY_PREFIX,
+    clean_ingredient_image_subject,
+    generate_specialized_cache_key,
+    generate_specialized_image_stream,
+    normalize_glass_name,
+)
+from .image_store import image_store
+from .openai_scheduler import BACKGROUND_LANE, openai_scheduling
+from ..database.config import get_db_session
+from ..database.service import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PREWARM_RATE_PER_MINUTE = float(os.getenv("CATALOG_PREWARM_RATE_PER_MINUTE", "10"))
+CATALOG_PREWARM_CONCURRENCY = int(os.getenv("CATALOG_PREWARM_CONCURRENCY", "2"))
+
+# One reusable image: the arguments /generate_*_image passes to generate_specialized_image_stream
+CatalogItem = namedtuple("CatalogItem", ["cache_key", "subject", "category", "cache_prefix"])
+
+
+def _catalog_item(subject: str, category: str, cache_prefix: str) -> CatalogItem:
+    return CatalogItem(generate_specialized_cache_key(subject, category, "", cache_prefix), subject, category, cache_prefix)
+
+
+def _item_names(values: Any, name_field: str) -> List[str]:
+    """Return the names in a recipe list field that holds strings or dicts."""
+    if not values:
+        return []
+    if not isinstance(values, list):
+        values = [values]
+    names = []
+    for value in values:
+        name = value.get(name_field, "") if isinstance(value, dict) else str(value)
+        if name and name.strip():
+            names.append(name)
+    return names
+
+
+def catalog_items_from_recipes(recipes: Iterable[Dict[str, Any]]) -> List[CatalogItem]:
+    """Return the distinct reusable images referenced by the given recipes."""
+    items: Dict[str, CatalogItem] = {}
+    for recipe in recipes:
+        candidates = []
+        for name in _item_names(recipe.get("ingredients"), "name"):
+            candidates.append(_catalog_item(clean_ingredient_image_subject(name), "ingredients", "ingredient"))
+        if recipe.get("serving_glass"):
+            candidates.append(_catalog_item(normalize_glass_name(recipe["serving_glass"]), "glassware", "glassware"))
+        for garnish in _item_names(recipe.get("garnish"), "name"):
+            candidates.append(_catalog_item(garnish.strip(), "garnish", "garnish"))
+        for equipment in _item_names(recipe.get("equipment_needed"), "item"):
+            candidates.append(_catalog_item(equipment.strip(), "equipment", "equipment"))
+        for item in candidates:
+            items.setdefault(item.cache_key, item)
+    return sorted(items.values(), key=lambda item: (item.category, item.subject.lower()))
+
+
+def technique_library_items() -> List[CatalogItem]:
+    """Return the technique library images, as generate_method_image_stream would request them."""
+    items = {_catalog_item(subject, "technique", TECHNIQUE_LIBRARY_PREFIX) for subject in TECHNIQUE_LIBRARY.values()}
+    return sorted(items, key=lambda item: item.subject)
+
+
+async def load_catalog_items(page_size: int = 200) -> List[CatalogItem]:
+    """Walk every stored recipe and collect its reusable images."""
+    recipes = []
+    offset = 0
+    async with get_db_session() as session:
+        db_service = DatabaseService(session)
+        while True:
+            page = await db_service.get_all_recipes(limit=page_size, offset=offset)
+            recipes.extend(page)
+            if len(page) < page_size:
+                break
+            offset += page_size
+    logger.info(f"Loaded {len(recipes)} recipes for catalog pre-warm")
+    return catalog_items_from_recipes(recipes)
+
+
+class _IntervalRateLimiter:
+    """Space out acquisitions so at most ``rate_per_minute`` happen per minute."""
+
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CatalogPrewarmer:
+    """Generates missing catalog images in the background and tracks progress."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.progress: Dict[str, Any] = {"state": "idle"}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(
+        self,
+        rate_per_minute: float = CATALOG_PREWARM_RATE_PER_MINUTE,
+        concurrency: int = CATALOG_PREWARM_CONCURRENCY,
+        items: Optional[List[CatalogItem]] = None,
+    ) -> bool:
+        """Start a pre-warm run in the background. Returns False if one is already running."""
+        if self.running:
+            return False
+        self._task = asyncio.ensure_future(self.run(rate_per_minute, concurrency, items))
+        return True
+
+    def stop(self) -> bool:
+        if not self.running:
+            return False
+        self._task.cancel()
+        return True
+
+    async def run(
+        self,
+        rate_per_minute: float = CATALOG_PREWARM_RATE_PER_MINUTE,
+        concurrency: int = CATALOG_PREWARM_CONCURRENCY,
+        items: Optional[List[CatalogItem]] = None,
+    ) -> Dict[str, Any]:
+        started_at = time.time()
+        self.progress = {
+            "state": "loading",
+            "started_at": started_at,
+            "finished_at": None,
+            "total": 0,
+            "processed": 0,
+            "already_cached": 0,
+            "generated": 0,
+            "failed": 0,
+            "in_progress": [],
+            "errors": {},
+        }
+        try:
+            if items is None:
+                items = await load_catalog_items()
+            self.progress["total"] = len(items)
+            self.progress["state"] = "running"
+            limiter = _IntervalRateLimiter(rate_per_minute)
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+            # Yield to interactive requests in the shared OpenAI scheduler
+            with openai_scheduling(lane=BACKGROUND_LANE, flow="catalog_prewarm"):
+                await asyncio.gather(*(self._prewarm_item(item, limiter, semaphore) for item in items))
+            self.progress["state"] = "completed"
+        except asyncio.CancelledError:
+            self.progress["state"] = "stopped"
+            raise
+        except Exception as e:
+            logger.error(f"Catalog pre-warm failed: {type(e).__name__} - {e}")
+            self.progress["state"] = "failed"
+            self.progress["errors"]["_run"] = str(e)
+        finally:
+            self.progress["finished_at"] = time.time()
+            self.progress["in_progress"] = []
+            logger.info(f"Catalog pre-warm {self.progress['state']}: {self.progress}")
+        return self.progress
+
+    async def _prewarm_item(self, item: CatalogItem, limiter: _IntervalRateLimiter, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            try:
+                if await image_store.exists(item.cache_key):
+                    self.progress["already_cached"] += 1
+                    return
+                # Only generations count against the rate limit; cache checks are cheap
+                await limiter.acquire()
+                label = f"{item.category}:{item.subject}"
+                self.progress["in_progress"].append(label)
+                try:
+                    async for _ in generate_specialized_image_stream(
+                        subject=item.subject,
+                        category=item.category,
+                        additional_context="",
+                        cache_prefix=item.cache_prefix,
+                    ):
+                        pass
+                finally:
+                    self.progress["in_progress"].remove(label)
+                self.progress["generated"] += 1
+                logger.info(f"Pre-warmed {label} ({item.cache_key})")
+            except Exception as e:
+                self.progress["failed"] += 1
+                self.progress["errors"][item.cache_key] = f"{type(e).__name__}: {e}"
+                logger.warning(f"Could not pre-warm {item.category} image for {item.subject}: {e}")
+            finally:
+                self.progress["processed"] += 1
+
+
+catalog_prewarmer = CatalogPrewarmer()
+
+
+async def _main(args: argparse.Namespace) -> None:
+    items = technique_library_items() if args.technique_library else await load_catalog_items()
+    if args.dry_run:
+        missing = [item for item in items if not await image_store.exists(item.cache_key)]
+        for item in missing:
+            print(f"{item.category}\t{item.subject}\t{item.cache_key}")
+        print(f"{len(missing)} of {len(items)} catalog images missing")
+        return
+    print(await catalog_prewarmer.run(args.rate_per_minute, args.concurrency, items))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate-per-minute", type=float, default=CATALOG_PREWARM_RATE_PER_MINUTE, help="Maximum image generations started per minute")
+    parser.add_argument("--concurrency", type=int, default=CATALOG_PREWARM_CONCURRENCY, help="Images generated at the same time")
+    parser.add_argument("--dry-run", action="store_true", help="List the missing images without generating them")
+    parser.add_argument("--technique-library", action="store_true", help="Build the technique image library instead of recipe catalog images")
+    asyncio.run(_main(parser.parse_args()))
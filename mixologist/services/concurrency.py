@@ -0,0 +1,207 @@
+"""Async concurrency primitives shared by the API routes and services."""
+import asyncio
+import logging
+from collections import namedtuple
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _InFlightCall:
+    """Book-keeping for one in-flight single-flight call."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 1
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key becomes the leader and starts the work as a
+    task; every caller that arrives while that task is running awaits the
+    same result instead of repeating the work. The task is shielded so a
+    disconnecting leader does not cancel the result other waiters need.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _InFlightCall] = {}
+        self.executions = 0
+        self.coalesced_hits = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is not None:
+            call.waiters += 1
+            self.coalesced_hits += 1
+            logger.debug(f"[{self.name}] coalescing onto in-flight call {key} ({call.waiters} waiters)")
+        else:
+            call = _InFlightCall(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            self.executions += 1
+            call.task.add_done_callback(lambda t, key=key: self._finish(key, t))
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            # Count only callers still waiting, whether they got the result or disconnected
+            call.waiters -= 1
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            del self._calls[key]
+        # Retrieve the exception so an unobserved failure is not reported as
+        # "never retrieved" when every waiter has gone away.
+        if not task.cancelled():
+            task.exception()
+
+    def waiter_counts(self) -> Dict[str, int]:
+        """Return the number of callers currently waiting on each in-flight key."""
+        return {key: call.waiters for key, call in self._calls.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "executions": self.executions,
+            "coalesced_hits": self.coalesced_hits,
+            "in_flight": self.waiter_counts(),
+        }
+
+
+class _Broadcast:
+    """One upstream stream whose items are replayed to every subscriber."""
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._wakeup = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def run(self, source: AsyncIterator[Any]) -> None:
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        self.subscribers += 1
+        try:
+            index = 0
+            while True:
+                while index >= len(self.items) and not self.done:
+                    await self._wakeup.wait()
+                pending = self.items[index:]
+                index += len(pending)
+                finished = self.done and index >= len(self.items)
+                for item in pending:
+                    yield item
+                if finished:
+                    break
+            if self.error is not None:
+                raise self.error
+        finally:
+            # Count only subscribers still reading, whether they finished or disconnected
+            self.subscribers -= 1
+
+
+class StreamBroadcaster:
+    """Share one upstream async stream per key between concurrent consumers.
+
+    The first subscriber for a key starts the upstream as a background task.
+    Later subscribers get every item produced so far replayed to them and
+    then receive live items, and all of them finish together when the
+    upstream does. The upstream keeps running if subscribers disconnect so
+    its side effects (such as caching the final image) still happen once.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._broadcasts: Dict[str, _Broadcast] = {}
+        self.upstream_starts = 0
+        self.shared_subscriptions = 0
+
+    def subscribe(self, key: str, source_factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        broadcast = self._broadcasts.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._broadcasts[key] = broadcast
+            self.upstream_starts += 1
+            task = asyncio.ensure_future(broadcast.run(source_factory()))
+            task.add_done_callback(lambda t, key=key, b=broadcast: self._finish(key, b))
+        else:
+            self.shared_subscriptions += 1
+            logger.debug(f"[{self.name}] attaching to in-flight stream {key} ({len(broadcast.items)} items to replay)")
+        return broadcast.subscribe()
+
+    def attach(self, key: str) -> Optional[AsyncIterator[Any]]:
+        """Subscribe to the in-flight stream for a key, or return None if there is none."""
+        broadcast = self._broadcasts.get(key)
+        if broadcast is None:
+            return None
+        self.shared_subscriptions += 1
+        return broadcast.subscribe()
+
+    def _finish(self, key: str, broadcast: _Broadcast) -> None:
+        if self._broadcasts.get(key) is broadcast:
+            del self._broadcasts[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "upstream_starts": self.upstream_starts,
+            "shared_subscriptions": self.shared_subscriptions,
+            "in_flight": {key: b.subscribers for key, b in self._broadcasts.items()},
+        }
+
+
+MergedItem = namedtuple("MergedItem", ["tag", "item", "done", "error"])
+
+
+async def merge_streams(
+    sources: List[Tuple[Any, Callable[[], AsyncIterator[Any]]]],
+    max_concurrency: int,
+) -> AsyncIterator[MergedItem]:
+    """Run several async streams concurrently and interleave their items.
+
+    At most ``max_concurrency`` sources are consumed at once. Items are
+    yielded as ``MergedItem(tag, item, done=False, error=None)`` in arrival
+    order, and each source produces one final ``MergedItem`` with
+    ``done=True`` (and its exception, if it failed) so callers can report
+    per-source outcomes. A failing source does not stop the others.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def pump(tag: Any, factory: Callable[[], AsyncIterator[Any]]) -> None:
+        error = None
+        try:
+            async with semaphore:
+                async for item in factory():
+                    await queue.put(MergedItem(tag, item, False, None))
+        except Exception as e:
+            error = e
+        await queue.put(MergedItem(tag, None, True, error))
+
+    tasks = [asyncio.ensure_future(pump(tag, factory)) for tag, factory in sources]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            merged = await queue.get()
+            if merged.done:
+                remaining -= 1
+            yield merged
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,43 @@
+"""Helpers for HTTP conditional and partial responses."""
+from typing import Optional, Tuple
+
+# Images are addressed by cache key and never change meaning, so clients and
+# CDNs may keep them for a year without revalidating.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def etag_for_digest(digest: str) -> str:
+    """Build a strong ETag from a content digest."""
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Return True if an If-None-Match header matches the given ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def parse_byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range ``Range: bytes=...`` header into inclusive offsets.
+
+    Returns ``None`` when the range cannot be satisfied. Raises ``ValueError``
+    for headers this server does not handle (other units, multiple ranges),
+    in which case the caller should serve the full representation.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        raise ValueError(f"Unsupported range: {range_header}")
+    start_text, _, end_text = spec.strip().partition("-")
+    if not start_text:
+        # Suffix range: the last N bytes
+        suffix_length = int(end_text)
+        if suffix_length <= 0 or size == 0:
+            return None
+        return max(size - suffix_length, 0), size - 1
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
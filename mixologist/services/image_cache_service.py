@@ -1,26 +1,386 @@
+import asyncio
+import base64
+import hashlib
 import logging
+import os
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timezone
+from bson import Binary
+from pymongo import UpdateOne
 from .openai_service import get_mongo_collection
+from ..database.config import get_mongo_gridfs_bucket
+
+# Images larger than this are stored in GridFS instead of inline in the document.
+# MongoDB documents are capped at 16MB, so keep a comfortable margin.
+GRIDFS_THRESHOLD_BYTES = int(os.getenv("MONGODB_GRIDFS_THRESHOLD_BYTES", str(8 * 1024 * 1024)))
+
+def detect_image_content_type(data: bytes) -> str:
+    """Sniff the image format from its magic bytes."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    return "application/octet-stream"
+
+def image_dimensions(data: bytes) -> tuple[int | None, int | None]:
+    """Return (width, height) read from the image header, or (None, None) if unknown."""
+    try:
+        import io
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        return None, None
+
+async def build_image_storage_fields(cache_key: str, data: bytes) -> tuple[dict, dict]:
+    """Return the ($set, $unset) fields that store raw image bytes for a document.
+
+    Small images are stored inline as BSON Binary; large ones are uploaded to
+    GridFS and referenced by ``gridfs_id``. Any legacy ``b64_data`` is removed.
+    """
+    fields = {
+        "content_type": detect_image_content_type(data),
+        "byte_size": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+    fields["width"], fields["height"] = image_dimensions(data)
+    if len(data) > GRIDFS_THRESHOLD_BYTES:
+        async with get_mongo_gridfs_bucket() as bucket:
+            fields["gridfs_id"] = await bucket.upload_from_stream(
+                cache_key, data, metadata={"content_type": fields["content_type"]}
+            )
+        return fields, {"data": "", "b64_data": ""}
+    fields["data"] = Binary(data)
+    return fields, {"gridfs_id": "", "b64_data": ""}
+
+async def read_image_bytes(doc: dict) -> bytes | None:
+    """Return the raw image bytes for an image document in any storage layout."""
+    if doc.get("data") is not None:
+        return bytes(doc["data"])
+    if doc.get("gridfs_id") is not None:
+        async with get_mongo_gridfs_bucket() as bucket:
+            stream = await bucket.open_download_stream(doc["gridfs_id"])
+            return await stream.read()
+    if doc.get("b64_data"):
+        # Documents written before binary storage keep base64 text until migrated
+        return base64.b64decode(doc["b64_data"])
+    return None
+
+async def delete_gridfs_blob(gridfs_id) -> None:
+    try:
+        async with get_mongo_gridfs_bucket() as bucket:
+            await bucket.delete(gridfs_id)
+    except Exception as e:
+        logging.warning(f"Could not delete replaced GridFS blob {gridfs_id}: {e}")
+
+def image_category(cache_key: str) -> str:
+    """Return the category prefix of an image cache key (``ingredients_ab12`` -> ``ingredients``)."""
+    return cache_key.split("_")[0] if "_" in cache_key else "unknown"
+
+def parse_admitted_categories(text: str) -> set[str] | None:
+    """Parse a comma separated category list; ``*`` admits every category (None)."""
+    categories = {c.strip() for c in text.split(",") if c.strip()}
+    return None if "*" in categories else categories
+
+class ImageMemoryCache:
+    """Byte-bounded LRU tier in front of MongoDB for hot image records.
+
+    Records are kept in memory until their total size exceeds ``max_bytes``,
+    then the least recently used ones are evicted. Only categories listed in
+    ``categories`` (None admits all) and records up to ``max_item_bytes`` are
+    admitted, so one-off cocktail photos do not push out the reusable
+    ingredient and glassware images.
+
+    When ``disk_dir`` is set, admitted images are also written to that
+    directory and read from it on a memory miss. Point every worker on a host
+    at the same directory (e.g. under /dev/shm) to share one copy between
+    them; the directory is trimmed oldest-first to ``disk_max_bytes``.
+    """
+
+    DISK_TRIM_INTERVAL = 64
+
+    def __init__(self, max_bytes: int, max_item_bytes: int, categories: set[str] | None = None,
+                 disk_dir: str | None = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.categories = categories
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._records: OrderedDict[str, dict] = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        self._disk_writes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def admits(self, cache_key: str, byte_size: int) -> bool:
+        if self.max_bytes <= 0 or byte_size > self.max_item_bytes:
+            return False
+        return self.categories is None or image_category(cache_key) in self.categories
+
+    def _disk_path(self, cache_key: str) -> str:
+        return os.path.join(self.disk_dir, hashlib.sha256(cache_key.encode()).hexdigest()[:32])
+
+    async def get(self, cache_key: str) -> dict | None:
+        record = self._records.get(cache_key)
+        if record is not None:
+            self._records.move_to_end(cache_key)
+            self.hits += 1
+            return record
+        if self.disk_dir and self.admits(cache_key, 0):
+            data = await asyncio.to_thread(self._read_disk, cache_key)
+            if data is not None:
+                self.disk_hits += 1
+                record = {
+                    "cache_key": cache_key,
+                    "category": image_category(cache_key),
+                    "data": data,
+                    "byte_size": len(data),
+                    "content_type": detect_image_content_type(data),
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                }
+                self._store(record)
+                return record
+        self.misses += 1
+        return None
+
+    def contains(self, cache_key: str) -> bool:
+        return cache_key in self._records
+
+    async def put(self, record: dict) -> bool:
+        cache_key = record["cache_key"]
+        if not self.admits(cache_key, record["byte_size"]):
+            self.rejections += 1
+            return False
+        self._store(record)
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, cache_key, record["data"])
+            except OSError as e:
+                logging.warning(f"Could not write image {cache_key} to disk cache: {e}")
+        return True
+
+    def invalidate(self, cache_key: str) -> None:
+        record = self._records.pop(cache_key, None)
+        if record is not None:
+            self.current_bytes -= record["byte_size"]
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(cache_key))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.warning(f"Could not remove image {cache_key} from disk cache: {e}")
+
+    def _store(self, record: dict) -> None:
+        previous = self._records.pop(record["cache_key"], None)
+        if previous is not None:
+            self.current_bytes -= previous["byte_size"]
+        self._records[record["cache_key"]] = record
+        self.current_bytes += record["byte_size"]
+        while self.current_bytes > self.max_bytes and self._records:
+            _, evicted = self._records.popitem(last=False)
+            self.current_bytes -= evicted["byte_size"]
+            self.evictions += 1
+
+    def _read_disk(self, cache_key: str) -> bytes | None:
+        try:
+            with open(self._disk_path(cache_key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"Could not read image {cache_key} from disk cache: {e}")
+            return None
+
+    def _write_disk(self, cache_key: str, data: bytes) -> None:
+        # Write to a temp file and rename so other workers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._disk_path(cache_key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._disk_writes += 1
+        if self.disk_max_bytes and self._disk_writes % self.DISK_TRIM_INTERVAL == 0:
+            self._trim_disk()
+
+    def _trim_disk(self) -> None:
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and not entry.name.startswith(".tmp-"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._records),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "max_item_bytes": self.max_item_bytes,
+            "categories": sorted(self.categories) if self.categories is not None else "*",
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "rejections": self.rejections,
+            "disk_dir": self.disk_dir,
+        }
+
+IMAGE_MEMORY_CACHE_BYTES = int(os.getenv("IMAGE_MEMORY_CACHE_BYTES", str(256 * 1024 * 1024)))
+
+image_memory_cache = ImageMemoryCache(
+    max_bytes=IMAGE_MEMORY_CACHE_BYTES,
+    max_item_bytes=int(os.getenv("IMAGE_MEMORY_CACHE_MAX_ITEM_BYTES", str(IMAGE_MEMORY_CACHE_BYTES // 8))),
+    categories=parse_admitted_categories(
+        os.getenv("IMAGE_MEMORY_CACHE_CATEGORIES", "ingredients,glassware,garnish,equipment,technique")
+    ),
+    disk_dir=os.getenv("IMAGE_DISK_CACHE_DIR") or None,
+    disk_max_bytes=int(os.getenv("IMAGE_DISK_CACHE_MAX_BYTES", str(1024 * 1024 * 1024))),
+)
+
+class ImageAccessTracker:
+    """Batches image access counts and times into periodic bulk updates.
+
+    Every served image bumps an in-memory counter; a background task writes
+    the pending counters with one ``bulk_write`` of ``$inc hit_count`` /
+    ``$max last_accessed_at`` updates every ``flush_interval`` seconds, or
+    sooner once ``max_pending`` keys are waiting. The eviction sweeper uses
+    these fields to find cold images.
+    """
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: dict[str, list] = {}
+        self._task: asyncio.Task | None = None
+        self._flush_task: asyncio.Task | None = None
+        self.flushed_updates = 0
+
+    def record(self, cache_key: str) -> None:
+        now = datetime.now(timezone.utc)
+        entry = self._pending.get(cache_key)
+        if entry is None:
+            self._pending[cache_key] = [1, now]
+        else:
+            entry[0] += 1
+            entry[1] = now
+        if len(self._pending) >= self.max_pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> int:
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        operations = [
+            UpdateOne(
+                {"cache_key": cache_key},
+                {"$inc": {"hit_count": hits}, "$max": {"last_accessed_at": last_access}},
+            )
+            for cache_key, (hits, last_access) in pending.items()
+        ]
+        try:
+            async with get_mongo_collection() as collection:
+                await collection.bulk_write(operations, ordered=False)
+            self.flushed_updates += len(operations)
+            logging.debug(f"Flushed access stats for {len(operations)} images")
+            return len(operations)
+        except Exception as e:
+            logging.error(f"Error flushing image access stats: {e}")
+            # Keep the counts for the next flush
+            for cache_key, (hits, last_access) in pending.items():
+                entry = self._pending.setdefault(cache_key, [0, last_access])
+                entry[0] += hits
+                entry[1] = max(entry[1], last_access)
+            return 0
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "flushed_updates": self.flushed_updates}
+
+image_access_tracker = ImageAccessTracker(
+    flush_interval=float(os.getenv("IMAGE_ACCESS_FLUSH_SECONDS", "30")),
+    max_pending=int(os.getenv("IMAGE_ACCESS_MAX_PENDING", "1000")),
+)
 
 class MongoDBImageService:
-    """Service for storing and retrieving images in MongoDB."""
+    """Service for storing and retrieving images in MongoDB.
+
+    Images are stored as raw bytes (inline BSON Binary, or GridFS when large)
+    with their content type, byte size and SHA-256. The base64 helpers exist
+    for callers that still speak base64, such as the SSE routes.
+    """
     @staticmethod
     async def save_image(cache_key: str, category: str, b64_data: str, **metadata) -> bool:
+        try:
+            data = base64.b64decode(b64_data)
+        except Exception as e:
+            logging.error(f"Error decoding base64 image for MongoDB: {cache_key}: {e}")
+            return False
+        return await MongoDBImageService.save_image_bytes(cache_key, category, data, **metadata)
+
+    @staticmethod
+    async def save_image_bytes(cache_key: str, category: str, data: bytes, **metadata) -> bool:
         try:
             async with get_mongo_collection() as collection:
+                previous = await collection.find_one({"cache_key": cache_key}, projection={"gridfs_id": 1})
+                storage_fields, unset_fields = await build_image_storage_fields(cache_key, data)
                 doc = {
                     "cache_key": cache_key,
                     "category": category,
-                    "b64_data": b64_data,
+                    "stored_at": datetime.now(timezone.utc),
+                    **storage_fields,
                     **metadata
                 }
-                logging.debug(f"Saving image to MongoDB: {cache_key}, category: {category}")
+                logging.debug(f"Saving image to MongoDB: {cache_key}, category: {category}, {len(data)} bytes")
                 result = await collection.update_one(
                     {"cache_key": cache_key},
-                    {"$set": doc},
+                    {"$set": doc, "$unset": unset_fields},
                     upsert=True
                 )
                 if result.acknowledged:
                     logging.info(f"Image saved to MongoDB: {cache_key}")
+                    image_memory_cache.invalidate(cache_key)
+                    if previous and previous.get("gridfs_id") is not None and previous["gridfs_id"] != doc.get("gridfs_id"):
+                        await delete_gridfs_blob(previous["gridfs_id"])
                 else:
                     logging.error(f"Image save to MongoDB not acknowledged: {cache_key}")
                 return result.acknowledged
@@ -29,42 +389,171 @@ class MongoDBImageService:
             return False
 
     @staticmethod
-    async def get_image(cache_key: str) -> str | None:
+    async def get_image_bytes(cache_key: str) -> bytes | None:
+        record = await MongoDBImageService.get_image_record(cache_key)
+        return record["data"] if record is not None else None
+
+    @staticmethod
+    async def get_image_record(cache_key: str) -> dict | None:
+        """Return the image bytes with their content type, size and SHA-256."""
+        record = await image_memory_cache.get(cache_key)
+        if record is not None:
+            image_access_tracker.record(cache_key)
+            return record
         try:
             async with get_mongo_collection() as collection:
-                logging.debug(f"Fetching image from MongoDB: {cache_key}")
-                doc = await collection.find_one({"cache_key": cache_key})
-                if doc:
-                    logging.debug(f"Image found in MongoDB: {cache_key}")
-                    return doc.get("b64_data")
-                logging.debug(f"Image not found in MongoDB: {cache_key}")
-                return None
+                logging.debug(f"Fetching image record from MongoDB: {cache_key}")
+                doc = await collection.find_one(
+                    {"cache_key": cache_key},
+                    projection={"data": 1, "gridfs_id": 1, "b64_data": 1, "content_type": 1, "sha256": 1, "category": 1}
+                )
+                if not doc:
+                    return None
+                data = await read_image_bytes(doc)
+                if data is None:
+                    return None
+                record = {
+                    "cache_key": cache_key,
+                    "category": doc.get("category"),
+                    "data": data,
+                    "byte_size": len(data),
+                    # Legacy documents have no stored metadata, so derive it
+                    "content_type": doc.get("content_type") or detect_image_content_type(data),
+                    "sha256": doc.get("sha256") or hashlib.sha256(data).hexdigest(),
+                }
+                await image_memory_cache.put(record)
+                image_access_tracker.record(cache_key)
+                return record
         except Exception as e:
-            logging.error(f"Error fetching image from MongoDB: {cache_key}: {e}")
+            logging.error(f"Error fetching image record from MongoDB: {cache_key}: {e}")
             return None
 
     @staticmethod
-    async def get_images_by_category(category: str) -> list[dict]:
+    async def get_image_records(cache_keys: list[str]) -> dict[str, dict]:
+        """Fetch several image records in one query, keyed by cache key. Missing keys are left out."""
+        records = {}
+        missing = []
+        for cache_key in dict.fromkeys(cache_keys):
+            record = await image_memory_cache.get(cache_key)
+            if record is not None:
+                records[cache_key] = record
+                image_access_tracker.record(cache_key)
+            else:
+                missing.append(cache_key)
+        if not missing:
+            return records
         try:
             async with get_mongo_collection() as collection:
-                logging.debug(f"Fetching images by category from MongoDB: {category}")
-                if category == "all":
-                    cursor = collection.find({})
-                else:
-                    cursor = collection.find({"category": category})
-                images = []
+                cursor = collection.find(
+                    {"cache_key": {"$in": missing}},
+                    projection={"cache_key": 1, "data": 1, "gridfs_id": 1, "b64_data": 1, "content_type": 1, "sha256": 1, "category": 1}
+                )
                 async for doc in cursor:
-                    images.append({
-                        "cache_key": doc.get("cache_key"),
+                    data = await read_image_bytes(doc)
+                    if data is None:
+                        continue
+                    record = {
+                        "cache_key": doc["cache_key"],
                         "category": doc.get("category"),
-                        "b64_data": doc.get("b64_data"),
-                    })
-                logging.debug(f"Fetched {len(images)} images from MongoDB for category: {category}")
-                return images
+                        "data": data,
+                        "byte_size": len(data),
+                        "content_type": doc.get("content_type") or detect_image_content_type(data),
+                        "sha256": doc.get("sha256") or hashlib.sha256(data).hexdigest(),
+                    }
+                    await image_memory_cache.put(record)
+                    image_access_tracker.record(doc["cache_key"])
+                    records[doc["cache_key"]] = record
+        except Exception as e:
+            logging.error(f"Error fetching {len(missing)} image records from MongoDB: {e}")
+        return records
+
+    @staticmethod
+    async def delete_image(cache_key: str) -> bool:
+        try:
+            async with get_mongo_collection() as collection:
+                doc = await collection.find_one_and_delete({"cache_key": cache_key}, projection={"gridfs_id": 1})
+            image_memory_cache.invalidate(cache_key)
+            if doc is None:
+                return False
+            if doc.get("gridfs_id") is not None:
+                await delete_gridfs_blob(doc["gridfs_id"])
+            logging.info(f"Image deleted from MongoDB: {cache_key}")
+            return True
+        except Exception as e:
+            logging.error(f"Error deleting image from MongoDB: {cache_key}: {e}")
+            return False
+
+    @staticmethod
+    async def list_images(category: str | None = None, after: str | None = None, limit: int = 100, include_variants: bool = False) -> list[dict]:
+        """List image metadata (no image data) ordered by cache key, starting after ``after``.
+
+        ``after`` is a keyset cursor: the last cache key of the previous page.
+        Served by the ``cache_key`` and ``(category, cache_key)`` indexes.
+        """
+        try:
+            query = {}
+            if category and category != "all":
+                query["category"] = category
+            if after:
+                query["cache_key"] = {"$gt": after}
+            if not include_variants:
+                query["variant_of"] = None
+            pipeline = [
+                {"$match": query},
+                {"$sort": {"cache_key": 1}},
+                {"$limit": limit},
+                {"$project": {
+                    "_id": 0,
+                    "cache_key": 1,
+                    "category": 1,
+                    "content_type": 1,
+                    "width": 1,
+                    "height": 1,
+                    "stored_at": 1,
+                    "variant_of": 1,
+                    "variant": 1,
+                    # Legacy base64 documents have no byte_size; their document size is close enough
+                    "byte_size": {"$ifNull": ["$byte_size", {"$bsonSize": "$$ROOT"}]},
+                }},
+            ]
+            async with get_mongo_collection() as collection:
+                return await collection.aggregate(pipeline).to_list(limit)
         except Exception as e:
-            logging.error(f"Error fetching images by category from MongoDB: {category}: {e}")
+            logging.error(f"Error listing images from MongoDB: {category}: {e}")
             return []
 
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Create the indexes used by image and step-mapping lookups and the paginated listing."""
+        try:
+            async with get_mongo_collection() as collection:
+                await collection.create_index("cache_key", unique=True, name="cache_key_unique")
+                await collection.create_index([("category", 1), ("cache_key", 1)], name="category_cache_key")
+            async with get_mongo_collection(STEP_IMAGE_INDEX_COLLECTION) as collection:
+                await collection.create_index("step_hash", unique=True, name="step_hash_unique")
+            logging.info("MongoDB image indexes are in place")
+        except Exception as e:
+            logging.warning(f"Could not create MongoDB image indexes: {e}")
+
+    @staticmethod
+    async def image_exists(cache_key: str) -> bool:
+        if image_memory_cache.contains(cache_key):
+            return True
+        try:
+            async with get_mongo_collection() as collection:
+                doc = await collection.find_one({"cache_key": cache_key}, projection={"_id": 1})
+                return doc is not None
+        except Exception as e:
+            logging.error(f"Error checking image in MongoDB: {cache_key}: {e}")
+            return False
+
+    @staticmethod
+    async def get_image(cache_key: str) -> str | None:
+        data = await MongoDBImageService.get_image_bytes(cache_key)
+        if data is None:
+            return None
+        return base64.b64encode(data).decode("ascii")
+
 STEP_IMAGE_INDEX_COLLECTION = "step_image_index"
 
 async def get_cached_image(cache_key: str) -> str | None:
@@ -88,6 +577,21 @@ async def get_step_image_mapping(step_hash: str) -> str | None:
         logging.error(f"Error fetching step image mapping from MongoDB: {step_hash}: {e}")
         return None
 
+async def get_step_image_mappings(step_hashes: list[str]) -> dict[str, str]:
+    """Resolve several step hashes to image cache keys with one query. Unmapped hashes are left out."""
+    if not step_hashes:
+        return {}
+    try:
+        async with get_mongo_collection(STEP_IMAGE_INDEX_COLLECTION) as collection:
+            cursor = collection.find(
+                {"step_hash": {"$in": list(dict.fromkeys(step_hashes))}},
+                projection={"_id": 0, "step_hash": 1, "cache_key": 1}
+            )
+            return {doc["step_hash"]: doc["cache_key"] async for doc in cursor if doc.get("cache_key")}
+    except Exception as e:
+        logging.error(f"Error fetching {len(step_hashes)} step image mappings from MongoDB: {e}")
+        return {}
+
 async def set_step_image_mapping(step_hash: str, cache_key: str) -> None:
     try:
         async with get_mongo_collection(STEP_IMAGE_INDEX_COLLECTION) as collection:
@@ -0,0 +1,256 @@
+"""Storage-budgeted eviction for the MongoDB image cache.
+
+The sweeper keeps the ``images`` collection within a total byte budget and
+optional per-category quotas by deleting the coldest images first. Coldness
+is ordered by last access (LRU) or by hit count (LFU), using the
+``last_accessed_at`` and ``hit_count`` fields maintained by
+``ImageAccessTracker``; images never served since they were stored rank by
+``stored_at``. Protected categories, by default the reusable ingredient and
+glassware images, are never evicted. Evicting an image also removes its
+variants.
+
+Configuration:
+    IMAGE_STORAGE_BUDGET_BYTES      total budget, 0 for none
+    IMAGE_CATEGORY_QUOTAS           e.g. "cocktail:2147483648,technique:536870912"
+    IMAGE_EVICTION_POLICY           lru or lfu
+    IMAGE_PROTECTED_CATEGORIES      e.g. "ingredients,glassware"
+    IMAGE_EVICTION_INTERVAL_SECONDS how often the background sweeper runs
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from .image_cache_service import delete_gridfs_blob, image_access_tracker, image_memory_cache
+from ..database.config import get_mongo_collection
+
+logger = logging.getLogger(__name__)
+
+EVICTION_POLICIES = ("lru", "lfu")
+
+
+def parse_category_quotas(text: str) -> Dict[str, int]:
+    """Parse ``category:bytes`` pairs separated by commas."""
+    quotas = {}
+    for entry in text.split(","):
+        entry = entry.strip()
+        if entry:
+            category, limit = entry.split(":")
+            quotas[category.strip()] = int(limit)
+    return quotas
+
+
+IMAGE_STORAGE_BUDGET_BYTES = int(os.getenv("IMAGE_STORAGE_BUDGET_BYTES", "0"))
+IMAGE_CATEGORY_QUOTAS = parse_category_quotas(os.getenv("IMAGE_CATEGORY_QUOTAS", ""))
+IMAGE_EVICTION_POLICY = os.getenv("IMAGE_EVICTION_POLICY", "lru").lower()
+IMAGE_PROTECTED_CATEGORIES = {
+    c.strip() for c in os.getenv("IMAGE_PROTECTED_CATEGORIES", "ingredients,glassware").split(",") if c.strip()
+}
+IMAGE_EVICTION_INTERVAL_SECONDS = float(os.getenv("IMAGE_EVICTION_INTERVAL_SECONDS", "3600"))
+
+_NEVER = datetime.min
+
+
+def _coldness(doc: Dict[str, Any], policy: str) -> tuple:
+    last_used = doc.get("last_accessed_at") or doc.get("stored_at") or _NEVER
+    if policy == "lfu":
+        return (doc.get("hit_count") or 0, last_used)
+    return (last_used,)
+
+
+def plan_eviction(
+    docs: List[Dict[str, Any]],
+    budget_bytes: int,
+    category_quotas: Dict[str, int],
+    protected_categories: Set[str],
+    policy: str = "lru",
+) -> List[Dict[str, Any]]:
+    """Choose which image documents to delete.
+
+    ``docs`` hold ``cache_key``, ``category``, ``byte_size`` and the access
+    fields. Categories over their quota are trimmed first, then the coldest
+    unprotected images go until the total fits ``budget_bytes`` (0 means no
+    total budget). Variants (docs with ``variant_of``) follow their original.
+    """
+    if policy not in EVICTION_POLICIES:
+        raise ValueError(f"Unknown eviction policy: {policy}")
+
+    stored_keys = {doc["cache_key"] for doc in docs}
+    # Variants whose original is gone are treated as images of their own
+    originals = [doc for doc in docs if doc.get("variant_of") not in stored_keys]
+    variants_by_original: Dict[str, List[Dict[str, Any]]] = {}
+    for doc in docs:
+        if doc.get("variant_of") in stored_keys:
+            variants_by_original.setdefault(doc["variant_of"], []).append(doc)
+
+    def footprint(doc: Dict[str, Any]) -> int:
+        return doc.get("byte_size", 0) + sum(v.get("byte_size", 0) for v in variants_by_original.get(doc["cache_key"], []))
+
+    category_bytes: Dict[str, int] = {}
+    for doc in originals:
+        category_bytes[doc.get("category")] = category_bytes.get(doc.get("category"), 0) + footprint(doc)
+    total_bytes = sum(category_bytes.values())
+
+    candidates = sorted(
+        (doc for doc in originals if doc.get("category") not in protected_categories),
+        key=lambda doc: _coldness(doc, policy),
+    )
+    evicted: Dict[str, Dict[str, Any]] = {}
+
+    def evict(doc: Dict[str, Any]) -> None:
+        nonlocal total_bytes
+        evicted[doc["cache_key"]] = doc
+        size = footprint(doc)
+        category_bytes[doc.get("category")] -= size
+        total_bytes -= size
+
+    for category, quota in category_quotas.items():
+        if category in protected_categories:
+            continue
+        for doc in candidates:
+            if category_bytes.get(category, 0) <= quota:
+                break
+            if doc.get("category") == category and doc["cache_key"] not in evicted:
+                evict(doc)
+
+    if budget_bytes > 0:
+        for doc in candidates:
+            if total_bytes <= budget_bytes:
+                break
+            if doc["cache_key"] not in evicted:
+                evict(doc)
+
+    victims = []
+    for cache_key, doc in evicted.items():
+        victims.append(doc)
+        victims.extend(variants_by_original.get(cache_key, []))
+    return victims
+
+
+async def load_image_metadata() -> List[Dict[str, Any]]:
+    """Fetch the sizing and access fields of every stored image, without the image data."""
+    pipeline = [{
+        "$project": {
+            "_id": 0,
+            "cache_key": 1,
+            "category": 1,
+            "variant_of": 1,
+            "gridfs_id": 1,
+            "hit_count": 1,
+            "last_accessed_at": 1,
+            "stored_at": 1,
+            # Legacy base64 documents have no byte_size; their document size is close enough
+            "byte_size": {"$ifNull": ["$byte_size", {"$bsonSize": "$$ROOT"}]},
+        }
+    }]
+    async with get_mongo_collection() as collection:
+        return await collection.aggregate(pipeline).to_list(None)
+
+
+async def sweep_images(
+    budget_bytes: int = IMAGE_STORAGE_BUDGET_BYTES,
+    category_quotas: Optional[Dict[str, int]] = None,
+    protected_categories: Optional[Set[str]] = None,
+    policy: str = IMAGE_EVICTION_POLICY,
+    dry_run: bool = False,
+    batch_size: int = 500,
+) -> Dict[str, Any]:
+    """Evict cold images until the collection fits its budget and quotas."""
+    started_at = time.monotonic()
+    category_quotas = IMAGE_CATEGORY_QUOTAS if category_quotas is None else category_quotas
+    protected_categories = IMAGE_PROTECTED_CATEGORIES if protected_categories is None else protected_categories
+
+    # Write pending access stats first so recently served images are not evicted
+    await image_access_tracker.flush()
+    docs = await load_image_metadata()
+    victims = plan_eviction(docs, budget_bytes, category_quotas, protected_categories, policy)
+
+    bytes_before = sum(doc.get("byte_size", 0) for doc in docs)
+    reclaimed_by_category: Dict[str, int] = {}
+    for doc in victims:
+        reclaimed_by_category[doc.get("category")] = reclaimed_by_category.get(doc.get("category"), 0) + doc.get("byte_size", 0)
+
+    evicted = 0
+    if not dry_run:
+        async with get_mongo_collection() as collection:
+            for start in range(0, len(victims), batch_size):
+                batch = victims[start:start + batch_size]
+                result = await collection.delete_many({"cache_key": {"$in": [doc["cache_key"] for doc in batch]}})
+                evicted += result.deleted_count
+                for doc in batch:
+                    image_memory_cache.invalidate(doc["cache_key"])
+                    if doc.get("gridfs_id") is not None:
+                        await delete_gridfs_blob(doc["gridfs_id"])
+
+    bytes_reclaimed = sum(reclaimed_by_category.values())
+    report = {
+        "dry_run": dry_run,
+        "policy": policy,
+        "images_before": len(docs),
+        "bytes_before": bytes_before,
+        "evicted": len(victims) if dry_run else evicted,
+        "bytes_reclaimed": bytes_reclaimed,
+        "bytes_after": bytes_before - bytes_reclaimed,
+        "reclaimed_by_category": reclaimed_by_category,
+        "seconds": round(time.monotonic() - started_at, 3),
+        "finished_at": time.time(),
+    }
+    logger.info(f"Image eviction sweep: {report}")
+    return report
+
+
+class ImageEvictionSweeper:
+    """Runs ``sweep_images`` periodically in the background."""
+
+    def __init__(self, interval_seconds: float = IMAGE_EVICTION_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.total_bytes_reclaimed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return IMAGE_STORAGE_BUDGET_BYTES > 0 or bool(IMAGE_CATEGORY_QUOTAS)
+
+    async def sweep(self, dry_run: bool = False) -> Dict[str, Any]:
+        report = await sweep_images(dry_run=dry_run)
+        if not dry_run:
+            self.last_report = report
+            self.total_bytes_reclaimed += report["bytes_reclaimed"]
+        return report
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Image eviction sweep failed: {type(e).__name__} - {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._run())
+            logger.info(f"Started image eviction sweeper every {self.interval_seconds}s")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None and not self._task.done(),
+            "budget_bytes": IMAGE_STORAGE_BUDGET_BYTES,
+            "category_quotas": IMAGE_CATEGORY_QUOTAS,
+            "protected_categories": sorted(IMAGE_PROTECTED_CATEGORIES),
+            "policy": IMAGE_EVICTION_POLICY,
+            "total_bytes_reclaimed": self.total_bytes_reclaimed,
+            "last_report": self.last_report,
+            "access_tracking": image_access_tracker.stats(),
+        }
+
+
+image_eviction_sweeper = ImageEvictionSweeper()
@@ -0,0 +1,296 @@
+"""Remember failed image generations and stop calling a failing upstream.
+
+Two guards sit in front of the image model:
+
+* ``NegativeCache`` remembers each image cache key whose generation failed
+  (for example a content-policy rejection for one subject), with the
+  failure reason and a TTL that doubles with every consecutive failure.
+  While an entry is active, requests for that image fail immediately
+  instead of re-running the prompt refinement and the image call.
+* ``CircuitBreaker`` tracks outcomes per image category over a rolling
+  window and opens when the error rate spikes, so a degraded upstream
+  fails fast instead of holding worker slots. After a cooldown one probe
+  request is let through; its outcome closes or reopens the breaker.
+
+Both are kept in process memory. ``ImageGenerationGuard`` combines them and
+raises ``ImageGenerationUnavailable`` (with a ``retry_after``) when a
+generation should not be attempted.
+"""
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FAILURE_TTL_SECONDS = float(os.getenv("IMAGE_FAILURE_TTL_SECONDS", "60"))
+IMAGE_FAILURE_MAX_TTL_SECONDS = float(os.getenv("IMAGE_FAILURE_MAX_TTL_SECONDS", "3600"))
+IMAGE_FAILURE_MAX_ENTRIES = int(os.getenv("IMAGE_FAILURE_MAX_ENTRIES", "10000"))
+IMAGE_BREAKER_WINDOW_SECONDS = float(os.getenv("IMAGE_BREAKER_WINDOW_SECONDS", "60"))
+IMAGE_BREAKER_MIN_REQUESTS = int(os.getenv("IMAGE_BREAKER_MIN_REQUESTS", "5"))
+IMAGE_BREAKER_ERROR_RATE = float(os.getenv("IMAGE_BREAKER_ERROR_RATE", "0.5"))
+IMAGE_BREAKER_COOLDOWN_SECONDS = float(os.getenv("IMAGE_BREAKER_COOLDOWN_SECONDS", "30"))
+
+MAX_REASON_LENGTH = 300
+
+
+class ImageGenerationUnavailable(Exception):
+    """Raised instead of generating an image that recently failed or whose category is failing."""
+
+    def __init__(self, message: str, retry_after: float, reason: Optional[str] = None):
+        self.retry_after = retry_after
+        self.reason = reason
+        super().__init__(message)
+
+
+def failure_reason(error: BaseException) -> str:
+    """Short description of a generation error, e.g. ``BadRequestError: ...``."""
+    return f"{type(error).__name__}: {error}"[:MAX_REASON_LENGTH]
+
+
+class _NegativeEntry:
+    def __init__(self):
+        self.failures = 0
+        self.reason = ""
+        self.expires_at = 0.0
+        self.forget_at = 0.0
+
+
+class NegativeCache:
+    """Failed image cache keys, each blocked for a TTL that grows with consecutive failures."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = IMAGE_FAILURE_TTL_SECONDS,
+        max_ttl_seconds: float = IMAGE_FAILURE_MAX_TTL_SECONDS,
+        max_entries: int = IMAGE_FAILURE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_ttl_seconds = max_ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: OrderedDict[str, _NegativeEntry] = OrderedDict()
+        self.hits = 0
+
+    def _lookup(self, cache_key: str) -> Optional[_NegativeEntry]:
+        entry = self._entries.get(cache_key)
+        if entry is not None and self.clock() >= entry.forget_at:
+            # Quiet for a full maximum TTL: the next failure starts the backoff over
+            del self._entries[cache_key]
+            return None
+        return entry
+
+    def check(self, cache_key: str) -> Optional[Tuple[str, float]]:
+        """Return ``(reason, seconds_left)`` while ``cache_key`` is blocked, else None."""
+        if self.ttl_seconds <= 0:
+            return None
+        entry = self._lookup(cache_key)
+        if entry is None:
+            return None
+        remaining = entry.expires_at - self.clock()
+        if remaining <= 0:
+            return None
+        self.hits += 1
+        return entry.reason, remaining
+
+    def record_failure(self, cache_key: str, reason: str) -> float:
+        """Block ``cache_key`` and return the TTL applied."""
+        if self.ttl_seconds <= 0:
+            return 0.0
+        entry = self._lookup(cache_key) or _NegativeEntry()
+        entry.failures += 1
+        entry.reason = reason
+        ttl = min(self.ttl_seconds * (2 ** (entry.failures - 1)), self.max_ttl_seconds)
+        now = self.clock()
+        entry.expires_at = now + ttl
+        entry.forget_at = entry.expires_at + self.max_ttl_seconds
+        self._entries[cache_key] = entry
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return ttl
+
+    def clear(self, cache_key: str) -> None:
+        self._entries.pop(cache_key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        now = self.clock()
+        return {
+            "entries": len(self._entries),
+            "active": sum(1 for entry in self._entries.values() if entry.expires_at > now),
+            "hits": self.hits,
+        }
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker over a rolling time window (closed, open, half-open)."""
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = IMAGE_BREAKER_WINDOW_SECONDS,
+        min_requests: int = IMAGE_BREAKER_MIN_REQUESTS,
+        error_rate: float = IMAGE_BREAKER_ERROR_RATE,
+        cooldown_seconds: float = IMAGE_BREAKER_COOLDOWN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.clock = clock
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.trips = 0
+        self.rejected = 0
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.cooldown_seconds - self.clock())
+
+    def is_open(self) -> bool:
+        """Whether requests are currently rejected (without using up a half-open probe)."""
+        return self.state == "open" and self.retry_after() > 0
+
+    def allow(self) -> bool:
+        """Whether a request may go upstream now. In half-open state only one probe is allowed."""
+        if self.state == "open":
+            if self.retry_after() > 0:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def release(self) -> None:
+        """Give back a half-open probe whose request ended without an outcome (e.g. cancelled)."""
+        self._probe_in_flight = False
+
+    def _open(self, now: float) -> None:
+        self.state = "open"
+        self._opened_at = now
+        self._probe_in_flight = False
+        self.trips += 1
+
+    def record(self, ok: bool) -> None:
+        now = self.clock()
+        if self.state == "half_open":
+            if ok:
+                self.state = "closed"
+                self._outcomes.clear()
+                logger.info(f"Circuit breaker {self.name} closed after a successful probe")
+            else:
+                self._open(now)
+                logger.warning(f"Circuit breaker {self.name} reopened after a failed probe")
+            return
+        self._outcomes.append((now, ok))
+        self._trim(now)
+        if self.state == "closed" and len(self._outcomes) >= self.min_requests:
+            failures = sum(1 for _, outcome in self._outcomes if not outcome)
+            if failures / len(self._outcomes) >= self.error_rate:
+                self._open(now)
+                logger.warning(
+                    f"Circuit breaker {self.name} opened: {failures}/{len(self._outcomes)} failures "
+                    f"in {self.window_seconds:g}s"
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(self.clock())
+        return {
+            "state": self.state,
+            "requests": len(self._outcomes),
+            "failures": sum(1 for _, outcome in self._outcomes if not outcome),
+            "retry_after": round(self.retry_after(), 1) if self.state == "open" else 0,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class ImageGenerationGuard:
+    """Negative cache per image cache key plus a circuit breaker per image category."""
+
+    def __init__(self, negative_cache: Optional[NegativeCache] = None, **breaker_options):
+        self.negative_cache = negative_cache or NegativeCache()
+        self.breaker_options = breaker_options
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, category: str) -> CircuitBreaker:
+        if category not in self.breakers:
+            self.breakers[category] = CircuitBreaker(category, **self.breaker_options)
+        return self.breakers[category]
+
+    def check(self, cache_key: str, category: str) -> None:
+        """Raise ``ImageGenerationUnavailable`` if this image should not be generated now."""
+        blocked = self.negative_cache.check(cache_key)
+        if blocked:
+            reason, remaining = blocked
+            raise ImageGenerationUnavailable(
+                f"Image generation recently failed ({reason}); retry in {remaining:.0f}s", remaining, reason
+            )
+        breaker = self.breaker(category)
+        if not breaker.allow():
+            retry_after = breaker.retry_after()
+            raise ImageGenerationUnavailable(
+                f"Image generation for {category} is temporarily unavailable; retry in {retry_after:.0f}s",
+                retry_after,
+            )
+
+    def record_success(self, cache_key: str, category: str) -> None:
+        self.negative_cache.clear(cache_key)
+        self.breaker(category).record(True)
+
+    def record_failure(self, cache_key: str, category: str, error: BaseException) -> None:
+        reason = failure_reason(error)
+        ttl = self.negative_cache.record_failure(cache_key, reason)
+        self.breaker(category).record(False)
+        logger.warning(f"Image generation failed for {cache_key}; blocked for {ttl:.0f}s: {reason}")
+
+    @contextmanager
+    def attempt(self, cache_key: str, category: str) -> Iterator[None]:
+        """Check the guards, then record the outcome of the generation run in the block."""
+        self.check(cache_key, category)
+        try:
+            yield
+        except Exception as e:
+            self.record_failure(cache_key, category, e)
+            raise
+        except BaseException:
+            self.breaker(category).release()
+            raise
+        else:
+            self.record_success(cache_key, category)
+
+    def guarded(
+        self, cache_key: str, category: str, source_factory: Callable[[], AsyncIterator[Any]]
+    ) -> Callable[[], AsyncIterator[Any]]:
+        """Wrap an image stream factory so every run goes through ``attempt``."""
+
+        async def guarded_stream() -> AsyncIterator[Any]:
+            with self.attempt(cache_key, category):
+                async for item in source_factory():
+                    yield item
+
+        return guarded_stream
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "negative_cache": self.negative_cache.stats(),
+            "breakers": {category: breaker.stats() for category, breaker in self.breakers.items()},
+        }
+
+
+image_generation_guard = ImageGenerationGuard()
@@ -0,0 +1,243 @@
+"""Durable background queue for image generation.
+
+Jobs are stored in the ``image_jobs`` table (Postgres, or the SQLite
+fallback) with one row per image cache key, so the same image is never
+queued twice. A pool of worker tasks claims queued jobs and runs
+``generate_image_stream`` or ``generate_specialized_image_stream`` to
+completion, which caches the image whether or not any client is still
+connected. Failed jobs are retried with a backoff until they run out of
+attempts, and jobs left ``running`` by a worker that died are queued again.
+
+HTTP routes enqueue a job and then follow it with ``ImageJobQueue.stream_job``,
+which attaches to the live generation when it runs in this process and
+otherwise polls the job until the image is cached.
+"""
+import asyncio
+import logging
+import os
+import socket
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .openai_service import (
+    generate_cache_key,
+    generate_image_stream,
+    generate_specialized_cache_key,
+    generate_specialized_image_stream,
+    get_cached_image,
+    image_stream_broadcaster,
+    normalize_image_ingredients,
+)
+from .image_failures import ImageGenerationUnavailable
+from .sse import PARTIAL_IMAGE_FRAME, sse_event
+from .image_store import image_store
+from ..database.config import get_db_session
+from ..database.service import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+IMAGE_JOB_WORKERS = int(os.getenv("IMAGE_JOB_WORKERS", "2"))
+IMAGE_JOB_MAX_ATTEMPTS = int(os.getenv("IMAGE_JOB_MAX_ATTEMPTS", "3"))
+IMAGE_JOB_POLL_SECONDS = float(os.getenv("IMAGE_JOB_POLL_SECONDS", "1.0"))
+IMAGE_JOB_RETRY_BASE_SECONDS = float(os.getenv("IMAGE_JOB_RETRY_BASE_SECONDS", "5"))
+IMAGE_JOB_STALE_SECONDS = float(os.getenv("IMAGE_JOB_STALE_SECONDS", "600"))
+
+# Stream functions a job can run, keyed by ImageJob.kind
+IMAGE_JOB_KINDS = {
+    "cocktail": generate_image_stream,
+    "specialized": generate_specialized_image_stream,
+}
+
+
+def image_job_cache_key(kind: str, params: Dict[str, Any]) -> str:
+    """Return the image cache key the job's stream function will write."""
+    if kind == "cocktail":
+        return generate_cache_key(
+            params.get("prompt", ""),
+            params.get("drink_name", ""),
+            normalize_image_ingredients(params.get("ingredients")),
+            params.get("serving_glass"),
+        )
+    if kind == "specialized":
+        return generate_specialized_cache_key(
+            params["subject"],
+            params["category"],
+            params.get("additional_context", ""),
+            params.get("cache_prefix", ""),
+        )
+    raise ValueError(f"Unknown image job kind: {kind}")
+
+
+class ImageJobQueue:
+    """Enqueues image jobs and runs them on a pool of worker tasks."""
+
+    def __init__(self, workers: int = IMAGE_JOB_WORKERS):
+        self.workers = workers
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self.completed = 0
+        self.failed_attempts = 0
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    async def enqueue(self, kind: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Queue an image job unless the image is cached or already queued.
+
+        Returns the job, with ``cached`` set when the image already exists.
+        """
+        if kind not in IMAGE_JOB_KINDS:
+            raise ValueError(f"Unknown image job kind: {kind}")
+        cache_key = image_job_cache_key(kind, params)
+        if await image_store.exists(cache_key):
+            return {"cache_key": cache_key, "kind": kind, "status": "succeeded", "cached": True}
+        async with get_db_session() as session:
+            result = await DatabaseService(session).enqueue_image_job(
+                cache_key, kind, params, max_attempts=IMAGE_JOB_MAX_ATTEMPTS
+            )
+        if result is None:
+            return None
+        job, created = result
+        if created:
+            self._wakeup.set()
+        return {**job, "cached": False}
+
+    async def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        async with get_db_session() as session:
+            return await DatabaseService(session).get_image_job(job_id)
+
+    async def stats(self) -> Dict[str, Any]:
+        async with get_db_session() as session:
+            counts = await DatabaseService(session).get_image_job_counts()
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "completed": self.completed,
+            "failed_attempts": self.failed_attempts,
+            "jobs": counts,
+        }
+
+    def start(self) -> None:
+        if self.running or self.workers <= 0:
+            return
+        self._tasks = [
+            asyncio.ensure_future(self._worker(f"{self.worker_prefix}:{index}"))
+            for index in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} image job workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, worker_id: str) -> None:
+        polls = 0
+        while True:
+            try:
+                if polls % 60 == 0:
+                    async with get_db_session() as session:
+                        await DatabaseService(session).reset_stale_image_jobs(IMAGE_JOB_STALE_SECONDS)
+                polls += 1
+                async with get_db_session() as session:
+                    job = await DatabaseService(session).claim_image_job(worker_id)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), IMAGE_JOB_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self.run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Image job worker {worker_id} error: {type(e).__name__} - {e}")
+                await asyncio.sleep(IMAGE_JOB_POLL_SECONDS)
+
+    async def run_job(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Run a claimed job to completion and record the outcome."""
+        error = None
+        retry_after = 0.0
+        if job["attempts"] > job["max_attempts"]:
+            error = "exceeded maximum attempts"
+        else:
+            try:
+                async for _ in IMAGE_JOB_KINDS[job["kind"]](**job["params"]):
+                    pass
+                # The stream functions save the final image; make sure one was produced
+                if not await image_store.exists(job["cache_key"]):
+                    error = "generation finished without an image"
+            except asyncio.CancelledError:
+                # Shutting down: hand the job back, without using up an attempt,
+                # so the next worker can retry it right away
+                async with get_db_session() as session:
+                    await asyncio.shield(DatabaseService(session).release_image_job(job["id"]))
+                raise
+            except ImageGenerationUnavailable as e:
+                # Recently failed or its category's breaker is open: don't retry before it may succeed
+                error = f"{type(e).__name__}: {e}"
+                retry_after = e.retry_after
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+
+        if error is None:
+            self.completed += 1
+        else:
+            self.failed_attempts += 1
+            logger.warning(f"Image job {job['id']} attempt {job['attempts']} failed: {error}")
+        retry_delay = max(IMAGE_JOB_RETRY_BASE_SECONDS * (2 ** max(0, job["attempts"] - 1)), retry_after)
+        async with get_db_session() as session:
+            return await DatabaseService(session).finish_image_job(job["id"], error, retry_delay)
+
+    async def stream_job(self, job: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """Yield SSE events following a job until its image is available.
+
+        Emits the same ``partial_image``/``stream_complete``/``error`` events
+        as the direct image routes, preceded by ``job_status`` updates.
+        """
+        cache_key = job["cache_key"]
+        last_status = None
+        while True:
+            cached_image = await get_cached_image(cache_key)
+            if cached_image:
+                for frame in PARTIAL_IMAGE_FRAME.frames(cached_image):
+                    yield frame
+                yield sse_event({"type": "stream_complete", "job_id": job.get("id")})
+                return
+
+            live_stream = image_stream_broadcaster.attach(cache_key)
+            if live_stream is not None:
+                # The job is generating in this process: relay its partial images
+                try:
+                    async for b64_image_chunk in live_stream:
+                        for frame in PARTIAL_IMAGE_FRAME.frames(b64_image_chunk):
+                            yield frame
+                except Exception as e:
+                    yield sse_event({"type": "job_status", "job_id": job.get("id"), "status": "retrying", "message": str(e)})
+                continue
+
+            if job.get("id") is not None:
+                job = await self.get_job(job["id"]) or job
+            status = job.get("status")
+            if status != last_status:
+                yield sse_event({"type": "job_status", "job_id": job.get("id"), "status": status, "attempts": job.get("attempts")})
+                last_status = status
+            if status == "succeeded":
+                cached_image = await get_cached_image(cache_key)
+                if cached_image:
+                    for frame in PARTIAL_IMAGE_FRAME.frames(cached_image):
+                        yield frame
+                    yield sse_event({"type": "stream_complete", "job_id": job.get("id")})
+                else:
+                    yield sse_event({"type": "error", "job_id": job.get("id"), "message": "Image job finished but the image is not cached"})
+                return
+            if status == "failed":
+                yield sse_event({"type": "error", "job_id": job.get("id"), "message": job.get("last_error") or "Image generation failed"})
+                return
+            await asyncio.sleep(IMAGE_JOB_POLL_SECONDS)
+
+
+image_job_queue = ImageJobQueue()
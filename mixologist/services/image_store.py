@@ -0,0 +1,342 @@
+"""Pluggable storage backends for cached images.
+
+``ImageStore`` is the interface the image routes and services use to read
+and write images. ``MongoImageStore`` keeps them in MongoDB through
+``MongoDBImageService``, including its in-process LRU tier and access
+tracking. ``LocalImageStore`` keeps them on the local filesystem and needs
+no external services, which suits single-node deployments, tests and
+benchmarks.
+
+The backend is chosen with ``IMAGE_STORE_BACKEND`` (``mongo`` or
+``local``); the local store lives under ``IMAGE_STORE_DIR``.
+"""
+import asyncio
+import hashlib
+import heapq
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .image_cache_service import MongoDBImageService, detect_image_content_type, image_dimensions
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STORE_BACKEND = os.getenv("IMAGE_STORE_BACKEND", "mongo").lower()
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", "./image_store")
+IMAGE_STORE_GC_GRACE_SECONDS = float(os.getenv("IMAGE_STORE_GC_GRACE_SECONDS", "3600"))
+
+
+class ImageStore(ABC):
+    """Storage for images keyed by cache key.
+
+    Records returned by ``get`` hold ``cache_key``, ``category``, ``data``
+    (raw bytes), ``byte_size``, ``content_type`` and ``sha256``. ``list``
+    returns metadata only: no ``data``, plus ``width``, ``height`` and
+    ``stored_at`` where known.
+    """
+
+    @abstractmethod
+    async def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return the image record, or None if it is not stored."""
+
+    @abstractmethod
+    async def put(self, cache_key: str, category: str, data: bytes, **metadata) -> bool:
+        """Store an image, replacing any previous image for the cache key."""
+
+    @abstractmethod
+    async def exists(self, cache_key: str) -> bool:
+        """Return whether an image is stored for the cache key."""
+
+    @abstractmethod
+    async def get_many(self, cache_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return the records of every stored image among ``cache_keys``."""
+
+    @abstractmethod
+    async def delete(self, cache_key: str) -> bool:
+        """Delete an image. Returns False if it was not stored."""
+
+    @abstractmethod
+    async def list(
+        self, category: Optional[str] = None, after: Optional[str] = None, limit: int = 100, include_variants: bool = False
+    ) -> List[Dict[str, Any]]:
+        """List image metadata ordered by cache key, starting after the cache key ``after``."""
+
+    async def ensure_indexes(self) -> None:
+        """Prepare any indexes the backend needs. Safe to call on every startup."""
+
+
+class MongoImageStore(ImageStore):
+    """Images in MongoDB, via MongoDBImageService."""
+
+    async def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        return await MongoDBImageService.get_image_record(cache_key)
+
+    async def put(self, cache_key: str, category: str, data: bytes, **metadata) -> bool:
+        return await MongoDBImageService.save_image_bytes(cache_key, category, data, **metadata)
+
+    async def exists(self, cache_key: str) -> bool:
+        return await MongoDBImageService.image_exists(cache_key)
+
+    async def get_many(self, cache_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        return await MongoDBImageService.get_image_records(cache_keys)
+
+    async def delete(self, cache_key: str) -> bool:
+        return await MongoDBImageService.delete_image(cache_key)
+
+    async def list(
+        self, category: Optional[str] = None, after: Optional[str] = None, limit: int = 100, include_variants: bool = False
+    ) -> List[Dict[str, Any]]:
+        return await MongoDBImageService.list_images(category, after, limit, include_variants)
+
+    async def ensure_indexes(self) -> None:
+        await MongoDBImageService.ensure_indexes()
+
+
+class LocalImageStore(ImageStore):
+    """Content-addressed images on the local filesystem.
+
+    Image bytes are stored once per SHA-256 under ``blobs/ab/cd/<sha256>``
+    and each cache key has a small JSON entry under ``keys/ab/<hash>.json``
+    pointing at its blob, so identical images share one file. Every file is
+    written to a temporary name and renamed into place, so readers (in this
+    or another process) never see a partial file.
+
+    ``index/<category>/`` holds an empty marker per cache key, named by the
+    hex of the key (with a ``.v`` suffix for variants), so a sorted
+    directory listing is in cache-key order and ``list`` only reads the
+    entries of the page it returns. Hex names limit cache keys to 120 bytes.
+
+    Blobs no longer referenced by any key are removed by ``collect_garbage``
+    once they are older than ``gc_grace_seconds``, which covers puts that
+    have written a blob but not yet its key.
+    """
+
+    def __init__(self, root: str, gc_grace_seconds: float = IMAGE_STORE_GC_GRACE_SECONDS):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.key_dir = os.path.join(root, "keys")
+        self.index_dir = os.path.join(root, "index")
+        self.gc_grace_seconds = gc_grace_seconds
+        # Orders a put's blob write against garbage collection of that blob
+        self._blob_lock = threading.Lock()
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.key_dir, exist_ok=True)
+        if not os.path.isdir(self.index_dir):
+            self._rebuild_index()
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blob_dir, sha256[:2], sha256[2:4], sha256)
+
+    def _key_path(self, cache_key: str) -> str:
+        key_hash = hashlib.sha256(cache_key.encode()).hexdigest()
+        return os.path.join(self.key_dir, key_hash[:2], f"{key_hash}.json")
+
+    def _index_path(self, entry: Dict[str, Any], index_dir: Optional[str] = None) -> str:
+        name = entry["cache_key"].encode().hex()
+        if entry.get("variant_of") is not None:
+            name += ".v"
+        return os.path.join(index_dir or self.index_dir, entry["category"].encode().hex(), name)
+
+    def _add_to_index(self, entry: Dict[str, Any], index_dir: Optional[str] = None) -> None:
+        path = self._index_path(entry, index_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "ab").close()
+
+    def _remove_from_index(self, entry: Dict[str, Any]) -> None:
+        try:
+            os.remove(self._index_path(entry))
+        except FileNotFoundError:
+            pass
+
+    def _rebuild_index(self) -> None:
+        """Index the keys of a store written before the index existed."""
+        staging = tempfile.mkdtemp(dir=self.root, prefix=".tmp-index-")
+        for entry in self._entries():
+            self._add_to_index(entry, staging)
+        try:
+            os.rename(staging, self.index_dir)
+        except OSError:
+            # Another process built it first
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _read_entry(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._key_path(cache_key), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def _read_blob(self, sha256: str) -> Optional[bytes]:
+        try:
+            with open(self.blob_path(sha256), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        entry = self._read_entry(cache_key)
+        if entry is None:
+            return None
+        data = self._read_blob(entry["sha256"])
+        if data is None:
+            logger.warning(f"Local image store entry {cache_key} points at a missing blob")
+            return None
+        return {**entry, "data": data}
+
+    def _put(self, cache_key: str, category: str, data: bytes, metadata: Dict[str, Any]) -> None:
+        sha256 = hashlib.sha256(data).hexdigest()
+        width, height = image_dimensions(data)
+        blob_path = self.blob_path(sha256)
+        with self._blob_lock:
+            try:
+                # A fresh mtime keeps a shared blob out of the next collection
+                os.utime(blob_path)
+            except FileNotFoundError:
+                self._write_atomic(blob_path, data)
+        previous = self._read_entry(cache_key)
+        entry = {
+            "cache_key": cache_key,
+            "category": category,
+            "byte_size": len(data),
+            "content_type": detect_image_content_type(data),
+            "sha256": sha256,
+            "width": width,
+            "height": height,
+            "stored_at": datetime.now(timezone.utc).isoformat(),
+            **metadata,
+        }
+        self._write_atomic(self._key_path(cache_key), json.dumps(entry).encode())
+        self._add_to_index(entry)
+        if previous is not None and self._index_path(previous) != self._index_path(entry):
+            self._remove_from_index(previous)
+
+    def _delete(self, cache_key: str) -> bool:
+        entry = self._read_entry(cache_key)
+        try:
+            os.remove(self._key_path(cache_key))
+        except FileNotFoundError:
+            return False
+        if entry is not None:
+            self._remove_from_index(entry)
+        return True
+
+    def _entries(self):
+        for shard in sorted(os.listdir(self.key_dir)):
+            shard_dir = os.path.join(self.key_dir, shard)
+            for name in os.listdir(shard_dir):
+                if name.endswith(".json") and not name.startswith(".tmp-"):
+                    try:
+                        with open(os.path.join(shard_dir, name), "rb") as f:
+                            yield json.loads(f.read())
+                    except FileNotFoundError:
+                        # Deleted while we were listing
+                        continue
+
+    def _index_names(self, category_dir: str) -> List[str]:
+        try:
+            return sorted(os.listdir(os.path.join(self.index_dir, category_dir)))
+        except FileNotFoundError:
+            return []
+
+    def _list(self, category: Optional[str], after: Optional[str], limit: int, include_variants: bool) -> List[Dict[str, Any]]:
+        if not category or category == "all":
+            category_dirs = os.listdir(self.index_dir)
+        else:
+            category_dirs = [category.encode().hex()]
+        # Hex keeps the byte order of the cache keys, so name order is key order
+        names = heapq.merge(*(self._index_names(name) for name in category_dirs), key=lambda name: name.partition(".")[0])
+        after_hex = after.encode().hex() if after is not None else None
+        entries = []
+        for name in names:
+            if len(entries) >= limit:
+                break
+            key_hex, _, variant = name.partition(".")
+            if (after_hex is not None and key_hex <= after_hex) or (variant and not include_variants):
+                continue
+            entry = self._read_entry(bytes.fromhex(key_hex).decode())
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def _collect_garbage(self) -> int:
+        referenced = {entry["sha256"] for entry in self._entries()}
+        cutoff = time.time() - self.gc_grace_seconds
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.blob_dir):
+            for name in filenames:
+                if name in referenced or name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(dirpath, name)
+                with self._blob_lock:
+                    try:
+                        # Recently written or reused by a put whose key may not be stored yet
+                        if os.stat(path).st_mtime > cutoff:
+                            continue
+                        os.remove(path)
+                    except FileNotFoundError:
+                        continue
+                removed += 1
+        return removed
+
+    async def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, cache_key)
+
+    async def put(self, cache_key: str, category: str, data: bytes, **metadata) -> bool:
+        try:
+            await asyncio.to_thread(self._put, cache_key, category, data, metadata)
+            return True
+        except OSError as e:
+            logger.error(f"Error saving image to local store: {cache_key}: {e}")
+            return False
+
+    async def exists(self, cache_key: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self._key_path(cache_key))
+
+    async def get_many(self, cache_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        records = await asyncio.gather(*(self.get(cache_key) for cache_key in dict.fromkeys(cache_keys)))
+        return {record["cache_key"]: record for record in records if record is not None}
+
+    async def delete(self, cache_key: str) -> bool:
+        return await asyncio.to_thread(self._delete, cache_key)
+
+    async def list(
+        self, category: Optional[str] = None, after: Optional[str] = None, limit: int = 100, include_variants: bool = False
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._list, category, after, limit, include_variants)
+
+    async def collect_garbage(self) -> int:
+        """Remove blobs that no cache key refers to any more."""
+        removed = await asyncio.to_thread(self._collect_garbage)
+        logger.info(f"Removed {removed} unreferenced blobs from the local image store")
+        return removed
+
+
+def create_image_store(backend: str = IMAGE_STORE_BACKEND) -> ImageStore:
+    if backend == "mongo":
+        return MongoImageStore()
+    if backend == "local":
+        return LocalImageStore(IMAGE_STORE_DIR)
+    raise ValueError(f"Unknown IMAGE_STORE_BACKEND: {backend}")
+
+
+image_store = create_image_store()
@@ -0,0 +1,163 @@
+"""Resized and re-encoded renditions ("variants") of cached images.
+
+When an image is saved, every configured variant is rendered in a process
+pool so the CPU-heavy decode/resize/encode never runs on the event loop,
+and stored next to the original under ``<cache_key>@<variant>``.
+
+Variants are configured with ``IMAGE_VARIANTS`` as a comma separated list of
+``name:max_size:format`` entries. ``max_size`` bounds the longest edge in
+pixels (0 keeps the original size) and ``format`` is png, webp, jpeg or avif.
+AVIF is opt-in (e.g. ``medium_512_avif:512:avif``) and its variants are
+dropped at startup when Pillow was built without AVIF support.
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Set
+
+from .image_store import image_store
+
+logger = logging.getLogger(__name__)
+
+VariantSpec = namedtuple("VariantSpec", ["name", "max_size", "format"])
+
+DEFAULT_IMAGE_VARIANTS = "thumb_96:96:webp,small_256:256:webp,medium_512:512:webp,full_webp:0:webp"
+
+VARIANT_CONTENT_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "avif": "image/avif",
+}
+
+def parse_variant_specs(text: str) -> Dict[str, VariantSpec]:
+    """Parse an IMAGE_VARIANTS style string into variant specs keyed by name."""
+    specs = {}
+    for entry in text.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, max_size, image_format = entry.split(":")
+        image_format = image_format.lower()
+        if image_format not in VARIANT_CONTENT_TYPES:
+            raise ValueError(f"Unsupported variant format '{image_format}' in '{entry}'")
+        specs[name] = VariantSpec(name, int(max_size), image_format)
+    return specs
+
+def avif_supported() -> bool:
+    try:
+        from PIL import features
+    except ImportError:
+        return False
+    return bool(features.check("avif"))
+
+def drop_unsupported_variants(specs: Dict[str, VariantSpec]) -> Dict[str, VariantSpec]:
+    """Leave out AVIF variants when Pillow cannot encode AVIF, warning once instead of on every save."""
+    avif = [name for name, spec in specs.items() if spec.format == "avif"]
+    if not avif or avif_supported():
+        return specs
+    logger.warning(f"Pillow has no AVIF support; skipping image variants {', '.join(avif)}")
+    return {name: spec for name, spec in specs.items() if name not in avif}
+
+IMAGE_VARIANTS = drop_unsupported_variants(parse_variant_specs(os.getenv("IMAGE_VARIANTS", DEFAULT_IMAGE_VARIANTS)))
+IMAGE_PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_pending_tasks: Set[asyncio.Task] = set()
+
+def get_image_process_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool used for CPU-bound image work."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS)
+        logger.info(f"Started image process pool with {IMAGE_PROCESS_WORKERS} workers")
+    return _process_pool
+
+def variant_cache_key(cache_key: str, variant: str) -> str:
+    return f"{cache_key}@{variant}"
+
+def render_variant(data: bytes, max_size: int, image_format: str) -> bytes:
+    """Resize and re-encode an image. Runs inside the process pool."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        if max_size and max(image.size) > max_size:
+            image.thumbnail((max_size, max_size), Image.LANCZOS)
+        if image_format == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        save_options = {"optimize": True} if image_format in ("png", "jpeg") else {"quality": 80}
+        image.save(output, format=image_format.upper(), **save_options)
+        return output.getvalue()
+
+async def render_variant_async(data: bytes, spec: VariantSpec) -> bytes:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_image_process_pool(), render_variant, data, spec.max_size, spec.format)
+
+async def build_image_variant(cache_key: str, data: bytes, spec: VariantSpec, category: str) -> Optional[bytes]:
+    """Render one variant of an image and store it next to the original."""
+    try:
+        variant_data = await render_variant_async(data, spec)
+    except Exception as e:
+        # e.g. Pillow missing or built without AVIF support
+        logger.warning(f"Could not render variant {spec.name} for {cache_key}: {type(e).__name__} - {e}")
+        return None
+    await image_store.put(
+        variant_cache_key(cache_key, spec.name),
+        category,
+        variant_data,
+        variant_of=cache_key,
+        variant=spec.name,
+    )
+    return variant_data
+
+async def build_image_variants(cache_key: str, data: bytes) -> int:
+    """Render and store every configured variant of an image."""
+    category = cache_key.split("_")[0] if "_" in cache_key else "unknown"
+    results = await asyncio.gather(
+        *(build_image_variant(cache_key, data, spec, category) for spec in IMAGE_VARIANTS.values())
+    )
+    built = sum(1 for result in results if result is not None)
+    logger.info(f"Built {built}/{len(IMAGE_VARIANTS)} variants for {cache_key}")
+    return built
+
+def schedule_image_variants(cache_key: str, data: bytes) -> Optional[asyncio.Task]:
+    """Build variants in the background so saving an image never waits on them."""
+    if not IMAGE_VARIANTS:
+        return None
+    task = asyncio.ensure_future(build_image_variants(cache_key, data))
+    _pending_tasks.add(task)
+    task.add_done_callback(_pending_tasks.discard)
+    return task
+
+async def get_image_variant_record(cache_key: str, variant: str) -> Optional[dict]:
+    """Return a stored variant, rendering it on demand if it is missing.
+
+    Returns None if the variant name is unknown or the original is not cached.
+    """
+    spec = IMAGE_VARIANTS.get(variant)
+    if spec is None:
+        return None
+    record = await image_store.get(variant_cache_key(cache_key, variant))
+    if record is not None:
+        return record
+
+    original = await image_store.get(cache_key)
+    if original is None:
+        return None
+    variant_data = await build_image_variant(cache_key, original["data"], spec, original.get("category") or "unknown")
+    if variant_data is None:
+        return None
+    return {
+        "cache_key": variant_cache_key(cache_key, variant),
+        "category": original.get("category"),
+        "data": variant_data,
+        "byte_size": len(variant_data),
+        "content_type": VARIANT_CONTENT_TYPES[spec.format],
+        "sha256": hashlib.sha256(variant_data).hexdigest(),
+    }
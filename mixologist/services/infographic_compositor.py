@@ -0,0 +1,201 @@
+"""Lay out cocktail infographics locally from cached component images.
+
+When every ingredient, glassware and garnish image for a drink is already
+cached, the recipe infographic can be composed from them with Pillow in a
+fraction of a second instead of asking the image model to render the whole
+1024x1536 picture. The layout follows ``build_cocktail_infographic_prompt``:
+the drink name on top, labeled ingredient photos, the preparation tools and
+numbered steps joined by a dotted line, and the serving glass with its
+garnish at the bottom.
+
+Rendering is CPU bound, so it runs in the shared image process pool.
+"""
+import asyncio
+import io
+import logging
+from typing import List, Optional, Tuple
+
+from .image_variant_service import get_image_process_pool
+
+logger = logging.getLogger(__name__)
+
+CANVAS_SIZE = (1024, 1536)
+MARGIN = 48
+BACKGROUND = (255, 255, 255, 255)
+INK = (28, 28, 30, 255)
+MUTED = (110, 108, 100, 255)
+ACCENT = (212, 175, 55, 255)
+PILL = (245, 241, 232, 255)
+
+MAX_INGREDIENT_TILES = 6
+MAX_STEPS = 4
+
+# (label, image bytes) for one component photo
+Tile = Tuple[str, bytes]
+
+
+def _font(size: int):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 has only the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def _wrap(draw, text: str, font, width: int, max_lines: int) -> List[str]:
+    lines: List[str] = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if line and draw.textlength(candidate, font=font) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1].rstrip(".,") + "…"
+    return lines
+
+
+def _draw_centered(draw, text: str, font, center_x: int, y: int, fill) -> None:
+    draw.text((center_x - draw.textlength(text, font=font) / 2, y), text, font=font, fill=fill)
+
+
+def _paste_fitted(canvas, data: bytes, box: Tuple[int, int, int, int]) -> None:
+    """Scale an image to fit ``box`` (left, top, right, bottom) and paste it centered."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGBA")
+        width, height = box[2] - box[0], box[3] - box[1]
+        image.thumbnail((width, height), Image.LANCZOS)
+        left = box[0] + (width - image.width) // 2
+        top = box[1] + (height - image.height) // 2
+        canvas.alpha_composite(image, (left, top))
+
+
+def _dotted_line(draw, x: int, top: int, bottom: int) -> None:
+    for y in range(top, bottom, 14):
+        draw.ellipse((x - 3, y - 3, x + 3, y + 3), fill=ACCENT)
+
+
+def render_infographic(
+    drink_name: str,
+    ingredient_tiles: List[Tile],
+    glass_tile: Tile,
+    garnish_tile: Optional[Tile] = None,
+    tool_icons: Optional[List[str]] = None,
+    steps: Optional[List[str]] = None,
+    details: Optional[List[str]] = None,
+) -> bytes:
+    """Compose the infographic and return it as PNG bytes. Runs inside the process pool."""
+    from PIL import Image, ImageDraw
+
+    canvas = Image.new("RGBA", CANVAS_SIZE, BACKGROUND)
+    draw = ImageDraw.Draw(canvas)
+    width = CANVAS_SIZE[0]
+    center_x = width // 2
+
+    # Title and details
+    title_font = _font(60)
+    y = MARGIN
+    for line in _wrap(draw, drink_name, title_font, width - 2 * MARGIN, 2):
+        _draw_centered(draw, line, title_font, center_x, y, INK)
+        y += 70
+    if details:
+        _draw_centered(draw, "  ·  ".join(details), _font(28), center_x, y + 4, MUTED)
+        y += 44
+
+    # Ingredient photos, three per row
+    section_font = _font(30)
+    label_font = _font(24)
+    y += 16
+    draw.text((MARGIN, y), "INGREDIENTS", font=section_font, fill=ACCENT)
+    y += 48
+    columns = 3
+    tile_width = (width - 2 * MARGIN) // columns
+    image_size = tile_width - 40
+    for index, (label, data) in enumerate(ingredient_tiles[:MAX_INGREDIENT_TILES]):
+        row, column = divmod(index, columns)
+        left = MARGIN + column * tile_width + 20
+        top = y + row * (image_size + 76)
+        _paste_fitted(canvas, data, (left, top, left + image_size, top + image_size))
+        for line_index, line in enumerate(_wrap(draw, label, label_font, tile_width - 16, 2)):
+            _draw_centered(draw, line, label_font, left + image_size // 2, top + image_size + 8 + line_index * 28, INK)
+    rows = (min(len(ingredient_tiles), MAX_INGREDIENT_TILES) + columns - 1) // columns
+    y += rows * (image_size + 76) + 8
+
+    # Tools and steps, joined by a dotted line
+    draw.text((MARGIN, y), "METHOD", font=section_font, fill=ACCENT)
+    y += 48
+    pill_font = _font(24)
+    x = MARGIN
+    for icon in (tool_icons or [])[:4]:
+        text = icon.replace(" icon", "")
+        pill_width = int(draw.textlength(text, font=pill_font)) + 32
+        draw.rounded_rectangle((x, y, x + pill_width, y + 40), radius=20, fill=PILL)
+        draw.text((x + 16, y + 7), text, font=pill_font, fill=INK)
+        x += pill_width + 12
+    if tool_icons:
+        y += 60
+    step_font = _font(26)
+    number_font = _font(22)
+    step_rows = []
+    for step in (steps or [])[:MAX_STEPS]:
+        lines = _wrap(draw, step, step_font, width - 2 * MARGIN - 60, 2)
+        step_rows.append((y, lines))
+        y += max(1, len(lines)) * 32 + 20
+    if len(step_rows) > 1:
+        # Drawn first so the numbered badges sit on top of it
+        _dotted_line(draw, MARGIN + 18, step_rows[0][0] + 18, step_rows[-1][0] + 18)
+    for number, (top, lines) in enumerate(step_rows, start=1):
+        draw.ellipse((MARGIN, top, MARGIN + 36, top + 36), fill=ACCENT)
+        _draw_centered(draw, str(number), number_font, MARGIN + 18, top + 6, BACKGROUND)
+        for line_index, line in enumerate(lines):
+            draw.text((MARGIN + 56, top + 4 + line_index * 32), line, font=step_font, fill=INK)
+
+    # Serving glass and garnish
+    serve_top = max(y + 16, CANVAS_SIZE[1] - 380)
+    glass_size = CANVAS_SIZE[1] - serve_top - MARGIN - 40
+    glass_left = center_x - glass_size // 2 - (90 if garnish_tile else 0)
+    _paste_fitted(canvas, glass_tile[1], (glass_left, serve_top, glass_left + glass_size, serve_top + glass_size))
+    _draw_centered(draw, glass_tile[0], label_font, glass_left + glass_size // 2, serve_top + glass_size + 8, INK)
+    if garnish_tile:
+        garnish_size = glass_size * 2 // 3
+        garnish_left = glass_left + glass_size + 40
+        garnish_top = serve_top + (glass_size - garnish_size) // 2
+        _paste_fitted(canvas, garnish_tile[1], (garnish_left, garnish_top, garnish_left + garnish_size, garnish_top + garnish_size))
+        _draw_centered(draw, garnish_tile[0], label_font, garnish_left + garnish_size // 2, garnish_top + garnish_size + 8, INK)
+
+    output = io.BytesIO()
+    canvas.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+async def compose_infographic(
+    drink_name: str,
+    ingredient_tiles: List[Tile],
+    glass_tile: Tile,
+    garnish_tile: Optional[Tile] = None,
+    tool_icons: Optional[List[str]] = None,
+    steps: Optional[List[str]] = None,
+    details: Optional[List[str]] = None,
+) -> bytes:
+    """Render an infographic in the image process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_image_process_pool(),
+        render_infographic,
+        drink_name,
+        ingredient_tiles,
+        glass_tile,
+        garnish_tile,
+        tool_icons,
+        steps,
+        details,
+    )
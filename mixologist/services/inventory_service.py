@@ -4,7 +4,6 @@ import aiofiles
 from pathlib import Path
 from typing import Optional, List, Dict
 from datetime import datetime
-import openai
 import os
 import logging
 from dotenv import load_dotenv
@@ -14,6 +13,9 @@ from ..models.inventory_models import (
     ImageRecognitionRequest, ImageRecognitionResponse, RecognizedIngredient,
     InventoryFilterRequest, InventoryStats, QuantityDescription, IngredientCategory
 )
+from .openai_client import openai_clients
+from .llm_call_policy import call_policies
+from .openai_scheduler import openai_scheduler
 
 load_dotenv()
 
@@ -35,8 +37,8 @@ try:
         client = None
         async_client = None
     else:
-        client = openai.OpenAI(api_key=api_key)
-        async_client = openai.AsyncOpenAI(api_key=api_key)
+        client = openai_clients.sync_client()
+        async_client = openai_clients.async_client()
 except Exception as e:
     print(f"Warning: Could not initialize OpenAI client: {e}")
     client = None
@@ -282,7 +284,8 @@ class InventoryService:
         
         try:
             print("🚀 Sending request to OpenAI...")
-            response = await async_client.chat.completions.create(
+            response = await call_policies["inventory_vision"].call(lambda: openai_scheduler.create(
+                async_client.chat.completions.create,
                 model="gpt-4o",  # Use GPT-4o for vision capabilities
                 messages=[
                     {
@@ -303,7 +306,7 @@ class InventoryService:
                 ],
                 max_tokens=1500,
                 temperature=0.3
-            )
+            ))
             
             content = response.choices[0].message.content
             
@@ -0,0 +1,85 @@
+"""Incremental parsing of a streamed JSON object.
+
+A streamed tool call delivers its JSON arguments in small fragments.
+``IncrementalObjectParser`` consumes those fragments and reports each
+top-level field of the object as soon as its value is complete, so callers
+can act on ``drink_name`` or ``ingredients`` long before the closing brace
+arrives. Every character is scanned once; a value is decoded with
+``json.loads`` only when it is complete.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class IncrementalObjectParser:
+    """Reports the completed top-level fields of a JSON object fed in fragments."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._expecting_key = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._buffer
+
+    def _finish_value(self, end: int) -> List[Tuple[str, Any]]:
+        if self._key is None or self._value_start is None:
+            return []
+        raw = self._buffer[self._value_start:end].strip()
+        key, self._key, self._value_start = self._key, None, None
+        return [(key, json.loads(raw))]
+
+    def feed(self, fragment: str) -> List[Tuple[str, Any]]:
+        """Add a fragment and return ``(field, value)`` for each field it completed.
+
+        Raises ``ValueError`` (``json.JSONDecodeError``) if a field's value is not valid JSON.
+        """
+        self._buffer += fragment
+        fields: List[Tuple[str, Any]] = []
+        buffer = self._buffer
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None:
+                        self._key = json.loads(buffer[self._key_start:pos + 1])
+                        self._key_start = None
+                continue
+            if self.done:
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expecting_key:
+                    self._expecting_key = False
+                    self._key_start = pos
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expecting_key = True
+            elif char in "}]":
+                if self._depth == 1:
+                    fields.extend(self._finish_value(pos))
+                    self.done = True
+                self._depth -= 1
+            elif self._depth == 1:
+                if char == ":":
+                    self._value_start = pos + 1
+                elif char == ",":
+                    fields.extend(self._finish_value(pos))
+                    self._expecting_key = True
+        self._pos = len(buffer)
+        return fields
@@ -0,0 +1,221 @@
+"""Deadlines, retries and hedging for OpenAI calls.
+
+A ``CallPolicy`` wraps one kind of call (a recipe completion, a prompt
+refinement, the start of an image stream...) and runs it:
+
+* within a **deadline** covering every attempt, including time spent
+  waiting in the OpenAI scheduler; when it passes the call fails with a
+  ``timeout_error`` ``OpenAIAPIException`` (504);
+* with **retries** on retryable errors (rate limits, timeouts, connection
+  and server errors, as classified by ``map_openai_error``), sleeping a
+  jittered exponential backoff between attempts, and only while the
+  backoff still fits in the deadline;
+* optionally with **hedging**: once the policy has seen enough calls, an
+  attempt still running after the observed p95 latency gets a second,
+  identical request. Whichever answers first wins and the other is
+  cancelled.
+
+Each policy records per-attempt latencies and which attempt won (e.g.
+``attempt_1_primary`` or ``attempt_1_hedge``) so the deadlines and hedge
+quantile can be tuned from real traffic; see ``call_policy_stats()``.
+
+The OpenAI SDK's own retries are turned off (``max_retries=0``) on the
+client these policies are used with, so retries are not multiplied.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from .openai_error_handling import OpenAIAPIException, map_openai_error
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+LLM_RETRY_MAX_DELAY_SECONDS = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "4"))
+LLM_HEDGING = os.getenv("LLM_HEDGING", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+
+RECIPE_DEADLINE_SECONDS = float(os.getenv("RECIPE_DEADLINE_SECONDS", "30"))
+RECIPE_CORE_DEADLINE_SECONDS = float(os.getenv("RECIPE_CORE_DEADLINE_SECONDS", "15"))
+RECIPE_ENRICHMENT_DEADLINE_SECONDS = float(os.getenv("RECIPE_ENRICHMENT_DEADLINE_SECONDS", "30"))
+PROMPT_REFINEMENT_DEADLINE_SECONDS = float(os.getenv("PROMPT_REFINEMENT_DEADLINE_SECONDS", "15"))
+STREAM_START_DEADLINE_SECONDS = float(os.getenv("STREAM_START_DEADLINE_SECONDS", "60"))
+INVENTORY_VISION_DEADLINE_SECONDS = float(os.getenv("INVENTORY_VISION_DEADLINE_SECONDS", "60"))
+
+# ``map_openai_error`` types worth another attempt
+RETRYABLE_ERROR_TYPES = {
+    "rate_limit_error",
+    "timeout_error",
+    "api_connection_error",
+    "service_unavailable_error",
+    "api_error",
+}
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, OpenAIAPIException):
+        return error.error_type in RETRYABLE_ERROR_TYPES
+    _, error_type, _, _ = map_openai_error(error)
+    return error_type in RETRYABLE_ERROR_TYPES
+
+
+def _percentile(values, quantile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+class CallPolicy:
+    """Deadline, retry and hedging policy for one kind of OpenAI call."""
+
+    def __init__(
+        self,
+        name: str,
+        deadline_seconds: float,
+        max_attempts: int = LLM_MAX_ATTEMPTS,
+        base_delay_seconds: float = LLM_RETRY_BASE_DELAY_SECONDS,
+        max_delay_seconds: float = LLM_RETRY_MAX_DELAY_SECONDS,
+        hedge: bool = LLM_HEDGING,
+        hedge_quantile: float = LLM_HEDGE_QUANTILE,
+        hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        latency_window: int = LLM_LATENCY_WINDOW,
+        rng: Optional[random.Random] = None,
+    ):
+        self.name = name
+        self.deadline_seconds = deadline_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.rng = rng or random.Random()
+        self.latencies: Deque[float] = deque(maxlen=latency_window)
+        self.calls = 0
+        self.failures = 0
+        self.deadline_exceeded = 0
+        self.retries = 0
+        self.hedges = 0
+        self.wins: Counter = Counter()
+        self.errors: Counter = Counter()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which an attempt is hedged, or None while hedging is off or unwarmed."""
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        return _percentile(self.latencies, self.hedge_quantile)
+
+    def retry_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before attempt ``attempt + 1``."""
+        ceiling = min(self.max_delay_seconds, self.base_delay_seconds * (2 ** (attempt - 1)))
+        return self.rng.uniform(0, ceiling)
+
+    async def _timed(self, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, float]:
+        started = time.monotonic()
+        result = await fn()
+        return result, time.monotonic() - started
+
+    async def _attempt(self, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, float, str]:
+        """One attempt, hedged with a second request if it outlives the hedge delay."""
+        primary = asyncio.ensure_future(self._timed(fn))
+        tasks = {primary: "primary"}
+        try:
+            hedge_delay = self.hedge_delay()
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+                if not done:
+                    self.hedges += 1
+                    tasks[asyncio.ensure_future(self._timed(fn))] = "hedge"
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        result, latency = task.result()
+                        return result, latency, tasks[task]
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` (a coroutine factory, called once per request) under this policy."""
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline_seconds
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result, latency, winner = await asyncio.wait_for(self._attempt(fn), deadline - loop.time())
+            except asyncio.TimeoutError:
+                self.failures += 1
+                self.deadline_exceeded += 1
+                logger.warning(f"{self.name} call exceeded its {self.deadline_seconds:g}s deadline")
+                raise OpenAIAPIException(
+                    504, "timeout_error", f"{self.name} call exceeded its {self.deadline_seconds:g}s deadline"
+                )
+            except Exception as e:
+                self.errors[type(e).__name__] += 1
+                delay = self.retry_delay(attempt)
+                if not is_retryable(e) or attempt >= self.max_attempts or loop.time() + delay >= deadline:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                logger.info(f"Retrying {self.name} call in {delay:.2f}s after attempt {attempt} failed: {e}")
+                await asyncio.sleep(delay)
+                continue
+            self.latencies.append(latency)
+            self.wins[f"attempt_{attempt}_{winner}"] += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        hedge_delay = self.hedge_delay()
+        return {
+            "deadline_seconds": self.deadline_seconds,
+            "calls": self.calls,
+            "failures": self.failures,
+            "deadline_exceeded": self.deadline_exceeded,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "wins": dict(self.wins),
+            "errors": dict(self.errors),
+            "latency_seconds": {
+                quantile: round(value, 3) if value is not None else None
+                for quantile, value in (
+                    ("p50", _percentile(self.latencies, 0.5)),
+                    ("p95", _percentile(self.latencies, 0.95)),
+                    ("p99", _percentile(self.latencies, 0.99)),
+                )
+            },
+            "hedge_delay_seconds": round(hedge_delay, 3) if hedge_delay is not None else None,
+        }
+
+
+# Streams are retried when they fail to start but never hedged: a second
+# image generation costs far more than the latency it would save. Vision
+# requests are not hedged either: each one uploads the whole photo again.
+call_policies: Dict[str, CallPolicy] = {
+    "recipe": CallPolicy("recipe", RECIPE_DEADLINE_SECONDS),
+    "recipe_core": CallPolicy("recipe_core", RECIPE_CORE_DEADLINE_SECONDS),
+    "recipe_enrichment": CallPolicy("recipe_enrichment", RECIPE_ENRICHMENT_DEADLINE_SECONDS),
+    "prompt_refinement": CallPolicy("prompt_refinement", PROMPT_REFINEMENT_DEADLINE_SECONDS),
+    "recipe_stream": CallPolicy("recipe_stream", STREAM_START_DEADLINE_SECONDS, hedge=False),
+    "image_stream": CallPolicy("image_stream", STREAM_START_DEADLINE_SECONDS, hedge=False),
+    "inventory_vision": CallPolicy("inventory_vision", INVENTORY_VISION_DEADLINE_SECONDS, hedge=False),
+}
+
+
+def call_policy_stats() -> Dict[str, Any]:
+    return {name: policy.stats() for name, policy in call_policies.items()}
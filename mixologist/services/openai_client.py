@@ -0,0 +1,213 @@
+"""The OpenAI clients shared by every service in the process.
+
+``openai_clients.async_client()`` and ``openai_clients.sync_client()``
+return one ``AsyncOpenAI``/``OpenAI`` instance each, so recipe, image and
+inventory calls reuse the same connections. Their httpx clients are tuned
+for bursty traffic to a single host:
+
+* explicit pool limits (``OPENAI_MAX_CONNECTIONS``,
+  ``OPENAI_MAX_KEEPALIVE_CONNECTIONS``) and a keep-alive expiry
+  (``OPENAI_KEEPALIVE_EXPIRY_SECONDS``) well above httpx's 5 s default,
+  so connections survive the gaps between bursts instead of being closed
+  and re-handshaken;
+* HTTP/2 (``OPENAI_HTTP2``, needs the ``h2`` package), which multiplexes
+  concurrent requests over one connection.
+
+``prewarm()`` opens connections to the API host at startup, so the first
+requests after a deploy skip DNS and the TLS handshake. ``stats()``
+reports pool usage: connections in use and idle, queued requests,
+requests sent while the pool was saturated, and connections opened (the
+churn) by HTTP version.
+
+The async client is created with ``max_retries=0``: OpenAI calls are
+retried by their call policy (``llm_call_policy``), not by the SDK.
+"""
+import asyncio
+import logging
+import os
+import weakref
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import httpx
+import openai
+
+from .openai_scheduler import openai_scheduler
+
+logger = logging.getLogger(__name__)
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "90"))
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "true").lower() in ("1", "true", "yes")
+OPENAI_PREWARM_CONNECTIONS = int(os.getenv("OPENAI_PREWARM_CONNECTIONS", "2"))
+OPENAI_PREWARM_TIMEOUT_SECONDS = float(os.getenv("OPENAI_PREWARM_TIMEOUT_SECONDS", "10"))
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PoolStats:
+    """Counts requests and new connections through httpx event hooks."""
+
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.saturated = 0
+        self.connections_opened: Counter = Counter()
+        # Network streams already seen; a new one means a new connection
+        self._streams = weakref.WeakSet()
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        snapshot = self.snapshot()
+        if snapshot.get("idle") == 0 and snapshot.get("connections", 0) >= self.max_connections:
+            self.saturated += 1
+
+    async def on_response(self, response: httpx.Response) -> None:
+        stream = response.extensions.get("network_stream")
+        if stream is None:
+            return
+        try:
+            if stream in self._streams:
+                return
+            self._streams.add(stream)
+        except TypeError:
+            return  # stream type cannot be weakly referenced
+        self.connections_opened[response.http_version] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """Current connections of the httpcore pool behind the async client."""
+        pool = getattr(getattr(self.http_client, "_transport", None), "_pool", None)
+        if pool is None:
+            return {}
+        try:
+            connections = list(pool.connections)
+            idle = sum(1 for connection in connections if connection.is_idle())
+            queued = sum(1 for request in pool._requests if request.is_queued())
+        except Exception as e:
+            logger.warning(f"Could not inspect the OpenAI connection pool: {e}")
+            return {}
+        return {"connections": len(connections), "in_use": len(connections) - idle, "idle": idle, "queued": queued}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.snapshot(),
+            "max_connections": self.max_connections,
+            "requests": self.requests,
+            "saturated_requests": self.saturated,
+            "connections_opened": dict(self.connections_opened),
+        }
+
+
+class OpenAIClientFactory:
+    """Builds the process's OpenAI clients once, on first use."""
+
+    def __init__(
+        self,
+        max_connections: int = OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections: int = OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+        http2: bool = OPENAI_HTTP2,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        if http2 and not http2_available():
+            logger.warning("OPENAI_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.transport = transport
+        self.pool_stats = PoolStats(max_connections)
+        self._async_client: Optional[openai.AsyncOpenAI] = None
+        self._sync_client: Optional[openai.OpenAI] = None
+
+    def async_client(self) -> Optional[openai.AsyncOpenAI]:
+        """The shared ``AsyncOpenAI`` client, or None when ``OPENAI_API_KEY`` is not set."""
+        if self._async_client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                return None
+            event_hooks = openai_scheduler.http_event_hooks()
+            event_hooks.setdefault("request", []).append(self.pool_stats.on_request)
+            event_hooks.setdefault("response", []).append(self.pool_stats.on_response)
+            http_client = openai.DefaultAsyncHttpxClient(
+                limits=self.limits, http2=self.http2, transport=self.transport, event_hooks=event_hooks
+            )
+            self.pool_stats.http_client = http_client
+            self._async_client = openai.AsyncOpenAI(api_key=api_key, max_retries=0, http_client=http_client)
+        return self._async_client
+
+    def sync_client(self) -> Optional[openai.OpenAI]:
+        """The shared ``OpenAI`` client, or None when ``OPENAI_API_KEY`` is not set."""
+        if self._sync_client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                return None
+            self._sync_client = openai.OpenAI(
+                api_key=api_key,
+                http_client=openai.DefaultHttpxClient(limits=self.limits, http2=self.http2),
+            )
+        return self._sync_client
+
+    async def prewarm(self, connections: int = OPENAI_PREWARM_CONNECTIONS) -> int:
+        """Open connections to the API host ahead of the first request. Returns how many succeeded.
+
+        Each connection is opened with an unauthenticated ``HEAD`` of the
+        API base URL; the response does not matter, only that the TLS
+        connection is then kept alive in the pool. Over HTTP/2 concurrent
+        requests share one connection, so a single one is opened.
+        """
+        client = self.async_client()
+        if client is None or connections <= 0:
+            return 0
+        http_client = self.pool_stats.http_client
+        url = str(client.base_url)
+
+        async def connect() -> bool:
+            try:
+                await http_client.head(url)
+                return True
+            except httpx.HTTPError as e:
+                logger.warning(f"Could not prewarm an OpenAI connection: {type(e).__name__} - {e}")
+                return False
+
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*(connect() for _ in range(1 if self.http2 else connections))),
+                OPENAI_PREWARM_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Prewarming OpenAI connections timed out after {OPENAI_PREWARM_TIMEOUT_SECONDS:g}s")
+            return 0
+        warmed = sum(results)
+        logger.info(f"Prewarmed {warmed} OpenAI connection(s) to {url}")
+        return warmed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry_seconds": self.limits.keepalive_expiry,
+            **self.pool_stats.stats(),
+        }
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+
+openai_clients = OpenAIClientFactory()
@@ -0,0 +1,399 @@
+"""Central scheduler for OpenAI API calls.
+
+Every OpenAI request goes through ``openai_scheduler.create``, which waits
+for a slot of the request's model before calling the SDK:
+
+* **Concurrency** - each model has its own limit (``OPENAI_MAX_CONCURRENCY``,
+  overridden per model with ``OPENAI_MODEL_CONCURRENCY``). Streaming calls
+  hold their slot until the stream is consumed.
+* **Rate-limit budgets** - the ``x-ratelimit-remaining-*``/``x-ratelimit-reset-*``
+  headers of each response, captured by an httpx response hook installed
+  on the OpenAI clients, say how many requests and tokens are left until
+  the window resets. The scheduler counts its own grants against them and
+  holds requests back until the reset when the budget is spent, or until
+  ``retry-after`` after a 429.
+* **Priority lanes** - ``interactive`` (recipes) before ``first_image``
+  (images a user is waiting on) before ``background`` (prefetch and
+  warm-up). The lane comes from the ``openai_scheduling`` context, so a
+  whole background job is scheduled as background work, and ``min_lane``
+  lets image code avoid ever running in the interactive lane. Background
+  work may use at most ``OPENAI_BACKGROUND_SHARE`` of a model's slots, so
+  it can never occupy every slot an interactive request needs.
+* **Fair queuing** - inside a lane, waiting requests are served round-robin
+  by flow (e.g. one flow per prewarm job), so one caller's burst does not
+  hold up everyone else in the lane.
+
+``openai_scheduler.stats()`` reports queue depths, waits and budgets.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lanes in priority order
+INTERACTIVE_LANE = "interactive"
+FIRST_IMAGE_LANE = "first_image"
+BACKGROUND_LANE = "background"
+LANES = (INTERACTIVE_LANE, FIRST_IMAGE_LANE, BACKGROUND_LANE)
+DEFAULT_FLOW = "default"
+
+
+def parse_model_limits(value: str) -> Dict[str, int]:
+    """Parse ``model=limit,model=limit`` into a dict."""
+    limits = {}
+    for part in value.split(","):
+        if "=" not in part:
+            continue
+        model, limit = part.split("=", 1)
+        try:
+            limits[model.strip()] = int(limit)
+        except ValueError:
+            logger.warning(f"Ignoring invalid model limit: {part}")
+    return limits
+
+
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_MODEL_CONCURRENCY = parse_model_limits(os.getenv("OPENAI_MODEL_CONCURRENCY", ""))
+OPENAI_BACKGROUND_SHARE = float(os.getenv("OPENAI_BACKGROUND_SHARE", "0.5"))
+
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar("openai_lane", default=INTERACTIVE_LANE)
+_flow: contextvars.ContextVar[str] = contextvars.ContextVar("openai_flow", default=DEFAULT_FLOW)
+# Model of the request being sent, read by the response hook
+_current_model: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("openai_model", default=None)
+
+
+@contextmanager
+def openai_scheduling(lane: Optional[str] = None, flow: Optional[str] = None) -> Iterator[None]:
+    """Schedule the OpenAI calls made in this context (and tasks it starts) in ``lane``/``flow``."""
+    if lane is not None and lane not in LANES:
+        raise ValueError(f"Unknown OpenAI lane: {lane}")
+    tokens = []
+    if lane is not None:
+        tokens.append((_lane, _lane.set(lane)))
+    if flow is not None:
+        tokens.append((_flow, _flow.set(flow)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class OpenAIFlowMiddleware:
+    """ASGI middleware that schedules each client's OpenAI calls as their own flow.
+
+    A plain ASGI wrapper rather than ``@app.middleware("http")``: it only
+    sets a context variable, so responses (including large streamed image
+    frames) go straight to the server without an extra hop per chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        with openai_scheduling(flow=client[0] if client else None):
+            await self.app(scope, receive, send)
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds in an ``x-ratelimit-reset-*`` value such as ``20ms``, ``1.5s`` or ``6m0s``."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    """Rough token cost of a request: its input at ~4 characters per token plus its output limit."""
+    prompt = kwargs.get("messages", kwargs.get("input", ""))
+    prompt_text = prompt if isinstance(prompt, str) else json.dumps(prompt, default=str)
+    output = kwargs.get("max_tokens") or kwargs.get("max_output_tokens") or 1000
+    return len(prompt_text) // 4 + output
+
+
+class _Waiter:
+    def __init__(self, lane: str, tokens: int):
+        self.lane = lane
+        self.tokens = tokens
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class _Budget:
+    """Remaining requests or tokens until the rate-limit window resets."""
+
+    def __init__(self):
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+
+    def update(self, remaining: Optional[str], reset: Optional[str], now: float) -> None:
+        if remaining is None:
+            return
+        try:
+            self.remaining = int(remaining)
+        except ValueError:
+            return
+        self.reset_at = now + (parse_reset_duration(reset) or 0.0)
+
+    def exhaust(self, seconds: float, now: float) -> None:
+        self.remaining = 0
+        self.reset_at = max(self.reset_at, now + seconds)
+
+    def wait(self, cost: int, now: float) -> float:
+        """Seconds until ``cost`` fits in the budget (0 when it fits or the budget is unknown)."""
+        if self.remaining is None or now >= self.reset_at:
+            # No information, or the window has reset since the last response
+            return 0.0
+        return 0.0 if self.remaining >= cost else self.reset_at - now
+
+    def spend(self, cost: int) -> None:
+        if self.remaining is not None:
+            self.remaining = max(0, self.remaining - cost)
+
+
+class ModelLimiter:
+    """Slots, rate-limit budgets and lane queues for one model."""
+
+    def __init__(self, model: str, max_concurrency: int, background_share: float = OPENAI_BACKGROUND_SHARE):
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_background = max(1, int(self.max_concurrency * background_share))
+        self.requests = _Budget()
+        self.tokens = _Budget()
+        self.active = 0
+        self.active_by_lane: Counter = Counter()
+        # lane -> flow -> waiters; flows are served round-robin
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {lane: OrderedDict() for lane in LANES}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.granted: Counter = Counter()
+        self.wait_seconds: Counter = Counter()
+        self.rate_limited = 0
+
+    def queued(self, lane: str) -> int:
+        return sum(len(waiters) for waiters in self._queues[lane].values())
+
+    async def acquire(self, lane: str, flow: str, tokens: int) -> None:
+        waiter = _Waiter(lane, tokens)
+        self._queues[lane].setdefault(flow, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled: hand the slot back
+                self.release(lane)
+            raise
+
+    def release(self, lane: str) -> None:
+        self.active -= 1
+        self.active_by_lane[lane] -= 1
+        self._dispatch()
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        for lane in LANES:
+            if lane == BACKGROUND_LANE and self.active_by_lane[BACKGROUND_LANE] >= self.max_background:
+                continue
+            flows = self._queues[lane]
+            while flows:
+                flow, waiters = next(iter(flows.items()))
+                while waiters and waiters[0].future.done():
+                    waiters.popleft()  # cancelled while waiting
+                if not waiters:
+                    del flows[flow]
+                    continue
+                return waiters[0]
+        return None
+
+    def _pop(self, waiter: _Waiter) -> None:
+        flows = self._queues[waiter.lane]
+        flow, waiters = next(iter(flows.items()))
+        waiters.popleft()
+        # Round-robin: this flow goes to the back of its lane
+        del flows[flow]
+        if waiters:
+            flows[flow] = waiters
+
+    def _dispatch(self) -> None:
+        while self.active < self.max_concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            now = time.monotonic()
+            delay = max(self.requests.wait(1, now), self.tokens.wait(waiter.tokens, now))
+            if delay > 0:
+                if self._timer is None:
+                    logger.info(f"OpenAI {self.model} rate limit budget spent; holding requests for {delay:.1f}s")
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+                return
+            self._pop(waiter)
+            self.requests.spend(1)
+            self.tokens.spend(waiter.tokens)
+            self.active += 1
+            self.active_by_lane[waiter.lane] += 1
+            self.granted[waiter.lane] += 1
+            self.wait_seconds[waiter.lane] += now - waiter.enqueued_at
+            waiter.future.set_result(None)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def update_from_headers(self, headers, status_code: int) -> None:
+        now = time.monotonic()
+        self.requests.update(headers.get("x-ratelimit-remaining-requests"), headers.get("x-ratelimit-reset-requests"), now)
+        self.tokens.update(headers.get("x-ratelimit-remaining-tokens"), headers.get("x-ratelimit-reset-tokens"), now)
+        if status_code == 429:
+            self.rate_limited += 1
+            retry_after_ms = headers.get("retry-after-ms")
+            retry_after = (
+                parse_reset_duration(f"{retry_after_ms}ms" if retry_after_ms else None)
+                or parse_reset_duration(headers.get("retry-after"))
+                or 1.0
+            )
+            self.requests.exhaust(retry_after, now)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_background": self.max_background,
+            "active": self.active,
+            "active_by_lane": {lane: self.active_by_lane[lane] for lane in LANES},
+            "queued_by_lane": {lane: self.queued(lane) for lane in LANES},
+            "granted_by_lane": {lane: self.granted[lane] for lane in LANES},
+            "avg_wait_seconds_by_lane": {
+                lane: round(self.wait_seconds[lane] / self.granted[lane], 3) if self.granted[lane] else 0.0
+                for lane in LANES
+            },
+            "remaining_requests": self.requests.remaining if now < self.requests.reset_at else None,
+            "remaining_tokens": self.tokens.remaining if now < self.tokens.reset_at else None,
+            "rate_limited": self.rate_limited,
+        }
+
+
+class _ScheduledStream:
+    """A streaming response that keeps its model slot until it is consumed or closed."""
+
+    def __init__(self, stream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._release()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        try:
+            async for item in self._stream:
+                yield item
+        finally:
+            self.release()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __del__(self):
+        # A stream dropped without being consumed must not keep its slot
+        try:
+            self.release()
+        except RuntimeError:
+            pass  # no running event loop left to dispatch on
+
+
+class OpenAIScheduler:
+    """Per-model limiters shared by every OpenAI call in the process."""
+
+    def __init__(
+        self,
+        max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+        model_concurrency: Optional[Dict[str, int]] = None,
+        background_share: float = OPENAI_BACKGROUND_SHARE,
+    ):
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = OPENAI_MODEL_CONCURRENCY if model_concurrency is None else model_concurrency
+        self.background_share = background_share
+        self.limiters: Dict[str, ModelLimiter] = {}
+
+    def limiter(self, model: str) -> ModelLimiter:
+        if model not in self.limiters:
+            limit = self.model_concurrency.get(model, self.max_concurrency)
+            self.limiters[model] = ModelLimiter(model, limit, self.background_share)
+        return self.limiters[model]
+
+    @staticmethod
+    def current_lane(min_lane: Optional[str] = None) -> str:
+        lane = _lane.get()
+        if min_lane is not None and LANES.index(min_lane) > LANES.index(lane):
+            return min_lane
+        return lane
+
+    async def create(self, fn: Callable[..., Any], *, min_lane: Optional[str] = None, **kwargs) -> Any:
+        """Call an SDK ``create`` method (``fn(**kwargs)``) once a slot for ``kwargs['model']`` is free.
+
+        ``min_lane`` is the highest priority this call may use, e.g.
+        ``FIRST_IMAGE_LANE`` for image work that must not compete with
+        recipes. With ``stream=True`` the slot is held until the returned
+        stream has been consumed.
+        """
+        model = kwargs.get("model", "default")
+        lane = self.current_lane(min_lane)
+        limiter = self.limiter(model)
+        await limiter.acquire(lane, _flow.get(), estimate_tokens(kwargs))
+        model_token = _current_model.set(model)
+        try:
+            result = await fn(**kwargs)
+        except BaseException:
+            limiter.release(lane)
+            raise
+        finally:
+            _current_model.reset(model_token)
+        if kwargs.get("stream"):
+            return _ScheduledStream(result, lambda: limiter.release(lane))
+        limiter.release(lane)
+        return result
+
+    async def record_response(self, response) -> None:
+        """httpx response hook: update the model's budgets from the rate-limit headers."""
+        model = _current_model.get()
+        if model is None:
+            return
+        try:
+            self.limiter(model).update_from_headers(response.headers, response.status_code)
+        except Exception as e:
+            logger.warning(f"Could not read OpenAI rate limit headers: {e}")
+
+    def http_event_hooks(self) -> Dict[str, list]:
+        """``event_hooks`` for the httpx client of an OpenAI SDK client."""
+        return {"response": [self.record_response]}
+
+    def stats(self) -> Dict[str, Any]:
+        return {model: limiter.stats() for model, limiter in self.limiters.items()}
+
+
+openai_scheduler = OpenAIScheduler()
@@ -2,8 +2,9 @@ import openai
 import os
 import json
 import logging
+import asyncio
 from collections import namedtuple
-from typing import List, Optional, Dict, AsyncGenerator # Added AsyncGenerator
+from typing import Any, List, Optional, Dict, AsyncGenerator, Tuple # Added AsyncGenerator
 import re
 # import requests # No longer needed here as we yield b64 data
 import base64 
@@ -13,6 +14,7 @@ from pathlib import Path
 from dotenv import load_dotenv
 
 from ..models import GetRecipeParams
+from ..models.get_recipe_params import CoreRecipeParams, RECIPE_ENRICHMENT_SECTIONS
 # Database imports
 from ..database.config import get_db_session, get_mongo_collection
 from ..database.service import DatabaseService
@@ -22,13 +24,28 @@ from .image_generation_service import (
     generate_image_stream, generate_specialized_image_stream, _build_food_photography_prompt, _build_method_prompt, generate_method_image_stream
 )
 from .image_cache_service import (
-    MongoDBImageService, get_cached_image, save_image_to_cache, get_step_image_mapping, set_step_image_mapping
+    MongoDBImageService, get_cached_image, save_image_to_cache, get_step_image_mapping, get_step_image_mappings,
+    set_step_image_mapping
 )
 from .recipe_cache_service import get_cached_recipe, save_recipe_to_cache, generate_recipe_cache_key
 from .llm_recipe_service import build_llm_prompt_for_canonicalization, parse_llm_recipe_response
+from .image_store import image_store
+from .concurrency import StreamBroadcaster
+from .image_variant_service import schedule_image_variants
+from .prompt_memo import prompt_memo
+from .prompt_compiler import PROMPT_RULES_PATH, PromptCompiler
+from .infographic_compositor import MAX_INGREDIENT_TILES, compose_infographic
+from .image_failures import image_generation_guard
+from .json_stream import IncrementalObjectParser
+from .openai_scheduler import FIRST_IMAGE_LANE, openai_scheduler
+from .llm_call_policy import call_policies
+from .openai_client import openai_clients
 
 load_dotenv()
 
+# Compose recipe infographics from cached component images when all are available
+INFOGRAPHIC_COMPOSITOR = os.getenv("INFOGRAPHIC_COMPOSITOR", "true").lower() in ("1", "true", "yes")
+
 # Initialize cache directories with absolute paths
 BASE_DIR = Path(__file__).parent.parent  # Go up to mixologist/ directory
 # Add dummy cache dir constants for test compatibility
@@ -124,16 +141,126 @@ def canonicalize_step(step_text: str) -> str:
     """Alias for canonicalize_step_text to maintain test compatibility."""
     return canonicalize_step_text(step_text)
 
+# --- Canonical technique image library ---
+#
+# Common techniques get one fixed image each, keyed by the canonical action
+# and, for actions that show the glass, the glass type. The subjects are
+# fixed, so a step that matches the library never needs the prompt LLM and
+# always resolves to the same image. Build the images once with
+# ``python -m mixologist.services.catalog_prewarm --technique-library``.
+
+TECHNIQUE_LIBRARY_PREFIX = "technique_library"
+
+TECHNIQUE_ACTION_SUBJECTS = {
+    "shake": "bartender shaking a metal cocktail shaker packed with ice",
+    "stir": "bar spoon stirring a cocktail in a mixing glass full of ice",
+    "muddle": "wooden muddler pressing fresh fruit and herbs in a mixing tin",
+    "blend": "frozen cocktail blending in a bar blender, motion blur on the blades",
+    "strain": "bartender straining a cocktail through a hawthorne strainer into a {glass}",
+    "pour": "pouring a measured spirit from a jigger into a {glass}",
+    "garnish": "bartender hands placing a garnish on a cocktail in a {glass}",
+    "salt rim": "rimming a {glass} with coarse salt on a small plate",
+}
+
+# Canonical step phrases (CANONICAL_STEP_PATTERNS values) and the library action they show
+CANONICAL_STEP_ACTIONS = {
+    "salt rim glass": "salt rim",
+    "strain into glass": "strain",
+    "shake with ice": "shake",
+    "stir ingredients": "stir",
+    "muddle ingredients": "muddle",
+    "garnish drink": "garnish",
+    "pour into glass": "pour",
+}
+
+# Words in a step that identify a glass, longest first so "wine glass" beats "glass"
+TECHNIQUE_LIBRARY_GLASSES = {
+    "nick and nora": "nick and nora glass",
+    "old fashioned": "rocks glass",
+    "champagne": "champagne flute",
+    "hurricane": "hurricane glass",
+    "margarita": "margarita glass",
+    "highball": "highball glass",
+    "martini": "martini glass",
+    "collins": "collins glass",
+    "flute": "champagne flute",
+    "coupe": "coupe glass",
+    "rocks": "rocks glass",
+    "wine": "wine glass",
+    "mug": "copper mug",
+}
+TECHNIQUE_LIBRARY_DEFAULT_GLASS = "cocktail glass"
+
+def _build_technique_library() -> Dict[str, str]:
+    library = {}
+    glasses = sorted(set(TECHNIQUE_LIBRARY_GLASSES.values()) | {TECHNIQUE_LIBRARY_DEFAULT_GLASS})
+    for action, subject in TECHNIQUE_ACTION_SUBJECTS.items():
+        if "{glass}" in subject:
+            for glass in glasses:
+                library[f"{action}:{glass}"] = subject.format(glass=glass)
+        else:
+            library[action] = subject
+    return library
+
+# Library key -> fixed image subject
+TECHNIQUE_LIBRARY = _build_technique_library()
+
+def _technique_glass(step_text: str) -> str:
+    text = f"{extract_context(step_text).get('glass', '')} {step_text.lower()}"
+    for word, glass in TECHNIQUE_LIBRARY_GLASSES.items():
+        if word in text:
+            return glass
+    return TECHNIQUE_LIBRARY_DEFAULT_GLASS
+
+def technique_library_key(step_text: str) -> Optional[str]:
+    """Return the technique library entry for a step, or None if no entry covers it."""
+    action = CANONICAL_STEP_ACTIONS.get(canonicalize_step_text(step_text)) or detect_primary_action(step_text)
+    subject = TECHNIQUE_ACTION_SUBJECTS.get(action)
+    if subject is None:
+        return None
+    return f"{action}:{_technique_glass(step_text)}" if "{glass}" in subject else action
+
+def technique_library_cache_key(library_key: str) -> str:
+    """Image cache key of a library entry (what generate_specialized_image_stream saves it as)."""
+    return generate_specialized_cache_key(TECHNIQUE_LIBRARY[library_key], "technique", "", TECHNIQUE_LIBRARY_PREFIX)
+
+def step_image_hash(step_text: str) -> str:
+    """Key of a step in the step image index; steps with the same canonical text share an image."""
+    return hashlib.sha256(canonicalize_step_text(step_text).encode()).hexdigest()[:16]
+
 async def get_cached_step_image(step_text: str) -> Optional[str]:
-    step_hash = hashlib.sha256(canonicalize_step_text(step_text).encode()).hexdigest()[:16]
-    cache_key = await get_step_image_mapping(step_hash)
+    library_key = technique_library_key(step_text)
+    if library_key:
+        library_image = await get_cached_image(technique_library_cache_key(library_key))
+        if library_image:
+            return library_image
+    cache_key = await get_step_image_mapping(step_image_hash(step_text))
     if cache_key:
         return await get_cached_image(cache_key)
     return None
 
+async def get_cached_step_images(step_texts: List[str]) -> Dict[int, str]:
+    """Return the cached base64 images for a recipe's steps, keyed by step index.
+
+    Resolves every step mapping with one query and fetches every mapped
+    image, along with any technique library images, with a second, instead
+    of two round trips per step. Library images win over mapped ones.
+    """
+    step_hashes = [step_image_hash(step_text) for step_text in step_texts]
+    library_keys = [technique_library_key(step_text) for step_text in step_texts]
+    library_cache_keys = [technique_library_cache_key(key) if key else None for key in library_keys]
+    mappings = await get_step_image_mappings(step_hashes)
+    wanted = [key for key in library_cache_keys if key] + list(mappings.values())
+    records = await image_store.get_many(wanted) if wanted else {}
+    cached = {}
+    for step_index, step_hash in enumerate(step_hashes):
+        record = records.get(library_cache_keys[step_index]) or records.get(mappings.get(step_hash))
+        if record is not None:
+            cached[step_index] = base64.b64encode(record["data"]).decode("ascii")
+    return cached
+
 async def save_step_image_mapping(step_text: str, cache_key: str) -> None:
-    step_hash = hashlib.sha256(canonicalize_step_text(step_text).encode()).hexdigest()[:16]
-    await set_step_image_mapping(step_hash, cache_key)
+    await set_step_image_mapping(step_image_hash(step_text), cache_key)
 
 # Ingredient categorization for appropriate image generation
 INGREDIENT_CATEGORIES = {
@@ -196,28 +323,8 @@ def build_ingredient_prompt(ingredient_name: str) -> str:
     else:
         return f"{ingredient_name} in its most recognizable cocktail ingredient form, isolated on white background, professional product photography"
 
-def build_cocktail_infographic_prompt(
-    drink_name: str,
-    ingredients: List[Dict[str, str]],
-    steps: List[str],
-    serving_glass: str,
-    garnish: List[str] = None,
-    equipment_needed: List[Dict[str, str]] = None,
-    preparation_time_minutes: int = None,
-    alcohol_content: float = None
-) -> str:
-    """Build a dynamic infographic prompt for cocktail recipes."""
-    
-    # Format ingredients with quantities
-    ingredient_list = []
-    for ingredient in ingredients[:6]:  # Limit to 6 ingredients for space
-        name = ingredient.get('name', '')
-        quantity = ingredient.get('quantity', '')
-        ingredient_list.append(f"'{quantity} {name}'")
-    
-    ingredient_text = ', '.join(ingredient_list)
-    
-    # Format equipment/technique icons
+def infographic_tool_icons(steps: List[str], equipment_needed: List[Dict[str, str]] = None) -> List[str]:
+    """Icons for the preparation tools shown on a recipe infographic."""
     equipment_icons = []
     if equipment_needed:
         for equipment in equipment_needed[:4]:  # Limit to 4 items
@@ -234,7 +341,7 @@ def build_cocktail_infographic_prompt(
                 equipment_icons.append('bar spoon icon')
             else:
                 equipment_icons.append('bar tool icon')
-    
+
     # If no equipment, use technique-based icons
     if not equipment_icons:
         step_text = ' '.join(steps).lower()
@@ -246,7 +353,30 @@ def build_cocktail_infographic_prompt(
             equipment_icons.append('strainer icon')
         if 'muddle' in step_text:
             equipment_icons.append('muddler icon')
+    return equipment_icons
+
+def build_cocktail_infographic_prompt(
+    drink_name: str,
+    ingredients: List[Dict[str, str]],
+    steps: List[str],
+    serving_glass: str,
+    garnish: List[str] = None,
+    equipment_needed: List[Dict[str, str]] = None,
+    preparation_time_minutes: int = None,
+    alcohol_content: float = None
+) -> str:
+    """Build a dynamic infographic prompt for cocktail recipes."""
+    
+    # Format ingredients with quantities
+    ingredient_list = []
+    for ingredient in ingredients[:6]:  # Limit to 6 ingredients for space
+        name = ingredient.get('name', '')
+        quantity = ingredient.get('quantity', '')
+        ingredient_list.append(f"'{quantity} {name}'")
     
+    ingredient_text = ', '.join(ingredient_list)
+    
+    equipment_icons = infographic_tool_icons(steps, equipment_needed)
     equipment_text = ', '.join(equipment_icons[:3]) if equipment_icons else 'mixing glass icon, bar spoon icon'
     
     # Format garnish
@@ -265,6 +395,9 @@ Clean layout with soft shadows, neat typography, modern minimalist feel, profess
 
     return prompt
 
+# Local alternative to the LLM prompt refinement, driven by prompt_rules.json
+prompt_compiler = PromptCompiler.from_file(PROMPT_RULES_PATH, INGREDIENT_CATEGORIES, STYLE_CONSTANTS)
+
 def build_styled_prompt(subject: str, category: str, additional_context: str = "") -> str:
     """Build a prompt with consistent styling for a given category."""
     base_style = STYLE_CONSTANTS.get(category, STYLE_CONSTANTS["cocktail"])
@@ -278,6 +411,11 @@ def parse_ingredient_name(ingredient_dict: dict) -> str:
     clean_name = name.replace("Fresh ", "").replace("Dry ", "").replace("Simple ", "")
     return clean_name.strip()
 
+def clean_ingredient_image_subject(ingredient_name: str) -> str:
+    """Subject for a reusable ingredient image: no qualifiers or containers."""
+    clean_name = ingredient_name.replace("Fresh ", "").replace("Dry ", "").replace("Simple ", "").strip()
+    return clean_name.replace(" bottle", "").replace(" can", "").replace(" jar", "")
+
 def normalize_glass_name(glass_text: str) -> str:
     """Normalize glass names for consistent image generation."""
     if not glass_text:
@@ -300,8 +438,8 @@ try:
         client = None
         async_client = None
     else:
-        client = openai.OpenAI(api_key=api_key)
-        async_client = openai.AsyncOpenAI(api_key=api_key)
+        client = openai_clients.sync_client()
+        async_client = openai_clients.async_client()
 except Exception as e:
     print(f"Warning: Could not initialize OpenAI client: {e}")
     client = None
@@ -323,23 +461,63 @@ def generate_cache_key(prompt: str, drink_name: str, ingredients: Optional[List[
     
     return f"cocktail_{cache_hash}"
 
+def generate_specialized_cache_key(subject: str, category: str, additional_context: str = "", cache_prefix: str = "") -> str:
+    """Generate the cache key used by generate_specialized_image_stream."""
+    if category in ["ingredients", "equipment"]:
+        # For reusable assets, cache by clean subject name only
+        cache_key_input = f"{category}_{subject.lower().strip()}"
+    else:
+        # For other categories, include context
+        cache_key_input = f"{cache_prefix}_{subject}_{category}_{additional_context}"
+    
+    cache_hash = hashlib.sha256(cache_key_input.encode()).hexdigest()[:16]
+    return f"{category}_{cache_hash}"
+
+def normalize_image_ingredients(ingredients: Optional[List] = None) -> List[Dict[str, str]]:
+    """Convert ingredients from a list of strings or dicts into a list of dicts."""
+    normalized_ingredients = []
+    if ingredients:
+        for ingredient in ingredients:
+            if isinstance(ingredient, str):
+                # Parse string format like "2 oz Cognac" into {"quantity": "2 oz", "name": "Cognac"}
+                parts = ingredient.strip().split(' ', 2)  # Split into max 3 parts
+                if len(parts) >= 3:
+                    quantity = f"{parts[0]} {parts[1]}"
+                    name = ' '.join(parts[2:])
+                elif len(parts) == 2:
+                    quantity = parts[0]
+                    name = parts[1]
+                else:
+                    quantity = ""
+                    name = ingredient
+                normalized_ingredients.append({"quantity": quantity, "name": name})
+            elif isinstance(ingredient, dict):
+                normalized_ingredients.append(ingredient)
+            else:
+                # Fallback for unexpected types
+                normalized_ingredients.append({"quantity": "", "name": str(ingredient)})
+    return normalized_ingredients
+
 async def get_cached_image(cache_key: str) -> Optional[str]:
-    """Check if cached image exists and return base64 data from MongoDB only."""
-    image_data = await MongoDBImageService.get_image(cache_key)
-    if image_data:
-        print(f"Retrieved image from MongoDB: {cache_key}")
-        return image_data
+    """Check if cached image exists and return its base64 data from the image store."""
+    record = await image_store.get(cache_key)
+    if record:
+        print(f"Retrieved image from image store: {cache_key}")
+        return base64.b64encode(record["data"]).decode("ascii")
     return None
 
 async def save_image_to_cache(cache_key: str, b64_data: str) -> None:
-    """Save base64 image data to MongoDB only."""
+    """Save base64 image data to the image store and schedule its variants."""
     try:
         category = cache_key.split("_")[0] if "_" in cache_key else "unknown"
-        success = await MongoDBImageService.save_image(cache_key, category, b64_data)
+        image_bytes = base64.b64decode(b64_data)
+        success = await image_store.put(cache_key, category, image_bytes)
         if success:
-            print(f"Saved image to MongoDB: {cache_key}")
+            print(f"Saved image to image store: {cache_key}")
+            # Thumbnails and WebP/AVIF renditions are built off the event loop
+            schedule_image_variants(cache_key, image_bytes)
         else:
-            print(f"Failed to save image to MongoDB: {cache_key}")
+            print(f"Failed to save image to image store: {cache_key}")
     except Exception as e:
         print(f"Error saving image to cache {cache_key}: {e}")
 
@@ -358,6 +536,9 @@ Recipe = namedtuple("Recipe", [
 logging.basicConfig(filename='app.log', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# In-flight image generations keyed by image cache key
+image_stream_broadcaster = StreamBroadcaster("image_generation")
+
 async def generate_specialized_image_stream(
     subject: str,
     category: str,
@@ -369,22 +550,8 @@ async def generate_specialized_image_stream(
     if async_client is None:
         raise Exception("OpenAI async client not initialized. Please set OPENAI_API_KEY environment variable.")
 
-    # Build prompt - ingredients and equipment get an extra LLM refinement
-    if category in ["ingredients", "equipment"]:
-        styled_prompt = await _build_food_photography_prompt(subject, category)
-    else:
-        styled_prompt = build_styled_prompt(subject, category, additional_context)
-    
     # Generate cache key based on category
-    if category in ["ingredients", "equipment"]:
-        # For reusable assets, cache by clean subject name only
-        cache_key_input = f"{category}_{subject.lower().strip()}"
-    else:
-        # For other categories, include context
-        cache_key_input = f"{cache_prefix}_{subject}_{category}_{additional_context}"
-    
-    cache_hash = hashlib.sha256(cache_key_input.encode()).hexdigest()[:16]
-    cache_key = f"{category}_{cache_hash}"
+    cache_key = generate_specialized_cache_key(subject, category, additional_context, cache_prefix)
     
     print(f"--- Generated cache key: {cache_key} for {category} image ---")
     
@@ -396,51 +563,81 @@ async def generate_specialized_image_stream(
         return
 
     print(f"--- No cached {category} image found for {subject}, generating new image ---")
-    
-    main_input_prompt = f"Generate an image of: {styled_prompt}"
-    print(f"--- Calling Responses API for {category} image generation with input: {main_input_prompt[:200]}... ---")
 
-    text_model_for_responses_api = "gpt-4.1-mini-2025-04-14" 
-    final_image_b64 = ""
-    
-    try:
-        stream = await async_client.responses.create(
-            model=text_model_for_responses_api,
-            input=main_input_prompt, 
-            stream=True,
-            tools=[{
-                "type": "image_generation",
-                "quality": "low",  # Low quality for development speed
-                "size": "1024x1024",  # Square size for ingredients/equipment
-                "background": "opaque",  # White background for ingredients/equipment
-                "partial_images": 2, 
-            }],
-        )
-
-        async for event in stream:
-            print(f"--- {category.title()} Image Gen Stream Event: {event.type} ---")
-            if event.type == "response.image_generation_call.partial_image":
-                image_base64_partial = event.partial_image_b64
-                idx = event.partial_image_index
-                if image_base64_partial:
-                    print(f"--- Yielding partial {category} image {idx} (b64_json): {image_base64_partial[:10]}... (truncated) ---")
-                    final_image_b64 = image_base64_partial
-                    yield image_base64_partial
+    async def stream_from_openai() -> AsyncGenerator[str, None]:
+        # Build prompt - ingredients and equipment get an extra refinement, compiled
+        # locally from prompt rules or by an LLM (PROMPT_COMPILER_CATEGORIES).
+        # This only runs on a cache miss because the cache key does not depend on it.
+        if prompt_compiler.compiles(category):
+            styled_prompt = prompt_compiler.compile(subject, category)
+        elif category in ["ingredients", "equipment"]:
+            styled_prompt = await _build_food_photography_prompt(subject, category)
+        else:
+            styled_prompt = build_styled_prompt(subject, category, additional_context)
 
-        # Save the final image to cache
-        if final_image_b64:
-            await save_image_to_cache(cache_key, final_image_b64)
+        main_input_prompt = f"Generate an image of: {styled_prompt}"
+        print(f"--- Calling Responses API for {category} image generation with input: {main_input_prompt[:200]}... ---")
 
-    except Exception as e:
-        print(f"Error during OpenAI Responses API call for {category} image stream: {type(e).__name__} - {e}")
-        import traceback
-        traceback.print_exc()
-        raise 
+        text_model_for_responses_api = "gpt-4.1-mini-2025-04-14" 
+        final_image_b64 = ""
+        
+        try:
+            stream = await call_policies["image_stream"].call(lambda: openai_scheduler.create(
+                async_client.responses.create,
+                min_lane=FIRST_IMAGE_LANE,
+                model=text_model_for_responses_api,
+                input=main_input_prompt, 
+                stream=True,
+                tools=[{
+                    "type": "image_generation",
+                    "quality": "low",  # Low quality for development speed
+                    "size": "1024x1024",  # Square size for ingredients/equipment
+                    "background": "opaque",  # White background for ingredients/equipment
+                    "partial_images": 2, 
+                }],
+            ))
+
+            async for event in stream:
+                print(f"--- {category.title()} Image Gen Stream Event: {event.type} ---")
+                if event.type == "response.image_generation_call.partial_image":
+                    image_base64_partial = event.partial_image_b64
+                    idx = event.partial_image_index
+                    if image_base64_partial:
+                        print(f"--- Yielding partial {category} image {idx} (b64_json): {image_base64_partial[:10]}... (truncated) ---")
+                        final_image_b64 = image_base64_partial
+                        yield image_base64_partial
+
+            # Save the final image to cache once, before any subscriber completes
+            if final_image_b64:
+                await save_image_to_cache(cache_key, final_image_b64)
+
+        except Exception as e:
+            print(f"Error during OpenAI Responses API call for {category} image stream: {type(e).__name__} - {e}")
+            import traceback
+            traceback.print_exc()
+            raise 
+
+    # Concurrent requests for the same image share a single upstream generation,
+    # which fails fast while this image recently failed or its category is failing
+    generate = image_generation_guard.guarded(cache_key, category, stream_from_openai)
+    async for image_base64_partial in image_stream_broadcaster.subscribe(cache_key, generate):
+        yield image_base64_partial
 
     print(f"--- {category.title()} image generation stream finished for {subject} ---")
 
-async def _build_food_photography_prompt(subject: str, category: str) -> str:
-    """Use GPT-4.1 to craft an ideal food photography prompt for an item."""
+# Model used to refine image prompts, and the versions of the refinement
+# system prompts. Bump a version when its prompt changes so memoized
+# refinements made with the old prompt are no longer used.
+PROMPT_REFINEMENT_MODEL = "gpt-4.1-mini-2025-04-14"
+FOOD_PHOTOGRAPHY_PROMPT_VERSION = 1
+METHOD_PROMPT_VERSION = 1
+
+async def _build_food_photography_prompt(subject: str, category: str, memoize: bool = True) -> str:
+    """Use GPT-4.1 to craft an ideal food photography prompt for an item.
+
+    Results are memoized by input (see ``prompt_memo``) unless ``memoize``
+    is False, which always calls the model.
+    """
     if async_client is None:
         raise Exception("OpenAI async client not initialized. Please set OPENAI_API_KEY environment variable.")
 
@@ -463,22 +660,33 @@ async def _build_food_photography_prompt(subject: str, category: str) -> str:
         },
     ]
 
-    response = await async_client.chat.completions.create(
-        model="gpt-4.1-mini-2025-04-14",
-        messages=messages,
-        temperature=0.5,
-        max_tokens=60,
+    async def refine() -> str:
+        response = await call_policies["prompt_refinement"].call(lambda: openai_scheduler.create(
+            async_client.chat.completions.create,
+            min_lane=FIRST_IMAGE_LANE,
+            model=PROMPT_REFINEMENT_MODEL,
+            messages=messages,
+            temperature=0.5,
+            max_tokens=60,
+        ))
+        return response.choices[0].message.content.strip()
+
+    if not memoize:
+        return await refine()
+    return await prompt_memo.get_or_create(
+        "food_photography", PROMPT_REFINEMENT_MODEL, FOOD_PHOTOGRAPHY_PROMPT_VERSION, messages, refine
     )
 
-    return response.choices[0].message.content.strip()
-
 async def _build_method_prompt(
     step_text: str,
     drink_name: str = "",
     ingredients: Optional[List[str]] = None,
     equipment: Optional[List[str]] = None,
 ) -> str:
-    """Use GPT-4.1 to craft a short image subject for a method step."""
+    """Use GPT-4.1 to craft a short image subject for a method step.
+
+    Results are memoized by input (see ``prompt_memo``).
+    """
     if async_client is None:
         raise Exception("OpenAI async client not initialized. Please set OPENAI_API_KEY environment variable.")
 
@@ -505,14 +713,18 @@ async def _build_method_prompt(
         },
     ]
 
-    response = await async_client.chat.completions.create(
-        model="gpt-4.1-mini-2025-04-14",
-        messages=messages,
-        temperature=0.5,
-        max_tokens=60,
-    )
+    async def refine() -> str:
+        response = await call_policies["prompt_refinement"].call(lambda: openai_scheduler.create(
+            async_client.chat.completions.create,
+            min_lane=FIRST_IMAGE_LANE,
+            model=PROMPT_REFINEMENT_MODEL,
+            messages=messages,
+            temperature=0.5,
+            max_tokens=60,
+        ))
+        return response.choices[0].message.content.strip()
 
-    return response.choices[0].message.content.strip()
+    return await prompt_memo.get_or_create("method", PROMPT_REFINEMENT_MODEL, METHOD_PROMPT_VERSION, messages, refine)
 
 
 async def generate_method_image_stream(
@@ -521,27 +733,43 @@ async def generate_method_image_stream(
     drink_name: str = "",
     ingredients: Optional[List[str]] = None,
     equipment: Optional[List[str]] = None,
+    check_cache: bool = True,
 ) -> AsyncGenerator[str, None]:
-    """Generate an illustrative technique image for a recipe method step."""
+    """Generate an illustrative technique image for a recipe method step.
+
+    Pass ``check_cache=False`` when the caller already looked the step up.
+    """
 
     # Check for an existing image mapped to this step
-    cached_step_image = await get_cached_step_image(step_text)
-    if cached_step_image:
-        yield cached_step_image
+    if check_cache:
+        cached_step_image = await get_cached_step_image(step_text)
+        if cached_step_image:
+            yield cached_step_image
+            return
+
+    # Nothing can be generated while technique images are failing, so don't refine a prompt either
+    if image_generation_guard.breaker("technique").is_open():
+        yield DEFAULT_FALLBACK_ICON_B64
         return
 
-    try:
-        prompt_subject = await _build_method_prompt(
-            step_text,
-            drink_name=drink_name,
-            ingredients=ingredients,
-            equipment=equipment,
-        )
-    except Exception as e:
-        logging.error(f"Method prompt generation failed: {e}")
-        prompt_subject = step_text
+    library_key = technique_library_key(step_text)
+    if library_key:
+        # A library technique: generate its fixed image, with no prompt LLM call
+        prompt_subject = TECHNIQUE_LIBRARY[library_key]
+        cache_prefix = TECHNIQUE_LIBRARY_PREFIX
+    else:
+        try:
+            prompt_subject = await _build_method_prompt(
+                step_text,
+                drink_name=drink_name,
+                ingredients=ingredients,
+                equipment=equipment,
+            )
+        except Exception as e:
+            logging.error(f"Method prompt generation failed: {e}")
+            prompt_subject = step_text
+        cache_prefix = f"method_{step_index}"
 
-    cache_prefix = f"method_{step_index}"
     cache_key_input = f"{cache_prefix}_{prompt_subject}_technique_"
     cache_hash = hashlib.sha256(cache_key_input.encode()).hexdigest()[:16]
     cache_key = f"technique_{cache_hash}"
@@ -564,6 +792,65 @@ async def generate_method_image_stream(
         if last_chunk:
             await save_step_image_mapping(step_text, cache_key)
 
+async def compose_cached_infographic(
+    drink_name: str,
+    ingredients: List[Dict[str, str]],
+    serving_glass: Optional[str] = None,
+    steps: Optional[List[str]] = None,
+    garnish: Optional[List] = None,
+    equipment_needed: Optional[List[Dict[str, str]]] = None,
+    preparation_time_minutes: Optional[int] = None,
+    alcohol_content: Optional[float] = None,
+) -> Optional[str]:
+    """Compose the recipe infographic from cached ingredient, glassware and garnish images.
+
+    Uses the same cache keys as the catalog prewarmer. Returns the PNG as
+    base64, or None when a component image is missing or composing fails,
+    in which case the caller generates the infographic with the image model.
+    """
+    shown_ingredients = [i for i in ingredients if i.get("name", "").strip()][:MAX_INGREDIENT_TILES]
+    if not shown_ingredients:
+        return None
+    glass = normalize_glass_name(serving_glass or "")
+    garnish_names = [g.get("name", "") if isinstance(g, dict) else str(g) for g in (garnish or [])]
+    garnish_name = next((name.strip() for name in garnish_names if name.strip()), None)
+
+    ingredient_keys = [
+        generate_specialized_cache_key(clean_ingredient_image_subject(i["name"]), "ingredients", "", "ingredient")
+        for i in shown_ingredients
+    ]
+    glass_key = generate_specialized_cache_key(glass, "glassware", "", "glassware")
+    garnish_key = generate_specialized_cache_key(garnish_name, "garnish", "", "garnish") if garnish_name else None
+    wanted = ingredient_keys + [glass_key] + ([garnish_key] if garnish_key else [])
+
+    records = await image_store.get_many(wanted)
+    if any(key not in records for key in wanted):
+        return None
+
+    ingredient_tiles = [
+        (f"{i.get('quantity', '')} {i['name']}".strip(), records[key]["data"])
+        for i, key in zip(shown_ingredients, ingredient_keys)
+    ]
+    details = []
+    if preparation_time_minutes:
+        details.append(f"{preparation_time_minutes} min")
+    if alcohol_content:
+        details.append(f"{round(float(alcohol_content) * 100)}% ABV")
+    try:
+        image_bytes = await compose_infographic(
+            drink_name,
+            ingredient_tiles,
+            (glass, records[glass_key]["data"]),
+            (garnish_name, records[garnish_key]["data"]) if garnish_key else None,
+            infographic_tool_icons(steps or [], equipment_needed),
+            steps or [],
+            details,
+        )
+    except Exception as e:
+        logging.error(f"Error composing infographic for {drink_name}: {e}")
+        return None
+    return base64.b64encode(image_bytes).decode("ascii")
+
 async def generate_image_stream( # Renamed to indicate streaming and generator
     prompt: str,
     drink_name: str,
@@ -581,27 +868,7 @@ async def generate_image_stream( # Renamed to indicate streaming and generator
         raise Exception("OpenAI async client not initialized. Please set OPENAI_API_KEY environment variable.")
 
     # Convert ingredients from list of strings to list of dicts if needed
-    normalized_ingredients = []
-    if ingredients:
-        for ingredient in ingredients:
-            if isinstance(ingredient, str):
-                # Parse string format like "2 oz Cognac" into {"quantity": "2 oz", "name": "Cognac"}
-                parts = ingredient.strip().split(' ', 2)  # Split into max 3 parts
-                if len(parts) >= 3:
-                    quantity = f"{parts[0]} {parts[1]}"
-                    name = ' '.join(parts[2:])
-                elif len(parts) == 2:
-                    quantity = parts[0]
-                    name = parts[1]
-                else:
-                    quantity = ""
-                    name = ingredient
-                normalized_ingredients.append({"quantity": quantity, "name": name})
-            elif isinstance(ingredient, dict):
-                normalized_ingredients.append(ingredient)
-            else:
-                # Fallback for unexpected types
-                normalized_ingredients.append({"quantity": "", "name": str(ingredient)})
+    normalized_ingredients = normalize_image_ingredients(ingredients)
     
     # Convert equipment_needed from list of strings to list of dicts if needed
     normalized_equipment = []
@@ -642,54 +909,79 @@ async def generate_image_stream( # Renamed to indicate streaming and generator
         styled_prompt = build_styled_prompt(f"{drink_name} cocktail", "cocktail", f"served in {serving_glass or 'appropriate glassware'}")
         main_input_prompt = f"Generate an image of: {styled_prompt}, transparent background, isolated cocktail on transparent background"
 
-    print(f"--- Calling Responses API for image generation (streaming) with input: {main_input_prompt[:200]}... ---")
-
-    text_model_for_responses_api = "gpt-4.1-mini-2025-04-14" 
-    
-    # Store the final image for caching
-    final_image_b64 = ""
-    
-    try:
-        stream = await async_client.responses.create(
-            model=text_model_for_responses_api,
-            input=main_input_prompt, 
-            stream=True,
-            tools=[{
-                "type": "image_generation",
-                "quality": "auto",  # Auto quality for better infographic details
-                "size": "1024x1536",  # Phone portrait size only
-                "background": "transparent",  # Transparent background
-                "partial_images": 2, 
-            }],
-        )
-
-        async for event in stream:
-            print(f"--- Image Gen Stream Event: {event.type} ---")
-            if event.type == "response.image_generation_call.partial_image":
-                image_base64_partial = event.partial_image_b64
-                idx = event.partial_image_index
-                if image_base64_partial:
-                    print(f"--- Yielding partial image {idx} (b64_json): {image_base64_partial[:10]}... (truncated) ---")
-                    # Store the latest partial as potential final image
-                    final_image_b64 = image_base64_partial
-                    yield image_base64_partial
-            # We are no longer looking for a single "final" image within this function.
-            # We yield all partials. The client (Flask route) will decide what to do.
-            # A 'response.tool_calls' event with a final result might still occur,
-            # but for streaming partials, the partial_image events are key.
-
-        # Save the final image to cache
-        if final_image_b64:
-            await save_image_to_cache(cache_key, final_image_b64)
-
-    except Exception as e:
-        print(f"Error during OpenAI Responses API call for image stream: {type(e).__name__} - {e}")
-        import traceback
-        traceback.print_exc()
-        # How to signal error to an async generator's consumer?
-        # One way is to yield a special error marker or just let the exception propagate
-        # and have the Flask route handle it. For now, let it propagate.
-        raise 
+    async def stream_from_openai() -> AsyncGenerator[str, None]:
+        if INFOGRAPHIC_COMPOSITOR and normalized_ingredients:
+            composed_b64 = await compose_cached_infographic(
+                drink_name,
+                normalized_ingredients,
+                serving_glass=serving_glass,
+                steps=steps,
+                garnish=garnish,
+                equipment_needed=normalized_equipment,
+                preparation_time_minutes=preparation_time_minutes,
+                alcohol_content=alcohol_content,
+            )
+            if composed_b64:
+                print(f"--- Composed infographic for {drink_name} from cached component images ---")
+                await save_image_to_cache(cache_key, composed_b64)
+                yield composed_b64
+                return
+
+        print(f"--- Calling Responses API for image generation (streaming) with input: {main_input_prompt[:200]}... ---")
+
+        text_model_for_responses_api = "gpt-4.1-mini-2025-04-14" 
+        
+        # Store the final image for caching
+        final_image_b64 = ""
+        
+        try:
+            stream = await call_policies["image_stream"].call(lambda: openai_scheduler.create(
+                async_client.responses.create,
+                min_lane=FIRST_IMAGE_LANE,
+                model=text_model_for_responses_api,
+                input=main_input_prompt, 
+                stream=True,
+                tools=[{
+                    "type": "image_generation",
+                    "quality": "auto",  # Auto quality for better infographic details
+                    "size": "1024x1536",  # Phone portrait size only
+                    "background": "transparent",  # Transparent background
+                    "partial_images": 2, 
+                }],
+            ))
+
+            async for event in stream:
+                print(f"--- Image Gen Stream Event: {event.type} ---")
+                if event.type == "response.image_generation_call.partial_image":
+                    image_base64_partial = event.partial_image_b64
+                    idx = event.partial_image_index
+                    if image_base64_partial:
+                        print(f"--- Yielding partial image {idx} (b64_json): {image_base64_partial[:10]}... (truncated) ---")
+                        # Store the latest partial as potential final image
+                        final_image_b64 = image_base64_partial
+                        yield image_base64_partial
+                # We are no longer looking for a single "final" image within this function.
+                # We yield all partials. The client (Flask route) will decide what to do.
+                # A 'response.tool_calls' event with a final result might still occur,
+                # but for streaming partials, the partial_image events are key.
+
+            # Save the final image to cache once, before any subscriber completes
+            if final_image_b64:
+                await save_image_to_cache(cache_key, final_image_b64)
+
+        except Exception as e:
+            print(f"Error during OpenAI Responses API call for image stream: {type(e).__name__} - {e}")
+            import traceback
+            traceback.print_exc()
+            # The broadcaster re-raises this in every subscriber, so each
+            # route reports the failure over its own SSE stream.
+            raise 
+
+    # Concurrent viewers of the same drink share a single upstream generation,
+    # which fails fast while this image recently failed or cocktails are failing
+    generate = image_generation_guard.guarded(cache_key, "cocktail", stream_from_openai)
+    async for image_base64_partial in image_stream_broadcaster.subscribe(cache_key, generate):
+        yield image_base64_partial
 
     # This function no longer saves the file or returns a filename. It yields b64 strings.
     print(f"--- Image generation stream from OpenAI finished for {drink_name} ---")
@@ -758,33 +1050,94 @@ def parse_recipe_arguments(arguments):
         optimal_serving_temperature, skill_level_recommendation, drink_trivia
     )
 
-async def get_completion_from_messages(messages,
-                                 model="gpt-4.1-mini-2025-04-14",
-                                 temperature=0.7):
-    if async_client is None:
-        raise Exception("OpenAI async client not initialized. Please set OPENAI_API_KEY environment variable.")
+RECIPE_COMPLETION_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You must always use the available tool/function to return your answer. Never reply with plain text. Only use the tool/function call."
+}
+
+def _recipe_completion_request(
+    messages,
+    model,
+    temperature,
+    tool_name: str = "get_recipe",
+    tool_description: str = "Get drink recipe.",
+    params_model=GetRecipeParams,
+    max_tokens: int = 2000,  # Increased for complex responses
+) -> dict:
+    """Arguments for a chat completion that must answer with one tool call."""
     # Force the model to always use the tool/function call
-    system_msg = {
-        "role": "system",
-        "content": "You must always use the available tool/function to return your answer. Never reply with plain text. Only use the tool/function call."
-    }
     if not messages or messages[0].get("role") != "system":
-        messages = [system_msg] + messages
+        messages = [RECIPE_COMPLETION_SYSTEM_MESSAGE] + messages
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "tools": [{
+            "type": "function",
+            "function": {
+                "name": tool_name,
+                "description": tool_description,
+                "parameters": params_model.model_json_schema()
+            }
+        }],
+        "tool_choice": "auto",
+    }
+
+def _completion_error(e: Exception) -> OpenAIAPIException:
+    """Map an error from a recipe completion to an ``OpenAIAPIException``."""
+    # Map by status_code if present (handle mocks and real errors first)
+    if hasattr(e, 'status_code'):
+        status = getattr(e, 'status_code', 500)
+        if status == 400:
+            err_type = "invalid_request_error"
+        elif status == 401:
+            err_type = "authentication_error"
+        elif status == 403:
+            err_type = "permission_error"
+        elif status == 429:
+            err_type = "rate_limit_error"
+        elif status == 500:
+            err_type = "api_error"
+        else:
+            err_type = type(e).__name__
+        msg = str(e)
+        code = getattr(e, 'code', None)
+        return OpenAIAPIException(status, err_type, msg, code)
+    # Explicitly check for all known OpenAI error classes (v1.x)
+    openai_error_classes = [
+        getattr(openai, "BadRequestError", None),
+        getattr(openai, "AuthenticationError", None),
+        getattr(openai, "PermissionDeniedError", None),
+        getattr(openai, "RateLimitError", None),
+        getattr(openai, "APITimeoutError", None),
+        getattr(openai, "APIConnectionError", None),
+        getattr(openai, "APIStatusError", None),
+        getattr(openai, "OpenAIError", None),
+    ]
+    if any(cls and isinstance(e, cls) for cls in openai_error_classes):
+        status, err_type, msg, code = map_openai_error(e)
+        return OpenAIAPIException(status, err_type, msg, code)
+    # Old SDK
+    if hasattr(openai, 'error') and isinstance(e, openai.error.OpenAIError):
+        status, err_type, msg, code = map_openai_error(e)
+        return OpenAIAPIException(status, err_type, msg, code)
+    elif isinstance(e, OpenAIAPIException):
+        return e
+    else:
+        return OpenAIAPIException(500, "unknown_openai_error", str(e), None)
+
+async def _get_tool_arguments(messages, model, temperature, policy="recipe", **tool_options) -> dict:
+    """Run a completion that must call a tool and return the call's decoded arguments.
+
+    ``policy`` names the ``call_policies`` entry (deadline, retries, hedging) the call runs under.
+    """
+    if async_client is None:
+        raise Exception("OpenAI async client not initialized. Please set OPENAI_API_KEY environment variable.")
     try:
-        response = await async_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=2000,  # Increased for complex responses
-            tools=[{
-                "type": "function",
-                "function": {
-                    "name": "get_recipe",
-                    "description": "Get drink recipe.",
-                    "parameters": GetRecipeParams.model_json_schema()
-                }
-            }],
-            tool_choice="auto",
+        request = _recipe_completion_request(messages, model, temperature, **tool_options)
+        response = await call_policies[policy].call(
+            lambda: openai_scheduler.create(async_client.chat.completions.create, **request)
         )
         logging.error(f"OpenAI raw response: {response}")
         message = response.choices[0].message
@@ -798,50 +1151,112 @@ async def get_completion_from_messages(messages,
             raise OpenAIAPIException(status, err_type, msg, code)
         logging.info(f"Raw OpenAI arguments: {tool_call.function.arguments[:500]}...")
         try:
-            arguments = tool_call.function.arguments
-            return parse_recipe_arguments(arguments)
+            return json.loads(tool_call.function.arguments)
         except json.JSONDecodeError as e:
             logging.error(f"JSON decode error: {e}")
             logging.error(f"Raw arguments: {tool_call.function.arguments}")
             raise Exception(f"Invalid JSON response from OpenAI: {e}")
     except Exception as e:
-        # Map by status_code if present (handle mocks and real errors first)
-        if hasattr(e, 'status_code'):
-            status = getattr(e, 'status_code', 500)
-            if status == 400:
-                err_type = "invalid_request_error"
-            elif status == 401:
-                err_type = "authentication_error"
-            elif status == 403:
-                err_type = "permission_error"
-            elif status == 429:
-                err_type = "rate_limit_error"
-            elif status == 500:
-                err_type = "api_error"
-            else:
-                err_type = type(e).__name__
-            msg = str(e)
-            code = getattr(e, 'code', None)
-            raise OpenAIAPIException(status, err_type, msg, code)
-        # Explicitly check for all known OpenAI error classes (v1.x)
-        openai_error_classes = [
-            getattr(openai, "BadRequestError", None),
-            getattr(openai, "AuthenticationError", None),
-            getattr(openai, "PermissionDeniedError", None),
-            getattr(openai, "RateLimitError", None),
-            getattr(openai, "APITimeoutError", None),
-            getattr(openai, "APIConnectionError", None),
-            getattr(openai, "APIStatusError", None),
-            getattr(openai, "OpenAIError", None),
-        ]
-        if any(cls and isinstance(e, cls) for cls in openai_error_classes):
-            status, err_type, msg, code = map_openai_error(e)
-            raise OpenAIAPIException(status, err_type, msg, code)
-        # Old SDK
-        if hasattr(openai, 'error') and isinstance(e, openai.error.OpenAIError):
-            status, err_type, msg, code = map_openai_error(e)
-            raise OpenAIAPIException(status, err_type, msg, code)
-        elif isinstance(e, OpenAIAPIException):
-            raise
+        raise _completion_error(e)
+
+async def get_completion_from_messages(messages,
+                                 model="gpt-4.1-mini-2025-04-14",
+                                 temperature=0.7):
+    arguments = await _get_tool_arguments(messages, model, temperature)
+    return parse_recipe_arguments(arguments)
+
+# Output token limits for tiered generation; each is far below the single
+# get_recipe call's 2000 because every call only writes part of the recipe.
+CORE_RECIPE_MAX_TOKENS = 700
+RECIPE_ENRICHMENT_MAX_TOKENS = 1200
+
+async def get_core_recipe_arguments(messages,
+                                    model="gpt-4.1-mini-2025-04-14",
+                                    temperature=0.7) -> dict:
+    """Generate only the core recipe (``CoreRecipeParams``) for the request in ``messages``."""
+    return await _get_tool_arguments(
+        messages,
+        model,
+        temperature,
+        tool_name="get_core_recipe",
+        tool_description="Get the core drink recipe: name, ingredients, steps, glass and garnish.",
+        params_model=CoreRecipeParams,
+        max_tokens=CORE_RECIPE_MAX_TOKENS,
+        policy="recipe_core",
+    )
+
+async def get_recipe_enrichment(core_recipe: dict,
+                                section: str,
+                                model="gpt-4.1-mini-2025-04-14",
+                                temperature=0.7) -> dict:
+    """Generate one enrichment section (see ``RECIPE_ENRICHMENT_SECTIONS``) for a core recipe."""
+    params_model = RECIPE_ENRICHMENT_SECTIONS[section]
+    core = {field: core_recipe.get(field) for field in CoreRecipeParams.model_fields}
+    user_query = f"""
+    I want you to act like the world's most important bartender.
+    Here is the recipe for {core.get("drink_name")}:
+    {json.dumps(core)}
+    Add the following to it: {params_model.__doc__}
+    """
+    arguments = await _get_tool_arguments(
+        [{"role": "user", "content": user_query}],
+        model,
+        temperature,
+        tool_name=f"get_recipe_{section}",
+        tool_description=params_model.__doc__,
+        params_model=params_model,
+        max_tokens=RECIPE_ENRICHMENT_MAX_TOKENS,
+        policy="recipe_enrichment",
+    )
+    # Never let an enrichment overwrite the core recipe
+    return {field: value for field, value in arguments.items() if field in params_model.model_fields}
+
+async def enrich_recipe_arguments(core_recipe: dict, sections: List[str]) -> Dict[str, dict]:
+    """Generate enrichment sections concurrently. Sections that fail are left out of the result."""
+    results = await asyncio.gather(
+        *(get_recipe_enrichment(core_recipe, section) for section in sections),
+        return_exceptions=True,
+    )
+    enrichments = {}
+    for section, result in zip(sections, results):
+        if isinstance(result, Exception):
+            logging.error(f"Recipe enrichment {section} failed: {result}")
         else:
-            raise OpenAIAPIException(500, "unknown_openai_error", str(e), None)
+            enrichments[section] = result
+    return enrichments
+
+async def stream_recipe_fields(messages,
+                               model="gpt-4.1-mini-2025-04-14",
+                               temperature=0.7) -> AsyncGenerator[Tuple[str, Any], None]:
+    """Stream the ``get_recipe`` tool call, yielding ``(field, value)`` as each field completes.
+
+    Fields arrive in the order the model writes them. When the stream ends
+    every top-level field of the arguments has been yielded, so the pairs
+    make up the full arguments for ``parse_recipe_arguments``.
+    """
+    if async_client is None:
+        raise Exception("OpenAI async client not initialized. Please set OPENAI_API_KEY environment variable.")
+    parser = IncrementalObjectParser()
+    try:
+        request = _recipe_completion_request(messages, model, temperature)
+        stream = await call_policies["recipe_stream"].call(
+            lambda: openai_scheduler.create(async_client.chat.completions.create, **request, stream=True)
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            for tool_call in chunk.choices[0].delta.tool_calls or []:
+                # Only the first tool call carries the recipe
+                if tool_call.index != 0 or not tool_call.function or not tool_call.function.arguments:
+                    continue
+                for field in parser.feed(tool_call.function.arguments):
+                    yield field
+    except json.JSONDecodeError as e:
+        logging.error(f"JSON decode error in streamed arguments: {e}")
+        raise OpenAIAPIException(500, "unknown_openai_error", f"Invalid JSON response from OpenAI: {e}", None)
+    except Exception as e:
+        raise _completion_error(e)
+    if not parser.text.strip():
+        raise OpenAIAPIException(400, "missing_function_call", "OpenAI did not return a function call", None)
+    if not parser.done:
+        raise OpenAIAPIException(500, "unknown_openai_error", "OpenAI function call arguments were incomplete", None)
@@ -0,0 +1,83 @@
+"""Rule-driven local compiler for image prompts.
+
+Ingredient and equipment images normally get their prompt rewritten by an
+LLM (``_build_food_photography_prompt``) before generation, which adds a
+full chat completion to every uncached image. ``PromptCompiler`` builds an
+equivalent prompt locally instead, from a JSON rules file:
+
+* ``categories.<category>.templates`` maps an ingredient class (from
+  ``INGREDIENT_CATEGORIES``, when ``classify_with`` is
+  ``ingredient_categories``) or ``default`` to a subject template;
+* ``categories.<category>.setting`` describes the scene;
+* ``ingredient_keywords`` adds keywords to ``INGREDIENT_CATEGORIES``;
+* ``version`` identifies the rule set.
+
+The compiled prompt is the subject template, the setting and the
+category's ``STYLE_CONSTANTS`` entry. Edit the rules file, or point
+``PROMPT_RULES_PATH`` at another one, to change prompts without code
+changes. ``PROMPT_COMPILER_CATEGORIES`` lists the categories that use
+compiled prompts; the others keep their LLM-refined prompts.
+"""
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPT_RULES_PATH = os.path.join(os.path.dirname(__file__), "prompt_rules.json")
+PROMPT_RULES_PATH = os.getenv("PROMPT_RULES_PATH", DEFAULT_PROMPT_RULES_PATH)
+PROMPT_COMPILER_CATEGORIES = {
+    c.strip() for c in os.getenv("PROMPT_COMPILER_CATEGORIES", "ingredients,equipment").split(",") if c.strip()
+}
+
+
+class PromptCompiler:
+    """Compiles image prompts from rules, ingredient classes and style constants."""
+
+    def __init__(
+        self,
+        rules: Dict[str, Any],
+        ingredient_categories: Dict[str, List[str]],
+        style_constants: Dict[str, str],
+        enabled_categories: Optional[Set[str]] = None,
+    ):
+        self.rules = rules
+        self.version = rules.get("version", 0)
+        self.style_constants = style_constants
+        self.enabled_categories = PROMPT_COMPILER_CATEGORIES if enabled_categories is None else enabled_categories
+        # Rule keywords extend the built-in ones, checked after them
+        self.ingredient_categories = {name: list(keywords) for name, keywords in ingredient_categories.items()}
+        for name, keywords in rules.get("ingredient_keywords", {}).items():
+            self.ingredient_categories.setdefault(name, []).extend(keywords)
+
+    @classmethod
+    def from_file(cls, path: str, ingredient_categories: Dict[str, List[str]], style_constants: Dict[str, str], **kwargs) -> "PromptCompiler":
+        try:
+            with open(path) as f:
+                rules = json.load(f)
+        except (OSError, ValueError) as e:
+            # Without rules nothing is compiled and every category keeps its LLM prompt
+            logger.error(f"Could not load prompt rules from {path}: {e}")
+            rules = {}
+        return cls(rules, ingredient_categories, style_constants, **kwargs)
+
+    def compiles(self, category: str) -> bool:
+        """Whether prompts for ``category`` are compiled locally."""
+        return category in self.enabled_categories and category in self.rules.get("categories", {})
+
+    def classify(self, subject: str) -> str:
+        subject_lower = subject.lower()
+        for name, keywords in self.ingredient_categories.items():
+            if any(keyword in subject_lower for keyword in keywords):
+                return name
+        return "default"
+
+    def compile(self, subject: str, category: str) -> str:
+        """Build the image prompt for ``subject`` from the category's rules."""
+        category_rules = self.rules["categories"][category]
+        templates = category_rules.get("templates", {})
+        template_name = self.classify(subject) if category_rules.get("classify_with") == "ingredient_categories" else "default"
+        template = templates.get(template_name) or templates.get("default", "{subject}")
+        parts = [template.format(subject=subject.strip()), category_rules.get("setting"), self.style_constants.get(category)]
+        return ", ".join(part for part in parts if part)
@@ -0,0 +1,133 @@
+"""Persistent memo cache for prompt-refinement LLM calls.
+
+``_build_food_photography_prompt`` and ``_build_method_prompt`` rewrite an
+input description with a chat completion before an image is generated. The
+rewrite only depends on the model, the system prompt and the input, so
+``PromptMemo`` stores each result under a key built from the model, a
+prompt version and the normalized input. Lookups go through an in-process
+LRU first and then the ``prompt_memo`` MongoDB collection, so the rewrite
+survives restarts and is shared between workers. Bump the version passed
+by the caller whenever its system prompt changes, so old rewrites are no
+longer used.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .concurrency import SingleFlight
+from ..database.config import get_mongo_collection
+
+logger = logging.getLogger(__name__)
+
+PROMPT_MEMO_COLLECTION = os.getenv("PROMPT_MEMO_COLLECTION", "prompt_memo")
+PROMPT_MEMO_MAX_ENTRIES = int(os.getenv("PROMPT_MEMO_MAX_ENTRIES", "4096"))
+
+
+def normalize_prompt_input(value: Any) -> str:
+    """Canonical text for a refinement input: lower case with whitespace collapsed."""
+    text = value if isinstance(value, str) else json.dumps(value, sort_keys=True)
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def prompt_memo_key(kind: str, model: str, version: int, value: Any) -> str:
+    key_input = json.dumps([kind, model, version, normalize_prompt_input(value)])
+    return hashlib.sha256(key_input.encode()).hexdigest()
+
+
+class PromptMemo:
+    """Two-tier (LRU, then MongoDB) memo of refined prompts."""
+
+    def __init__(self, max_entries: int = PROMPT_MEMO_MAX_ENTRIES, collection_name: str = PROMPT_MEMO_COLLECTION):
+        self.max_entries = max_entries
+        self.collection_name = collection_name
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        # Concurrent misses for the same input share one LLM call
+        self._flight = SingleFlight("prompt_memo")
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, prompt: str) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = prompt
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key: str) -> Optional[str]:
+        try:
+            async with get_mongo_collection(self.collection_name) as collection:
+                doc = await collection.find_one({"key": key}, projection={"_id": 0, "prompt": 1})
+                return doc.get("prompt") if doc else None
+        except Exception as e:
+            logger.warning(f"Could not read prompt memo {key}: {e}")
+            return None
+
+    async def _store(self, key: str, kind: str, model: str, version: int, prompt: str) -> None:
+        try:
+            async with get_mongo_collection(self.collection_name) as collection:
+                await collection.update_one(
+                    {"key": key},
+                    {"$set": {
+                        "key": key,
+                        "kind": kind,
+                        "model": model,
+                        "version": version,
+                        "prompt": prompt,
+                        "created_at": datetime.now(timezone.utc),
+                    }},
+                    upsert=True,
+                )
+        except Exception as e:
+            logger.warning(f"Could not save prompt memo {key}: {e}")
+
+    async def get_or_create(
+        self, kind: str, model: str, version: int, value: Any, refine: Callable[[], Awaitable[str]]
+    ) -> str:
+        """Return the memoized refinement of ``value``, calling ``refine`` only on a miss."""
+        key = prompt_memo_key(kind, model, version, value)
+        prompt = self._entries.get(key)
+        if prompt is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return prompt
+
+        async def load_or_refine() -> str:
+            stored = await self._load(key)
+            if stored is not None:
+                self.db_hits += 1
+                self._remember(key, stored)
+                return stored
+            self.misses += 1
+            refined = await refine()
+            self._remember(key, refined)
+            await self._store(key, kind, model, version, refined)
+            return refined
+
+        return await self._flight.do(key, load_or_refine)
+
+    async def ensure_indexes(self) -> None:
+        try:
+            async with get_mongo_collection(self.collection_name) as collection:
+                await collection.create_index("key", unique=True, name="key_unique")
+        except Exception as e:
+            logger.warning(f"Could not create prompt memo index: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "coalesced_hits": self._flight.coalesced_hits,
+        }
+
+
+prompt_memo = PromptMemo()
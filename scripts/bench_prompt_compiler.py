@@ -0,0 +1,71 @@
+"""Benchmark compiled prompts against LLM-refined prompts.
+
+Times PromptCompiler.compile for a set of ingredient and equipment subjects
+and, with ``--live``, the ``_build_food_photography_prompt`` chat
+completion it replaces (needs OPENAI_API_KEY; the prompt memo is bypassed).
+The difference is the latency saved before each uncached image starts
+generating.
+
+Usage:
+    python scripts/bench_prompt_compiler.py [--repeat 1000] [--live] [--live-samples 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mixologist.services.openai_service import _build_food_photography_prompt, prompt_compiler
+
+SUBJECTS = [
+    ("Bourbon", "ingredients"),
+    ("Lime", "ingredients"),
+    ("Simple Syrup", "ingredients"),
+    ("Angostura Bitters", "ingredients"),
+    ("Egg White", "ingredients"),
+    ("Cinnamon", "ingredients"),
+    ("Soda Water", "ingredients"),
+    ("Prosecco", "ingredients"),
+    ("Cocktail Shaker", "equipment"),
+    ("Hawthorne Strainer", "equipment"),
+]
+
+
+async def time_llm(samples: int) -> list:
+    seconds = []
+    for subject, category in SUBJECTS[:samples]:
+        started_at = time.perf_counter()
+        await _build_food_photography_prompt(subject, category, memoize=False)
+        seconds.append(time.perf_counter() - started_at)
+    return seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=1000, help="Compilations per subject")
+    parser.add_argument("--live", action="store_true", help="Also time the LLM refinement being replaced")
+    parser.add_argument("--live-samples", type=int, default=5, help="Subjects refined by the LLM with --live")
+    args = parser.parse_args()
+
+    print(f"prompt rules version {prompt_compiler.version}")
+    compile_seconds = []
+    for subject, category in SUBJECTS:
+        per_call = min(timeit.repeat(lambda: prompt_compiler.compile(subject, category), number=args.repeat, repeat=3)) / args.repeat
+        compile_seconds.append(per_call)
+        print(f"{category:>12} {subject:<20} {per_call * 1e6:8.2f} us")
+    compile_median = statistics.median(compile_seconds)
+    print(f"compiled prompt: median {compile_median * 1e6:.2f} us per image")
+
+    if args.live:
+        llm_seconds = asyncio.run(time_llm(args.live_samples))
+        llm_median = statistics.median(llm_seconds)
+        print(f"LLM-refined prompt: median {llm_median * 1000:.0f} ms per image over {len(llm_seconds)} calls")
+        print(f"latency saved: {(llm_median - compile_median) * 1000:.0f} ms per uncached image")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Benchmark SSE framing of partial image events.
+
+Compares the old framing (json.dumps of the event dict, an f-string, then
+Starlette encoding the str) with PayloadEventFrame, for base64 payloads of
+1-4 MB of image data.
+
+Usage:
+    python scripts/bench_sse_framing.py [--repeat 50]
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mixologist.services.sse import PARTIAL_IMAGE_FRAME
+
+
+def json_framing(b64_data: str) -> bytes:
+    sse_event = {"type": "partial_image", "b64_data": b64_data}
+    return f"data: {json.dumps(sse_event)}\n\n".encode("utf-8")
+
+
+def payload_framing(b64_data: str) -> int:
+    return sum(len(frame) for frame in PARTIAL_IMAGE_FRAME.frames(b64_data))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50, help="Events framed per measurement")
+    args = parser.parse_args()
+
+    print(f"{'image MB':>8} {'b64 MB':>7} {'json ms':>8} {'frame ms':>9} {'speedup':>8}")
+    for megabytes in (1, 2, 3, 4):
+        b64_data = base64.b64encode(os.urandom(megabytes * 1024 * 1024)).decode("ascii")
+        json_seconds = min(timeit.repeat(lambda: json_framing(b64_data), number=args.repeat, repeat=3)) / args.repeat
+        frame_seconds = min(timeit.repeat(lambda: payload_framing(b64_data), number=args.repeat, repeat=3)) / args.repeat
+        print(
+            f"{megabytes:>8} {len(b64_data) / 1e6:>7.2f} {json_seconds * 1000:>8.3f} "
+            f"{frame_seconds * 1000:>9.3f} {json_seconds / frame_seconds:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import hashlib
+from datetime import datetime, timezone
+
+import pytest
+
+from mixologist.database import backup
+
+
+async def _records(count):
+    for index in range(count):
+        yield {"cache_key": f"key{index}", "recipe_data": {"drink_name": f"Drink {index}"}}
+
+
+@pytest.mark.asyncio
+async def test_ndjson_roundtrip_in_batches(tmp_path):
+    path = str(tmp_path / "recipes.ndjson.gz")
+    assert await backup.write_ndjson(path, _records(5)) == 5
+    assert not os.path.exists(path + ".tmp")
+
+    batches = list(backup.read_ndjson_batches(path, batch_size=2))
+    assert [lines for lines, _ in batches] == [2, 4, 5]
+    assert [record["cache_key"] for _, batch in batches for record in batch] == [f"key{i}" for i in range(5)]
+
+    resumed = list(backup.read_ndjson_batches(path, batch_size=2, skip=4))
+    assert resumed == [(5, [{"cache_key": "key4", "recipe_data": {"drink_name": "Drink 4"}}])]
+    assert list(backup.read_ndjson_batches(path, batch_size=2, skip=5)) == []
+
+
+def test_image_backup_entry_roundtrip():
+    data = b"\x89PNG\r\n\x1a\nimage"
+    stored_at = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    doc = {
+        "_id": "abc",
+        "cache_key": "garnish_lime",
+        "category": "garnish",
+        "data": data,
+        "byte_size": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "hit_count": 4,
+        "stored_at": stored_at,
+    }
+    entry = backup.image_backup_entry(doc, data)
+    assert set(entry) == {"cache_key", "category", "sha256", "stored_at", "data"}
+
+    restored, restored_data = backup.decode_image_backup_entry(entry)
+    assert restored_data == data
+    assert restored == {"cache_key": "garnish_lime", "category": "garnish", "stored_at": stored_at}
+
+    entry["sha256"] = "0" * 64
+    with pytest.raises(ValueError):
+        backup.decode_image_backup_entry(entry)
+
+
+@pytest.mark.asyncio
+async def test_import_resumes_from_checkpoint(tmp_path, monkeypatch):
+    await backup.write_ndjson(backup.backup_path(str(tmp_path), "recipes"), _records(5))
+    imported = []
+
+    async def fake_import(batch):
+        imported.extend(record["cache_key"] for record in batch)
+        return len(batch), 0
+
+    monkeypatch.setitem(backup.IMPORTERS, "recipes", fake_import)
+    backup.save_checkpoint(str(tmp_path), {"recipes": 3})
+    summary = await backup.import_backup(str(tmp_path), datasets=("recipes",), batch_size=10)
+
+    assert imported == ["key3", "key4"]
+    assert summary["recipes"]["inserted"] == 2
+    assert backup.load_checkpoint(str(tmp_path)) == {"recipes": 5}
+
+
+class RacingImageCollection:
+    """Enough of a Motor collection for image import; another writer stores one key mid-batch."""
+
+    def __init__(self, raced_key):
+        self.docs = {}
+        self.raced_key = raced_key
+
+    def find(self, query, projection=None):
+        docs = [{"cache_key": key} for key in query["cache_key"]["$in"] if key in self.docs]
+
+        async def cursor():
+            for doc in docs:
+                yield doc
+
+        return cursor()
+
+    async def bulk_write(self, operations, ordered=True):
+        self.docs[self.raced_key] = {"cache_key": self.raced_key, "gridfs_id": "blob-other-writer"}
+        upserted_ids = {}
+        for index, operation in enumerate(operations):
+            key = operation._filter["cache_key"]
+            if key not in self.docs:
+                self.docs[key] = operation._doc["$setOnInsert"]
+                upserted_ids[index] = key
+        return type("Result", (), {"upserted_ids": upserted_ids, "upserted_count": len(upserted_ids)})()
+
+
+@pytest.mark.asyncio
+async def test_image_import_deletes_blobs_of_keys_stored_meanwhile(monkeypatch):
+    from contextlib import asynccontextmanager
+
+    data = b"\x89PNG\r\n\x1a\nimage"
+    stored_at = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    batch = [
+        backup.image_backup_entry(
+            {"cache_key": key, "category": "cocktail", "sha256": hashlib.sha256(data).hexdigest(), "stored_at": stored_at},
+            data,
+        )
+        for key in ("cocktail_a", "cocktail_b")
+    ]
+    collection = RacingImageCollection(raced_key="cocktail_b")
+    deleted = []
+
+    @asynccontextmanager
+    async def fake_collection():
+        yield collection
+
+    async def fake_fields(cache_key, data):
+        return {"gridfs_id": f"blob-{cache_key}", "byte_size": len(data)}, {}
+
+    async def fake_delete(gridfs_id):
+        deleted.append(gridfs_id)
+
+    monkeypatch.setattr(backup, "get_mongo_collection", fake_collection)
+    monkeypatch.setattr(backup, "build_image_storage_fields", fake_fields)
+    monkeypatch.setattr(backup, "delete_gridfs_blob", fake_delete)
+
+    assert await backup.import_image_batch(batch) == (1, 0)
+    assert deleted == ["blob-cocktail_b"]
+    assert collection.docs["cocktail_a"]["gridfs_id"] == "blob-cocktail_a"
+    assert collection.docs["cocktail_b"]["gridfs_id"] == "blob-other-writer"
@@ -0,0 +1,67 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import pytest
+
+from mixologist.services import catalog_prewarm
+from mixologist.services.openai_service import generate_specialized_cache_key
+
+
+RECIPES = [
+    {
+        "ingredients": [{"name": "Fresh Lime Juice", "quantity": "1 oz"}, {"name": "Gin", "quantity": "2 oz"}],
+        "serving_glass": "Coupe",
+        "garnish": ["Lime wheel"],
+        "equipment_needed": [{"item": "Shaker", "essential": True}],
+    },
+    {
+        "ingredients": ["Gin", "Simple Syrup"],
+        "serving_glass": "coupe",
+        "garnish": "Lime wheel",
+        "equipment_needed": ["Shaker", "Jigger"],
+    },
+]
+
+
+def test_catalog_items_match_route_cache_keys():
+    items = catalog_prewarm.catalog_items_from_recipes(RECIPES)
+    keys = {item.cache_key for item in items}
+
+    assert len(items) == len(keys) == 7
+    assert generate_specialized_cache_key("Lime Juice", "ingredients", "", "ingredient") in keys
+    assert generate_specialized_cache_key("Syrup", "ingredients", "", "ingredient") in keys
+    assert generate_specialized_cache_key("coupe glass", "glassware", "", "glassware") in keys
+    assert generate_specialized_cache_key("Lime wheel", "garnish", "", "garnish") in keys
+    assert generate_specialized_cache_key("Jigger", "equipment", "", "equipment") in keys
+
+
+@pytest.mark.asyncio
+async def test_prewarmer_generates_only_missing_images(monkeypatch):
+    items = catalog_prewarm.catalog_items_from_recipes(RECIPES)
+    cached = {items[-1].cache_key}
+    generated = []
+
+    async def fake_exists(cache_key):
+        return cache_key in cached
+
+    async def fake_stream(subject, category, additional_context="", cache_prefix=""):
+        if subject == "Jigger":
+            raise RuntimeError("content policy")
+        generated.append((category, subject))
+        yield "partial"
+
+    monkeypatch.setattr(catalog_prewarm.image_store, "exists", fake_exists)
+    monkeypatch.setattr(catalog_prewarm, "generate_specialized_image_stream", fake_stream)
+
+    progress = await catalog_prewarm.CatalogPrewarmer().run(rate_per_minute=0, concurrency=3, items=items)
+
+    assert progress["state"] == "completed"
+    assert progress["total"] == 7
+    assert progress["processed"] == 7
+    assert progress["already_cached"] == 1
+    assert progress["generated"] == 5
+    assert progress["failed"] == 1
+    assert len(generated) == 5
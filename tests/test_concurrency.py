@@ -0,0 +1,188 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import pytest
+
+from mixologist.services.concurrency import SingleFlight, StreamBroadcaster, merge_streams
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight("test")
+    calls = 0
+    release = asyncio.Event()
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"drink_name": "Negroni"}
+
+    waiters = [asyncio.create_task(flight.do("recipe_abc", work)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert flight.waiter_counts() == {"recipe_abc": 5}
+
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert calls == 1
+    assert all(r == {"drink_name": "Negroni"} for r in results)
+    assert flight.stats()["executions"] == 1
+    assert flight.stats()["coalesced_hits"] == 4
+    assert flight.waiter_counts() == {}
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors_and_allows_retry():
+    flight = SingleFlight("test")
+
+    async def failing():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await flight.do("key", failing)
+
+    async def succeeding():
+        return 42
+
+    assert await flight.do("key", succeeding) == 42
+    assert flight.executions == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_leader_cancellation():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "done"
+
+    leader = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+
+    assert flight.waiter_counts() == {"key": 2}
+    leader.cancel()
+    await asyncio.sleep(0)
+    # The disconnected leader no longer counts as waiting
+    assert flight.waiter_counts() == {"key": 1}
+    release.set()
+
+    assert await follower == "done"
+
+
+@pytest.mark.asyncio
+async def test_stream_broadcaster_replays_and_shares_upstream():
+    broadcaster = StreamBroadcaster("test")
+    upstream_runs = 0
+    gate = asyncio.Event()
+
+    async def upstream():
+        nonlocal upstream_runs
+        upstream_runs += 1
+        yield "partial-0"
+        await gate.wait()
+        yield "partial-1"
+
+    async def collect(stream):
+        return [item async for item in stream]
+
+    first = asyncio.create_task(collect(broadcaster.subscribe("cocktail_abc", upstream)))
+    await asyncio.sleep(0.01)
+    late = asyncio.create_task(collect(broadcaster.subscribe("cocktail_abc", upstream)))
+    await asyncio.sleep(0.01)
+    gate.set()
+
+    assert await first == ["partial-0", "partial-1"]
+    assert await late == ["partial-0", "partial-1"]
+    assert upstream_runs == 1
+    assert broadcaster.stats()["shared_subscriptions"] == 1
+    assert broadcaster.stats()["in_flight"] == {}
+
+
+@pytest.mark.asyncio
+async def test_stream_broadcaster_counts_only_current_subscribers():
+    broadcaster = StreamBroadcaster("test")
+    gate = asyncio.Event()
+
+    async def upstream():
+        yield "partial-0"
+        await gate.wait()
+        yield "partial-1"
+
+    for _ in range(3):
+        stream = broadcaster.subscribe("k", upstream)
+        assert await stream.__anext__() == "partial-0"
+        await stream.aclose()  # the client disconnected after one item
+
+    reader = broadcaster.subscribe("k", upstream)
+    assert await reader.__anext__() == "partial-0"
+    assert broadcaster.stats()["in_flight"] == {"k": 1}
+    gate.set()
+    assert [item async for item in reader] == ["partial-1"]
+
+
+@pytest.mark.asyncio
+async def test_stream_broadcaster_propagates_upstream_errors():
+    broadcaster = StreamBroadcaster("test")
+
+    async def upstream():
+        yield "partial-0"
+        raise RuntimeError("content policy")
+
+    received = []
+    with pytest.raises(RuntimeError):
+        async for item in broadcaster.subscribe("key", upstream):
+            received.append(item)
+    assert received == ["partial-0"]
+
+
+@pytest.mark.asyncio
+async def test_merge_streams_interleaves_and_reports_failures():
+    async def slow():
+        await asyncio.sleep(0.02)
+        yield "slow-0"
+
+    async def fast():
+        yield "fast-0"
+        yield "fast-1"
+
+    async def broken():
+        raise RuntimeError("upstream down")
+        yield  # pragma: no cover
+
+    merged = [m async for m in merge_streams([("slow", slow), ("fast", fast), ("broken", broken)], 3)]
+
+    items = [m.item for m in merged if not m.done]
+    assert items.index("fast-1") < items.index("slow-0")
+    finished = {m.tag: m.error for m in merged if m.done}
+    assert set(finished) == {"slow", "fast", "broken"}
+    assert isinstance(finished["broken"], RuntimeError)
+    assert finished["fast"] is None
+
+
+@pytest.mark.asyncio
+async def test_merge_streams_respects_concurrency_cap():
+    running = 0
+    peak = 0
+
+    def make_source():
+        async def source():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            yield "image"
+            running -= 1
+        return source
+
+    sources = [(i, make_source()) for i in range(6)]
+    merged = [m async for m in merge_streams(sources, 2)]
+
+    assert peak == 2
+    assert len([m for m in merged if m.done]) == 6
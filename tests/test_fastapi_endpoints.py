@@ -1,10 +1,11 @@
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import json
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock, Mock
 from httpx import AsyncClient, ASGITransport
-from mixologist.fastapi_app import app
+from mixologist.fastapi_app import app, generate_recipe_cache_key
 import openai
 import httpx
 
@@ -109,4 +110,286 @@ class TestRecipeNamesEndpoint:
         async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
             resp = await ac.get("/recipes/names")
             assert resp.status_code == 500
-            assert "Error getting recipe names" in resp.text 
\ No newline at end of file
+            assert "Error getting recipe names" in resp.text 
+
+
+@pytest.mark.asyncio
+async def test_generate_recipe_visuals_sends_cached_components_first(monkeypatch):
+    async def fake_cached_image(cache_key):
+        return "cached-glass" if cache_key.startswith("glassware_") else None
+
+    async def fake_cocktail_stream(**kwargs):
+        yield "cocktail-partial"
+
+    async def fake_specialized_stream(subject, category, additional_context="", cache_prefix=""):
+        yield f"{category}-partial"
+
+    monkeypatch.setattr("mixologist.fastapi_app.get_cached_image", fake_cached_image)
+    monkeypatch.setattr("mixologist.fastapi_app.generate_image_stream", fake_cocktail_stream)
+    monkeypatch.setattr("mixologist.fastapi_app.generate_specialized_image_stream", fake_specialized_stream)
+
+    recipe = {
+        "drink_name": "Negroni",
+        "drink_image_description": "A negroni",
+        "ingredients": [{"name": "Gin", "quantity": "1 oz"}],
+        "serving_glass": "Rocks",
+    }
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.post(
+            "/generate_recipe_visuals",
+            data={"recipe_data": json.dumps(recipe), "image_types": "cocktail,ingredients,glassware"},
+        )
+
+    events = [json.loads(line[len("data: "):]) for line in resp.text.split("\n\n") if line.startswith("data: ")]
+    assert events[0]["type"] == "glassware_image"
+    assert events[0]["b64_data"] == "cached-glass"
+    assert {e["type"] for e in events[1:-1]} == {"cocktail_image", "ingredient_image"}
+    complete = events[-1]
+    assert complete["type"] == "all_complete"
+    assert complete["timings"]["glassware"]["cached"] is True
+    assert complete["timings"]["cocktail"]["cached"] is False
+    assert set(complete["timings"]) == {"cocktail", "ingredient_0", "glassware"}
+
+
+@pytest.mark.asyncio
+async def test_get_image_bytes_supports_etag_and_range(monkeypatch):
+    record = {
+        "cache_key": "cocktail_abc",
+        "category": "cocktail",
+        "data": b"\x89PNG\r\n\x1a\n0123456789",
+        "byte_size": 18,
+        "content_type": "image/png",
+        "sha256": "deadbeef",
+    }
+    monkeypatch.setattr(
+        "mixologist.fastapi_app.MongoDBImageService.get_image_record",
+        AsyncMock(side_effect=lambda key: record if key == "cocktail_abc" else None),
+    )
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        full = await ac.get("/images/cocktail_abc")
+        assert full.status_code == 200
+        assert full.content == record["data"]
+        assert full.headers["content-type"] == "image/png"
+        assert full.headers["etag"] == '"deadbeef"'
+        assert "immutable" in full.headers["cache-control"]
+
+        not_modified = await ac.get("/images/cocktail_abc", headers={"If-None-Match": '"deadbeef"'})
+        assert not_modified.status_code == 304
+
+        partial = await ac.get("/images/cocktail_abc", headers={"Range": "bytes=8-11"})
+        assert partial.status_code == 206
+        assert partial.content == b"0123"
+        assert partial.headers["content-range"] == "bytes 8-11/18"
+
+        suffix = await ac.get("/images/cocktail_abc", headers={"Range": "bytes=-2"})
+        assert suffix.content == b"89"
+
+        unsatisfiable = await ac.get("/images/cocktail_abc", headers={"Range": "bytes=100-"})
+        assert unsatisfiable.status_code == 416
+
+        missing = await ac.get("/images/cocktail_missing")
+        assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_images_by_category_pages_metadata(monkeypatch, tmp_path):
+    from mixologist.services.image_store import LocalImageStore
+
+    store = LocalImageStore(str(tmp_path))
+    for index in range(5):
+        await store.put(f"garnish_{index}", "garnish", b"\x89PNG\r\n\x1a\n" + bytes([index]))
+    await store.put("garnish_0_thumb_96", "garnish", b"RIFF", variant_of="garnish_0", variant="thumb_96")
+    monkeypatch.setattr("mixologist.fastapi_app.image_store", store)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = (await ac.get("/images/by_category/garnish", params=params)).json()
+            assert page["count"] <= 2
+            seen.extend(image["cache_key"] for image in page["images"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == [f"garnish_{index}" for index in range(5)]
+
+        first = (await ac.get("/images/by_category/garnish", params={"limit": 1})).json()["images"][0]
+        assert first["url"] == "/images/garnish_0"
+        assert first["byte_size"] == 9
+        assert "b64_data" not in first
+
+        bad_cursor = await ac.get("/images/by_category/garnish", params={"cursor": "%%%"})
+        assert bad_cursor.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_generate_method_images_tags_events_by_step(monkeypatch):
+    generated = []
+
+    async def fake_cached_step_images(step_texts):
+        return {1: "Y2FjaGVk"}
+
+    async def fake_method_stream(step_text, step_index, **kwargs):
+        assert kwargs["check_cache"] is False
+        generated.append(step_index)
+        yield "bmV3"
+
+    monkeypatch.setattr("mixologist.fastapi_app.get_cached_step_images", fake_cached_step_images)
+    monkeypatch.setattr("mixologist.fastapi_app.generate_method_image_stream", fake_method_stream)
+
+    steps = ["Shake hard with ice", "Strain into a coupe", "Shake again"]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/generate_method_images", data={"steps": json.dumps(steps)})
+        events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+        bad = await ac.post("/generate_method_images", data={"steps": "not json"})
+        assert bad.status_code == 400
+
+    # Both "shake" steps canonicalize to the same image, so it is generated once
+    assert generated == [0]
+    assert events[0] == {"type": "partial_image", "step_index": 1, "b64_data": "Y2FjaGVk"}
+    images = {event["step_index"]: event["b64_data"] for event in events if event["type"] == "partial_image"}
+    assert images == {0: "bmV3", 1: "Y2FjaGVk", 2: "bmV3"}
+    completed = [event["step_index"] for event in events if event["type"] == "step_complete"]
+    assert sorted(completed) == [0, 1, 2]
+    assert events[-1]["type"] == "stream_complete"
+    assert events[-1]["cached_steps"] == 1
+
+
+@pytest.mark.asyncio
+async def test_create_stream_sends_fields_then_cached_recipe(monkeypatch):
+    saved = {}
+
+    async def no_cached_recipe(cache_key):
+        return None
+
+    async def fake_fields(messages):
+        assert "Gimlet" in messages[-1]["content"]
+        yield "drink_name", "Gimlet"
+        yield "ingredients", [{"name": "Gin", "quantity": "2 oz"}]
+        yield "rim", False
+
+    async def fake_save(cache_key, recipe_data):
+        saved[cache_key] = recipe_data
+
+    monkeypatch.setattr("mixologist.fastapi_app.get_cached_recipe", no_cached_recipe)
+    monkeypatch.setattr("mixologist.fastapi_app.stream_recipe_fields", fake_fields)
+    monkeypatch.setattr("mixologist.fastapi_app.save_recipe_to_cache", fake_save)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/create/stream", data={"drink_query": "Gimlet"})
+    events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert [(event["type"], event.get("field")) for event in events] == [
+        ("recipe_field", "drink_name"),
+        ("recipe_field", "ingredients"),
+        ("recipe_field", "rim"),
+        ("recipe_complete", None),
+    ]
+    recipe = events[-1]["recipe"]
+    assert recipe["drink_name"] == "Gimlet"
+    assert recipe["rim"] == "No salt"
+    assert list(saved.values()) == [recipe]
+
+
+@pytest.mark.asyncio
+async def test_core_recipe_then_lazy_enrichment(monkeypatch):
+    cache = {}
+    enrichment_calls = []
+
+    async def fake_get_cached(cache_key):
+        return cache.get(cache_key)
+
+    async def fake_save(cache_key, recipe_data):
+        cache[cache_key] = recipe_data
+
+    async def fake_core(messages):
+        return {
+            "drink_name": "Gimlet",
+            "ingredients": [{"name": "Gin", "quantity": "2 oz"}],
+            "alcohol_content": 0.25,
+            "steps": ["Shake", "Strain"],
+            "rim": False,
+            "garnish": ["Lime wheel"],
+            "serving_glass": "Coupe",
+            "drink_image_description": "A pale green drink",
+        }
+
+    async def fake_enrich(core_recipe, sections):
+        enrichment_calls.append(sections)
+        assert core_recipe["drink_name"] == "Gimlet"
+        results = {"background": {"drink_history": "Navy surgeons", "related_cocktails": ["Gin Rickey"]}}
+        return {section: results[section] for section in sections if section in results}
+
+    monkeypatch.setattr("mixologist.fastapi_app.get_cached_recipe", fake_get_cached)
+    monkeypatch.setattr("mixologist.fastapi_app.save_recipe_to_cache", fake_save)
+    monkeypatch.setattr("mixologist.fastapi_app.get_core_recipe_arguments", fake_core)
+    monkeypatch.setattr("mixologist.fastapi_app.enrich_recipe_arguments", fake_enrich)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        missing = await ac.post("/recipes/enrich", data={"drink_query": "Gimlet"})
+        core = await ac.post("/create/core", data={"drink_query": "Gimlet"})
+        unknown = await ac.post("/recipes/enrich", data={"drink_query": "Gimlet", "sections": "gossip"})
+        enriched = await ac.post("/recipes/enrich", data={"drink_query": "Gimlet", "sections": "background,technique"})
+
+    assert missing.status_code == 404
+    assert unknown.status_code == 400
+    assert core.json()["serving_glass"] == "Coupe"
+    assert core.json()["enrichment_pending"] == ["background", "technique", "pairings"]
+
+    recipe = enriched.json()
+    assert enrichment_calls == [["background", "technique"]]
+    assert recipe["drink_history"] == "Navy surgeons"
+    assert recipe["steps"] == ["Shake", "Strain"]
+    # The failed technique section stays pending
+    assert recipe["enrichment_pending"] == ["technique", "pairings"]
+    assert list(cache.values()) == [recipe]
+
+
+@pytest.mark.asyncio
+async def test_create_stream_completes_cached_core_recipe(monkeypatch):
+    cache = {}
+
+    async def fake_get_cached(cache_key):
+        return cache.get(cache_key)
+
+    async def fake_save(cache_key, recipe_data):
+        cache[cache_key] = recipe_data
+
+    async def fake_enrich(core_recipe, sections):
+        return {
+            "background": {"drink_history": "Navy surgeons"},
+            "technique": {"preparation_time_minutes": 3},
+            "pairings": {"food_pairings": ["Oysters"]},
+        }
+
+    async def no_streaming(messages):
+        raise AssertionError("a cached recipe must not be generated again")
+        yield
+
+    cache_key = generate_recipe_cache_key("Gimlet")
+    cache[cache_key] = {
+        "drink_name": "Gimlet",
+        "ingredients": [{"name": "Gin", "quantity": "2 oz"}],
+        "steps": ["Shake", "Strain"],
+        "serving_glass": "Coupe",
+        "enrichment_pending": ["background", "technique", "pairings"],
+    }
+    monkeypatch.setattr("mixologist.fastapi_app.get_cached_recipe", fake_get_cached)
+    monkeypatch.setattr("mixologist.fastapi_app.save_recipe_to_cache", fake_save)
+    monkeypatch.setattr("mixologist.fastapi_app.enrich_recipe_arguments", fake_enrich)
+    monkeypatch.setattr("mixologist.fastapi_app.stream_recipe_fields", no_streaming)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/create/stream", data={"drink_query": "Gimlet"})
+    events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+    assert [event.get("field") for event in events[:-1]] == ["drink_name", "ingredients", "steps", "serving_glass"]
+    assert events[-1]["type"] == "recipe_complete"
+    recipe = events[-1]["recipe"]
+    assert recipe["drink_history"] == "Navy surgeons"
+    assert recipe["food_pairings"] == ["Oysters"]
+    assert recipe["enrichment_pending"] == []
+    assert cache[cache_key] == recipe
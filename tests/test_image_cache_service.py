@@ -0,0 +1,171 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import base64
+import hashlib
+import pytest
+from bson import Binary
+
+from mixologist.services import image_cache_service as ics
+
+PNG_BYTES = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAAAAAA6fptVAAAAC0lEQVR4nGMAAQAABQABDQottAAAAABJRU5ErkJggg=="
+)
+
+
+def test_detect_image_content_type():
+    assert ics.detect_image_content_type(PNG_BYTES) == "image/png"
+    assert ics.detect_image_content_type(b"\xff\xd8\xff\xe0rest") == "image/jpeg"
+    assert ics.detect_image_content_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert ics.detect_image_content_type(b"not an image") == "application/octet-stream"
+
+
+@pytest.mark.asyncio
+async def test_build_image_storage_fields_inline():
+    fields, unset = await ics.build_image_storage_fields("cocktail_abc", PNG_BYTES)
+    assert fields["data"] == Binary(PNG_BYTES)
+    assert fields["byte_size"] == len(PNG_BYTES)
+    assert fields["sha256"] == hashlib.sha256(PNG_BYTES).hexdigest()
+    assert fields["content_type"] == "image/png"
+    assert set(unset) == {"gridfs_id", "b64_data"}
+
+
+@pytest.mark.asyncio
+async def test_read_image_bytes_handles_binary_and_legacy_documents():
+    assert await ics.read_image_bytes({"data": Binary(PNG_BYTES)}) == PNG_BYTES
+    legacy = {"b64_data": base64.b64encode(PNG_BYTES).decode("ascii")}
+    assert await ics.read_image_bytes(legacy) == PNG_BYTES
+    assert await ics.read_image_bytes({}) is None
+
+
+def _record(cache_key, size):
+    return {
+        "cache_key": cache_key,
+        "category": ics.image_category(cache_key),
+        "data": PNG_BYTES + b"\0" * (size - len(PNG_BYTES)),
+        "byte_size": size,
+        "content_type": "image/png",
+        "sha256": "x",
+    }
+
+
+@pytest.mark.asyncio
+async def test_image_memory_cache_evicts_least_recently_used_by_bytes():
+    cache = ics.ImageMemoryCache(max_bytes=300, max_item_bytes=200)
+    await cache.put(_record("ingredients_a", 100))
+    await cache.put(_record("ingredients_b", 100))
+    await cache.get("ingredients_a")
+    await cache.put(_record("ingredients_c", 150))
+
+    assert await cache.get("ingredients_b") is None
+    assert (await cache.get("ingredients_a"))["byte_size"] == 100
+    stats = cache.stats()
+    assert stats["bytes"] == 250
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_image_memory_cache_admission_rules():
+    cache = ics.ImageMemoryCache(max_bytes=1000, max_item_bytes=200, categories=ics.parse_admitted_categories("ingredients, glassware"))
+    assert await cache.put(_record("ingredients_a", 100))
+    assert not await cache.put(_record("cocktail_a", 100))
+    assert not await cache.put(_record("glassware_big", 500))
+    assert cache.stats()["rejections"] == 2
+    assert ics.parse_admitted_categories("*") is None
+
+
+@pytest.mark.asyncio
+async def test_image_memory_cache_shares_disk_segment(tmp_path):
+    writer = ics.ImageMemoryCache(max_bytes=1000, max_item_bytes=500, disk_dir=str(tmp_path))
+    reader = ics.ImageMemoryCache(max_bytes=1000, max_item_bytes=500, disk_dir=str(tmp_path))
+    await writer.put(_record("garnish_a", 100))
+
+    record = await reader.get("garnish_a")
+    assert record["data"].startswith(PNG_BYTES)
+    assert record["content_type"] == "image/png"
+    assert reader.stats()["disk_hits"] == 1
+
+    writer.invalidate("garnish_a")
+    fresh = ics.ImageMemoryCache(max_bytes=1000, max_item_bytes=500, disk_dir=str(tmp_path))
+    assert await fresh.get("garnish_a") is None
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, n):
+        return [dict(doc) for doc in self.docs]
+
+
+class FakeImageCollection:
+    """Enough of a Motor collection for the binary migration; one document changes mid-run."""
+
+    def __init__(self, docs, changed_id):
+        self.docs = {doc["_id"]: dict(doc) for doc in docs}
+        self.changed_id = changed_id
+
+    def find(self, query, projection=None):
+        if "b64_data" in query:
+            after = query.get("_id", {}).get("$gt", -1)
+            return FakeCursor([doc for _, doc in sorted(self.docs.items()) if "b64_data" in doc and doc["_id"] > after])
+        return FakeCursor([doc for _id, doc in sorted(self.docs.items()) if _id in query["_id"]["$in"]])
+
+    async def bulk_write(self, operations, ordered=True):
+        # Another writer replaces one image between the read and the update
+        self.docs[self.changed_id]["b64_data"] = "changed"
+        modified = 0
+        for operation in operations:
+            doc = self.docs[operation._filter["_id"]]
+            if doc.get("b64_data") != operation._filter["b64_data"]:
+                continue
+            doc.update(operation._doc["$set"])
+            for field in operation._doc["$unset"]:
+                doc.pop(field, None)
+            modified += 1
+        return type("Result", (), {"modified_count": modified})()
+
+
+@pytest.mark.asyncio
+async def test_migration_deletes_gridfs_blobs_of_documents_changed_meanwhile(monkeypatch):
+    from contextlib import asynccontextmanager
+
+    from mixologist.database import migrate_images
+
+    b64 = base64.b64encode(PNG_BYTES).decode("ascii")
+    collection = FakeImageCollection([{"_id": 1, "cache_key": "cocktail_a", "b64_data": b64},
+                                      {"_id": 2, "cache_key": "cocktail_b", "b64_data": b64}], changed_id=2)
+    deleted = []
+
+    @asynccontextmanager
+    async def fake_collection():
+        yield collection
+
+    async def fake_fields(cache_key, data):
+        return {"gridfs_id": f"blob-{cache_key}", "byte_size": len(data)}, {"data": "", "b64_data": ""}
+
+    async def fake_delete(gridfs_id):
+        deleted.append(gridfs_id)
+
+    monkeypatch.setattr(migrate_images, "get_mongo_collection", fake_collection)
+    monkeypatch.setattr(migrate_images, "build_image_storage_fields", fake_fields)
+    monkeypatch.setattr(migrate_images, "delete_gridfs_blob", fake_delete)
+
+    summary = await migrate_images.migrate_images_to_binary(batch_size=10)
+
+    assert summary["migrated"] == 1
+    assert summary["orphaned_blobs_deleted"] == 1
+    assert deleted == ["blob-cocktail_b"]
+    assert collection.docs[1]["gridfs_id"] == "blob-cocktail_a"
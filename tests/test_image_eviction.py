@@ -0,0 +1,125 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from datetime import datetime
+
+import pytest
+
+from mixologist.services import image_cache_service as ics
+from mixologist.services.image_eviction import parse_category_quotas, plan_eviction
+
+
+def _doc(cache_key, size, day, hits=0, **extra):
+    return {
+        "cache_key": cache_key,
+        "category": cache_key.split("_")[0],
+        "byte_size": size,
+        "last_accessed_at": datetime(2026, 1, day),
+        "hit_count": hits,
+        **extra,
+    }
+
+
+DOCS = [
+    _doc("cocktail_old", 100, 1, hits=50),
+    _doc("cocktail_new", 100, 20, hits=1),
+    _doc("technique_mid", 100, 10, hits=5),
+    _doc("ingredients_lime", 100, 1),
+    _doc("cocktail_old@thumb_96", 10, 1, variant_of="cocktail_old"),
+]
+
+
+def _keys(victims):
+    return [doc["cache_key"] for doc in victims]
+
+
+def test_budget_evicts_coldest_unprotected_images_with_variants():
+    victims = plan_eviction(DOCS, budget_bytes=250, category_quotas={}, protected_categories={"ingredients"})
+    assert _keys(victims) == ["cocktail_old", "cocktail_old@thumb_96", "technique_mid"]
+
+
+def test_lfu_orders_by_hit_count():
+    victims = plan_eviction(DOCS, budget_bytes=350, category_quotas={}, protected_categories={"ingredients"}, policy="lfu")
+    assert _keys(victims) == ["cocktail_new"]
+
+
+def test_category_quota_only_trims_that_category():
+    victims = plan_eviction(DOCS, budget_bytes=0, category_quotas={"cocktail": 150, "ingredients": 0}, protected_categories={"ingredients"})
+    assert _keys(victims) == ["cocktail_old", "cocktail_old@thumb_96"]
+
+
+def test_nothing_evicted_within_budget():
+    assert plan_eviction(DOCS, budget_bytes=1000, category_quotas={}, protected_categories=set()) == []
+    with pytest.raises(ValueError):
+        plan_eviction(DOCS, 0, {}, set(), policy="random")
+    assert parse_category_quotas("cocktail:100, technique:50") == {"cocktail": 100, "technique": 50}
+
+
+@pytest.mark.asyncio
+async def test_access_tracker_batches_hits_into_one_update(monkeypatch):
+    written = []
+
+    class FakeCollection:
+        async def bulk_write(self, operations, ordered=True):
+            written.extend(operations)
+
+    class FakeContext:
+        async def __aenter__(self):
+            return FakeCollection()
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(ics, "get_mongo_collection", lambda *args: FakeContext())
+    tracker = ics.ImageAccessTracker(flush_interval=60, max_pending=100)
+    for _ in range(3):
+        tracker.record("ingredients_lime")
+    tracker.record("cocktail_abc")
+
+    assert await tracker.flush() == 2
+    updates = {op._filter["cache_key"]: op._doc for op in written}
+    assert updates["ingredients_lime"]["$inc"] == {"hit_count": 3}
+    assert "last_accessed_at" in updates["cocktail_abc"]["$max"]
+    assert await tracker.flush() == 0
+
+
+@pytest.mark.asyncio
+async def test_startup_skips_mongo_eviction_with_local_store(monkeypatch, tmp_path):
+    from mixologist import fastapi_app
+    from mixologist.services.image_store import LocalImageStore
+
+    async def noop(*args, **kwargs):
+        return False
+
+    monkeypatch.setattr(fastapi_app, "image_store", LocalImageStore(str(tmp_path)))
+    monkeypatch.setattr(fastapi_app, "initialize_app_database", noop)
+    monkeypatch.setattr(fastapi_app.prompt_memo, "ensure_indexes", noop)
+    monkeypatch.setattr(fastapi_app.openai_clients, "prewarm", noop)
+    monkeypatch.setattr("mixologist.services.image_eviction.IMAGE_STORAGE_BUDGET_BYTES", 1)
+
+    await fastapi_app.startup_event()
+
+    assert fastapi_app.image_eviction_sweeper._task is None
+    assert fastapi_app.image_access_tracker._task is None
+
+
+@pytest.mark.asyncio
+async def test_manual_sweep_refused_with_local_store(monkeypatch, tmp_path):
+    from httpx import ASGITransport, AsyncClient
+
+    from mixologist import fastapi_app
+    from mixologist.services.image_store import LocalImageStore
+
+    async def fail_sweep(*args, **kwargs):
+        raise AssertionError("swept the MongoDB collection")
+
+    monkeypatch.setattr(fastapi_app, "image_store", LocalImageStore(str(tmp_path)))
+    monkeypatch.setattr(fastapi_app.image_eviction_sweeper, "sweep", fail_sweep)
+
+    async with AsyncClient(transport=ASGITransport(app=fastapi_app.app), base_url="http://test") as client:
+        response = await client.post("/images/eviction/sweep", data={"dry_run": "true"})
+
+    assert response.status_code == 409
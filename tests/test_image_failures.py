@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from mixologist.services.image_failures import (
+    CircuitBreaker,
+    ImageGenerationGuard,
+    ImageGenerationUnavailable,
+    NegativeCache,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_negative_cache_backs_off_exponentially():
+    clock = FakeClock()
+    cache = NegativeCache(ttl_seconds=10, max_ttl_seconds=25, clock=clock)
+
+    assert cache.record_failure("img", "BadRequestError: rejected") == 10
+    reason, remaining = cache.check("img")
+    assert reason == "BadRequestError: rejected"
+    assert remaining == 10
+
+    clock.now += 10
+    assert cache.check("img") is None
+    assert cache.record_failure("img", "BadRequestError: rejected") == 20
+    assert cache.record_failure("img", "BadRequestError: rejected") == 25  # capped
+
+    cache.clear("img")
+    assert cache.check("img") is None
+    assert cache.record_failure("img", "again") == 10
+
+
+def test_negative_cache_forgets_after_quiet_period():
+    clock = FakeClock()
+    cache = NegativeCache(ttl_seconds=10, max_ttl_seconds=100, clock=clock)
+    cache.record_failure("img", "first")
+    cache.record_failure("img", "second")
+
+    clock.now += 20 + 100
+    assert cache.record_failure("img", "third") == 10
+
+
+def test_circuit_breaker_trips_and_recovers_through_one_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker("ingredients", window_seconds=60, min_requests=4, error_rate=0.5, cooldown_seconds=30, clock=clock)
+
+    for ok in (True, False, True):
+        breaker.record(ok)
+    assert breaker.state == "closed"
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.is_open()
+
+    clock.now += 30
+    assert breaker.allow()  # the probe
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.allow()
+    assert breaker.stats()["trips"] == 2
+
+
+def test_circuit_breaker_ignores_old_outcomes():
+    clock = FakeClock()
+    breaker = CircuitBreaker("garnish", window_seconds=60, min_requests=3, error_rate=0.5, clock=clock)
+    breaker.record(False)
+    breaker.record(False)
+    clock.now += 61
+    breaker.record(False)
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_failed_image_is_not_regenerated_while_blocked(monkeypatch):
+    from mixologist.services import openai_service
+
+    calls = []
+
+    async def rejecting_create(**kwargs):
+        calls.append(kwargs["input"])
+        raise ValueError("content policy violation")
+
+    async def no_cache(cache_key):
+        return None
+
+    guard = ImageGenerationGuard(NegativeCache(ttl_seconds=60), min_requests=100)
+    fake_client = types.SimpleNamespace(responses=types.SimpleNamespace(create=rejecting_create))
+    monkeypatch.setattr(openai_service, "async_client", fake_client)
+    monkeypatch.setattr(openai_service, "image_generation_guard", guard)
+    monkeypatch.setattr(openai_service, "get_cached_image", no_cache)
+
+    async def run():
+        return [chunk async for chunk in openai_service.generate_specialized_image_stream("Dragonfruit", "garnish", "", "garnish")]
+
+    with pytest.raises(ValueError):
+        await run()
+    await asyncio.sleep(0)  # let the finished broadcast unregister
+    with pytest.raises(ImageGenerationUnavailable) as excinfo:
+        await run()
+
+    assert len(calls) == 1
+    assert "content policy violation" in excinfo.value.reason
+    assert 0 < excinfo.value.retry_after <= 60
+    assert guard.stats()["negative_cache"]["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_method_image_falls_back_while_technique_breaker_open(monkeypatch):
+    from mixologist.services import openai_service
+
+    async def fail_prompt(*args, **kwargs):
+        raise AssertionError("no prompt should be refined while the breaker is open")
+
+    guard = ImageGenerationGuard(min_requests=1, error_rate=0.5, cooldown_seconds=30)
+    guard.breaker("technique").record(False)
+    monkeypatch.setattr(openai_service, "image_generation_guard", guard)
+    monkeypatch.setattr(openai_service, "_build_method_prompt", fail_prompt)
+
+    chunks = [
+        chunk
+        async for chunk in openai_service.generate_method_image_stream("Float the cream on top", 2, check_cache=False)
+    ]
+
+    assert chunks == [openai_service.DEFAULT_FALLBACK_ICON_B64]
@@ -0,0 +1,190 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+
+from mixologist.services import image_job_queue as ijq
+from mixologist.services.openai_service import (
+    generate_cache_key,
+    generate_specialized_cache_key,
+    normalize_image_ingredients,
+)
+
+
+@asynccontextmanager
+async def fake_session():
+    yield None
+
+
+async def collect_events(stream):
+    body = b"".join([bytes(chunk) async for chunk in stream])
+    return [json.loads(event[len(b"data: "):]) for event in body.split(b"\n\n") if event]
+
+
+@pytest.fixture(autouse=True)
+def no_database(monkeypatch):
+    monkeypatch.setattr(ijq, "get_db_session", fake_session)
+
+
+def test_image_job_cache_key_matches_stream_functions():
+    params = {"subject": "lime", "category": "ingredients", "cache_prefix": "ingredient"}
+    assert ijq.image_job_cache_key("specialized", params) == generate_specialized_cache_key("lime", "ingredients", "", "ingredient")
+
+    params = {"prompt": "A negroni", "drink_name": "Negroni", "ingredients": ["1 oz Gin"], "serving_glass": "Rocks"}
+    assert ijq.image_job_cache_key("cocktail", params) == generate_cache_key(
+        "A negroni", "Negroni", normalize_image_ingredients(["1 oz Gin"]), "Rocks"
+    )
+    with pytest.raises(ValueError):
+        ijq.image_job_cache_key("video", {})
+
+
+@pytest.mark.asyncio
+async def test_run_job_records_success_and_retry_backoff(monkeypatch):
+    finished = []
+
+    async def fake_finish(self, job_id, error=None, retry_delay_seconds=0):
+        finished.append((job_id, error, retry_delay_seconds))
+        return {"id": job_id}
+
+    async def fake_exists(cache_key):
+        return cache_key == "ingredients_ok"
+
+    async def fake_stream(subject, category, additional_context="", cache_prefix=""):
+        if subject == "broken":
+            raise RuntimeError("upstream down")
+        yield "partial"
+
+    monkeypatch.setattr(ijq.DatabaseService, "finish_image_job", fake_finish)
+    monkeypatch.setattr(ijq.image_store, "exists", fake_exists)
+    monkeypatch.setitem(ijq.IMAGE_JOB_KINDS, "specialized", fake_stream)
+    monkeypatch.setattr(ijq, "IMAGE_JOB_RETRY_BASE_SECONDS", 5)
+
+    queue = ijq.ImageJobQueue(workers=0)
+    base = {"kind": "specialized", "max_attempts": 3}
+    await queue.run_job({**base, "id": 1, "cache_key": "ingredients_ok", "attempts": 1,
+                         "params": {"subject": "lime", "category": "ingredients"}})
+    await queue.run_job({**base, "id": 2, "cache_key": "ingredients_bad", "attempts": 2,
+                         "params": {"subject": "broken", "category": "ingredients"}})
+    await queue.run_job({**base, "id": 3, "cache_key": "ingredients_missing", "attempts": 1,
+                         "params": {"subject": "lime", "category": "ingredients"}})
+
+    assert finished[0] == (1, None, 5)
+    assert finished[1] == (2, "RuntimeError: upstream down", 10)
+    assert finished[2][1] == "generation finished without an image"
+    assert queue.completed == 1
+    assert queue.failed_attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_job_reports_status_until_failure(monkeypatch):
+    statuses = iter(["queued", "running", "failed"])
+
+    async def fake_get_job(self, job_id):
+        return {"id": job_id, "status": next(statuses), "attempts": 1, "last_error": "content policy"}
+
+    async def no_cached_image(cache_key):
+        return None
+
+    monkeypatch.setattr(ijq.ImageJobQueue, "get_job", fake_get_job)
+    monkeypatch.setattr(ijq, "get_cached_image", no_cached_image)
+    monkeypatch.setattr(ijq, "IMAGE_JOB_POLL_SECONDS", 0)
+
+    queue = ijq.ImageJobQueue(workers=0)
+    events = await collect_events(queue.stream_job({"id": 7, "cache_key": "garnish_x"}))
+
+    assert [e.get("status") for e in events[:-1]] == ["queued", "running", "failed"]
+    assert events[-1] == {"type": "error", "job_id": 7, "message": "content policy"}
+
+
+@pytest.mark.asyncio
+async def test_stream_job_relays_live_generation(monkeypatch):
+    cached = {}
+
+    async def fake_cached_image(cache_key):
+        return cached.get(cache_key)
+
+    async def upstream():
+        yield "partial-0"
+        cached["garnish_x"] = "final"
+        yield "partial-1"
+
+    monkeypatch.setattr(ijq, "get_cached_image", fake_cached_image)
+    broadcaster = ijq.image_stream_broadcaster
+    live = broadcaster.subscribe("garnish_x", upstream)
+
+    queue = ijq.ImageJobQueue(workers=0)
+    events = await collect_events(queue.stream_job({"id": 8, "cache_key": "garnish_x"}))
+    assert [item async for item in live] == ["partial-0", "partial-1"]
+
+    assert [e["b64_data"] for e in events if e["type"] == "partial_image"] == ["partial-0", "partial-1", "final"]
+    assert events[-1]["type"] == "stream_complete"
+
+
+class SyncSession:
+    """Runs ``DatabaseService`` queries on a synchronous SQLite session."""
+
+    def __init__(self, session):
+        self.session = session
+
+    async def execute(self, *args, **kwargs):
+        return self.session.execute(*args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return self.session.get(*args, **kwargs)
+
+    async def commit(self):
+        self.session.commit()
+
+    async def rollback(self):
+        self.session.rollback()
+
+
+@pytest.mark.asyncio
+async def test_stopped_worker_releases_job_on_its_last_attempt(monkeypatch):
+    import asyncio
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from mixologist.database.models import ImageJob
+
+    engine = create_engine("sqlite://")
+    ImageJob.__table__.create(engine)
+    db = Session(engine)
+    db.add(ImageJob(id=1, cache_key="garnish_x", kind="specialized", status="queued", attempts=2, max_attempts=3,
+                    params=json.dumps({"subject": "lime", "category": "garnish"})))
+    db.commit()
+
+    @asynccontextmanager
+    async def sqlite_session():
+        yield SyncSession(db)
+
+    started = asyncio.Event()
+
+    async def hanging_stream(**params):
+        started.set()
+        await asyncio.sleep(60)
+        yield "partial"
+
+    monkeypatch.setattr(ijq, "get_db_session", sqlite_session)
+    monkeypatch.setitem(ijq.IMAGE_JOB_KINDS, "specialized", hanging_stream)
+
+    queue = ijq.ImageJobQueue(workers=0)
+    worker = asyncio.ensure_future(queue._worker("worker-1"))
+    await asyncio.wait_for(started.wait(), 5)
+    assert db.get(ImageJob, 1, populate_existing=True).attempts == 3  # claimed: this is its last attempt
+
+    worker.cancel()
+    await asyncio.gather(worker, return_exceptions=True)
+
+    job = db.get(ImageJob, 1, populate_existing=True)
+    assert job.status == "queued"
+    assert job.attempts == 2
+    assert job.worker_id is None
+    assert job.finished_at is None
@@ -0,0 +1,120 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import base64
+import hashlib
+import shutil
+
+import pytest
+
+from mixologist.services.image_store import LocalImageStore, MongoImageStore, create_image_store
+
+PNG_BYTES = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAAAAAA6fptVAAAAC0lEQVR4nGMAAQAABQABDQottAAAAABJRU5ErkJggg=="
+)
+
+
+@pytest.mark.asyncio
+async def test_local_store_roundtrip(tmp_path):
+    store = LocalImageStore(str(tmp_path))
+    assert await store.get("ingredients_lime") is None
+    assert not await store.exists("ingredients_lime")
+
+    assert await store.put("ingredients_lime", "ingredients", PNG_BYTES)
+    record = await store.get("ingredients_lime")
+    assert record["data"] == PNG_BYTES
+    assert record["content_type"] == "image/png"
+    assert (record["width"], record["height"]) == (1, 1)
+    assert record["byte_size"] == len(PNG_BYTES)
+    assert await store.exists("ingredients_lime")
+
+
+@pytest.mark.asyncio
+async def test_local_store_is_content_addressed(tmp_path):
+    store = LocalImageStore(str(tmp_path), gc_grace_seconds=0)
+    await store.put("ingredients_lime", "ingredients", PNG_BYTES)
+    await store.put("garnish_lime", "garnish", PNG_BYTES)
+
+    blobs = [name for _, _, names in os.walk(store.blob_dir) for name in names]
+    assert len(blobs) == 1
+    records = await store.get_many(["ingredients_lime", "garnish_lime", "missing"])
+    assert set(records) == {"ingredients_lime", "garnish_lime"}
+
+    assert await store.delete("ingredients_lime")
+    assert not await store.delete("ingredients_lime")
+    assert await store.collect_garbage() == 0
+    assert await store.delete("garnish_lime")
+    assert await store.collect_garbage() == 1
+
+
+@pytest.mark.asyncio
+async def test_local_store_lists_metadata_in_key_order(tmp_path):
+    store = LocalImageStore(str(tmp_path))
+    for key in ["cocktail_b", "ingredients_a", "cocktail_a", "cocktail_c"]:
+        await store.put(key, key.split("_")[0], PNG_BYTES + key.encode())
+
+    first_page = await store.list("cocktail", limit=2)
+    assert [entry["cache_key"] for entry in first_page] == ["cocktail_a", "cocktail_b"]
+    assert "data" not in first_page[0]
+    next_page = await store.list("cocktail", after=first_page[-1]["cache_key"], limit=2)
+    assert [entry["cache_key"] for entry in next_page] == ["cocktail_c"]
+    assert len(await store.list("all")) == 4
+
+    await store.put("cocktail_a_thumb_96", "cocktail", b"RIFF", variant_of="cocktail_a", variant="thumb_96")
+    assert len(await store.list("cocktail")) == 3
+    assert len(await store.list("cocktail", include_variants=True)) == 4
+
+
+@pytest.mark.asyncio
+async def test_local_store_gc_spares_in_flight_writes(tmp_path):
+    store = LocalImageStore(str(tmp_path), gc_grace_seconds=60)
+    await store.put("ingredients_lime", "ingredients", PNG_BYTES)
+    assert await store.delete("ingredients_lime")
+    blob_path = store.blob_path(hashlib.sha256(PNG_BYTES).hexdigest())
+    tmp_file = os.path.join(os.path.dirname(blob_path), ".tmp-partial")
+    open(tmp_file, "wb").close()
+    os.utime(tmp_file, (0, 0))
+
+    # Unreferenced but inside the grace period: a put may be about to claim it
+    assert await store.collect_garbage() == 0
+    os.utime(blob_path, (0, 0))
+    assert await store.collect_garbage() == 1
+    assert os.path.exists(tmp_file)
+
+    # Reusing an old unreferenced blob refreshes it
+    await store.put("garnish_lime", "garnish", PNG_BYTES)
+    await store.delete("garnish_lime")
+    os.utime(store.blob_path(hashlib.sha256(PNG_BYTES).hexdigest()), (0, 0))
+    await store.put("garnish_lime", "garnish", PNG_BYTES)
+    assert await store.collect_garbage() == 0
+    assert (await store.get("garnish_lime"))["data"] == PNG_BYTES
+
+
+@pytest.mark.asyncio
+async def test_local_store_list_reads_only_the_page(tmp_path, monkeypatch):
+    store = LocalImageStore(str(tmp_path))
+    for i in range(20):
+        await store.put(f"cocktail_{i:02d}", "cocktail", PNG_BYTES)
+    await store.put("cocktail_05", "garnish", PNG_BYTES)  # moves category
+
+    reads = []
+    read_entry = store._read_entry
+    monkeypatch.setattr(store, "_read_entry", lambda key: reads.append(key) or read_entry(key))
+    page = await store.list("cocktail", after="cocktail_03", limit=3)
+    assert [entry["cache_key"] for entry in page] == ["cocktail_04", "cocktail_06", "cocktail_07"]
+    assert reads == ["cocktail_04", "cocktail_06", "cocktail_07"]
+    assert [entry["cache_key"] for entry in await store.list("garnish")] == ["cocktail_05"]
+
+    # A store written before the index existed is indexed on open
+    shutil.rmtree(store.index_dir)
+    reopened = LocalImageStore(str(tmp_path))
+    assert len(await reopened.list("all")) == 20
+
+
+def test_create_image_store_backends():
+    assert isinstance(create_image_store("mongo"), MongoImageStore)
+    with pytest.raises(ValueError):
+        create_image_store("s3")
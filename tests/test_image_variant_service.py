@@ -0,0 +1,76 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import io
+import pytest
+from PIL import Image
+
+from mixologist.services import image_variant_service as ivs
+
+
+def _png(width, height):
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 40)).save(output, format="PNG")
+    return output.getvalue()
+
+
+def test_parse_variant_specs():
+    specs = ivs.parse_variant_specs("thumb_96:96:webp, full:0:PNG,")
+    assert specs["thumb_96"] == ivs.VariantSpec("thumb_96", 96, "webp")
+    assert specs["full"] == ivs.VariantSpec("full", 0, "png")
+    with pytest.raises(ValueError):
+        ivs.parse_variant_specs("thumb:96:gif")
+
+
+def test_avif_variants_are_opt_in_and_dropped_without_support(monkeypatch):
+    assert all(spec.format != "avif" for spec in ivs.parse_variant_specs(ivs.DEFAULT_IMAGE_VARIANTS).values())
+
+    specs = ivs.parse_variant_specs("thumb_96:96:webp,medium_512_avif:512:avif")
+    monkeypatch.setattr(ivs, "avif_supported", lambda: False)
+    assert list(ivs.drop_unsupported_variants(specs)) == ["thumb_96"]
+    monkeypatch.setattr(ivs, "avif_supported", lambda: True)
+    assert list(ivs.drop_unsupported_variants(specs)) == ["thumb_96", "medium_512_avif"]
+
+
+def test_render_variant_resizes_and_reencodes():
+    data = ivs.render_variant(_png(400, 200), 96, "webp")
+    with Image.open(io.BytesIO(data)) as image:
+        assert image.format == "WEBP"
+        assert image.size == (96, 48)
+
+
+def test_render_variant_keeps_size_when_unbounded():
+    data = ivs.render_variant(_png(40, 20), 0, "jpeg")
+    with Image.open(io.BytesIO(data)) as image:
+        assert image.format == "JPEG"
+        assert image.size == (40, 20)
+
+
+@pytest.mark.asyncio
+async def test_get_image_variant_record_renders_missing_variant(monkeypatch):
+    original = {"cache_key": "cocktail_abc", "category": "cocktail", "data": _png(300, 300)}
+    saved = {}
+
+    async def fake_get(cache_key):
+        return original if cache_key == "cocktail_abc" else None
+
+    async def fake_put(cache_key, category, data, **metadata):
+        saved[cache_key] = metadata
+        return True
+
+    async def render_inline(data, spec):
+        return ivs.render_variant(data, spec.max_size, spec.format)
+
+    monkeypatch.setattr(ivs.image_store, "get", fake_get)
+    monkeypatch.setattr(ivs.image_store, "put", fake_put)
+    monkeypatch.setattr(ivs, "render_variant_async", render_inline)
+    monkeypatch.setattr(ivs, "IMAGE_VARIANTS", ivs.parse_variant_specs("thumb_96:96:webp"))
+
+    record = await ivs.get_image_variant_record("cocktail_abc", "thumb_96")
+    assert record["content_type"] == "image/webp"
+    assert saved["cocktail_abc@thumb_96"] == {"variant_of": "cocktail_abc", "variant": "thumb_96"}
+    assert await ivs.get_image_variant_record("cocktail_abc", "unknown") is None
+    assert await ivs.get_image_variant_record("cocktail_missing", "thumb_96") is None
@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mixologist.services.json_stream import IncrementalObjectParser
+
+RECIPE_ARGUMENTS = {
+    "drink_name": "Corpse Reviver \"No. 2\"",
+    "ingredients": [{"name": "Gin", "quantity": "3/4 oz"}, {"name": "Lillet {Blanc}", "quantity": "3/4 oz"}],
+    "alcohol_content": 0.22,
+    "steps": ["Shake, then strain", "Rinse with absinthe \\ discard"],
+    "rim": False,
+    "flavor_profile": None,
+}
+
+
+def feed_in_chunks(parser, text, size):
+    fields = []
+    for start in range(0, len(text), size):
+        fields.extend(parser.feed(text[start:start + size]))
+    return fields
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 17, 1000])
+def test_fields_reported_once_complete(chunk_size):
+    parser = IncrementalObjectParser()
+    text = json.dumps(RECIPE_ARGUMENTS, indent=2)
+
+    fields = feed_in_chunks(parser, text, chunk_size)
+
+    assert fields == list(RECIPE_ARGUMENTS.items())
+    assert parser.done
+    assert parser.text == text
+
+
+def test_field_reported_before_object_closes():
+    parser = IncrementalObjectParser()
+
+    assert parser.feed('{"drink_name": "Negr') == []
+    assert parser.feed('oni", "steps": ["Stir"') == [("drink_name", "Negroni")]
+    assert parser.feed(", \"Strain\"]") == []
+    assert parser.feed("}") == [("steps", ["Stir", "Strain"])]
+
+
+def test_invalid_value_raises():
+    parser = IncrementalObjectParser()
+    with pytest.raises(ValueError):
+        parser.feed('{"alcohol_content": 0.2.1,')
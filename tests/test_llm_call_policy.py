@@ -0,0 +1,144 @@
+import asyncio
+import os
+import random
+import sys
+import types
+
+import httpx
+import openai
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from mixologist.services.llm_call_policy import CallPolicy, is_retryable
+from mixologist.services.openai_error_handling import OpenAIAPIException
+
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+def test_is_retryable_uses_openai_error_classification():
+    assert is_retryable(connection_error())
+    assert is_retryable(OpenAIAPIException(429, "rate_limit_error", "slow down"))
+    assert not is_retryable(OpenAIAPIException(400, "invalid_request_error", "bad"))
+    assert not is_retryable(ValueError("not an API error"))
+
+
+@pytest.mark.asyncio
+async def test_retryable_errors_are_retried_with_backoff():
+    policy = CallPolicy("test", deadline_seconds=5, max_attempts=3, base_delay_seconds=0.01, hedge=False, rng=random.Random(1))
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise connection_error()
+        return "ok"
+
+    assert await policy.call(flaky) == "ok"
+    assert len(attempts) == 3
+    stats = policy.stats()
+    assert stats["retries"] == 2
+    assert stats["wins"] == {"attempt_3_primary": 1}
+    assert stats["errors"] == {"APIConnectionError": 2}
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_fail_at_once():
+    policy = CallPolicy("test", deadline_seconds=5, base_delay_seconds=0.01, hedge=False)
+    attempts = []
+
+    async def rejected():
+        attempts.append(1)
+        raise OpenAIAPIException(400, "invalid_request_error", "bad request")
+
+    with pytest.raises(OpenAIAPIException):
+        await policy.call(rejected)
+    assert len(attempts) == 1
+    assert policy.stats()["failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_covers_all_attempts():
+    policy = CallPolicy("test", deadline_seconds=0.05, hedge=False)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    with pytest.raises(OpenAIAPIException) as excinfo:
+        await policy.call(hang)
+    assert excinfo.value.status_code == 504
+    assert excinfo.value.error_type == "timeout_error"
+    assert policy.stats()["deadline_exceeded"] == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_attempt_is_hedged_and_loser_cancelled():
+    policy = CallPolicy("test", deadline_seconds=5, hedge=True, hedge_min_samples=3)
+    policy.latencies.extend([0.01, 0.01, 0.01])
+    started = []
+    cancelled = []
+
+    async def request():
+        index = len(started)
+        started.append(index)
+        try:
+            # The first request hits the slow tail; the hedge is fast
+            await asyncio.sleep(10 if index == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+        return index
+
+    assert await policy.call(request) == 1
+    await asyncio.sleep(0)
+    assert cancelled == [0]
+    stats = policy.stats()
+    assert stats["hedges"] == 1
+    assert stats["wins"] == {"attempt_1_hedge": 1}
+
+
+@pytest.mark.asyncio
+async def test_no_hedging_until_enough_samples():
+    policy = CallPolicy("test", deadline_seconds=5, hedge=True, hedge_min_samples=3)
+    policy.latencies.extend([0.01, 0.01])
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    assert await policy.call(request) == "ok"
+    assert len(calls) == 1
+    assert policy.hedge_delay() is not None  # the third sample warms it up
+
+
+@pytest.mark.asyncio
+async def test_recipe_completion_is_retried(monkeypatch):
+    from mixologist.services import openai_service
+
+    policy = CallPolicy("recipe", deadline_seconds=5, base_delay_seconds=0.01, hedge=False)
+    attempts = []
+
+    async def fake_create(**kwargs):
+        attempts.append(kwargs["model"])
+        if len(attempts) == 1:
+            raise connection_error()
+        message = types.SimpleNamespace(
+            tool_calls=[types.SimpleNamespace(function=types.SimpleNamespace(arguments='{"drink_name": "Negroni"}'))]
+        )
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    fake_client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=fake_create)))
+    monkeypatch.setattr(openai_service, "async_client", fake_client)
+    monkeypatch.setitem(openai_service.call_policies, "recipe", policy)
+
+    arguments = await openai_service._get_tool_arguments([{"role": "user", "content": "Negroni"}], "gpt-4o-mini", 0)
+
+    assert arguments["drink_name"] == "Negroni"
+    assert len(attempts) == 2
+    assert policy.stats()["wins"] == {"attempt_2_primary": 1}
@@ -0,0 +1,82 @@
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from mixologist.services.openai_client import OpenAIClientFactory, PoolStats
+
+
+def test_services_share_one_async_client():
+    from mixologist.services import inventory_service, openai_service
+    from mixologist.services.openai_client import openai_clients
+
+    assert openai_service.async_client is openai_clients.async_client()
+    assert inventory_service.async_client is openai_service.async_client
+    assert inventory_service.client is openai_service.client
+
+
+def test_client_is_built_once_with_tuned_pool():
+    factory = OpenAIClientFactory(max_connections=10, max_keepalive_connections=5, keepalive_expiry=30, http2=False)
+
+    client = factory.async_client()
+
+    assert factory.async_client() is client
+    assert client.max_retries == 0
+    stats = factory.stats()
+    assert stats["max_connections"] == 10
+    assert stats["max_keepalive_connections"] == 5
+    assert stats["keepalive_expiry_seconds"] == 30
+    assert stats["http2"] is False
+
+
+def test_no_client_without_api_key(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY")
+    factory = OpenAIClientFactory(http2=False)
+    assert factory.async_client() is None
+    assert factory.sync_client() is None
+
+
+@pytest.mark.asyncio
+async def test_prewarm_opens_connections_to_api_host():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(404)
+
+    factory = OpenAIClientFactory(http2=False, transport=httpx.MockTransport(handler))
+
+    assert await factory.prewarm(connections=3) == 3
+    assert [request.method for request in requests] == ["HEAD"] * 3
+    assert str(requests[0].url).startswith(str(factory.async_client().base_url).rstrip("/"))
+    assert "authorization" not in requests[0].headers
+    assert factory.stats()["requests"] == 3
+    await factory.aclose()
+
+
+@pytest.mark.asyncio
+async def test_prewarm_failures_are_not_raised():
+    def handler(request):
+        raise httpx.ConnectError("unreachable", request=request)
+
+    factory = OpenAIClientFactory(http2=False, transport=httpx.MockTransport(handler))
+
+    assert await factory.prewarm(connections=2) == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_count_new_connections_by_http_version():
+    class NetworkStream:
+        pass
+
+    stats = PoolStats(max_connections=10)
+    first, second = NetworkStream(), NetworkStream()
+    for stream, version in ((first, "HTTP/2"), (first, "HTTP/2"), (second, "HTTP/1.1")):
+        await stats.on_response(httpx.Response(200, extensions={"network_stream": stream, "http_version": version.encode()}))
+
+    assert stats.stats()["connections_opened"] == {"HTTP/2": 1, "HTTP/1.1": 1}
@@ -0,0 +1,238 @@
+import asyncio
+import os
+import sys
+import types
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from mixologist.services.openai_scheduler import (
+    BACKGROUND_LANE,
+    FIRST_IMAGE_LANE,
+    ModelLimiter,
+    OpenAIScheduler,
+    openai_scheduling,
+    parse_reset_duration,
+)
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration("20ms") == pytest.approx(0.02)
+    assert parse_reset_duration("1.5s") == 1.5
+    assert parse_reset_duration("6m0s") == 360
+    assert parse_reset_duration("2") == 2
+    assert parse_reset_duration(None) is None
+    assert parse_reset_duration("soon") is None
+
+
+class Gate:
+    """A fake ``create`` that records call order and blocks until released."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs["tag"])
+        await self.release.wait()
+        return kwargs["tag"]
+
+
+@pytest.mark.asyncio
+async def test_interactive_lane_is_served_before_queued_background_work():
+    scheduler = OpenAIScheduler(max_concurrency=1, background_share=1.0)
+    gate = Gate()
+
+    async def call(tag, lane=None, min_lane=None):
+        with openai_scheduling(lane=lane):
+            return await scheduler.create(gate.create, min_lane=min_lane, model="gpt-4o", tag=tag)
+
+    tasks = [asyncio.create_task(call("running", lane=BACKGROUND_LANE))]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(call("prefetch", lane=BACKGROUND_LANE)))
+    tasks.append(asyncio.create_task(call("image", min_lane=FIRST_IMAGE_LANE)))
+    tasks.append(asyncio.create_task(call("recipe")))
+    await asyncio.sleep(0)
+
+    queued = scheduler.stats()["gpt-4o"]["queued_by_lane"]
+    assert queued == {"interactive": 1, "first_image": 1, "background": 1}
+
+    gate.release.set()
+    assert await asyncio.gather(*tasks) == ["running", "prefetch", "image", "recipe"]
+    assert gate.calls == ["running", "recipe", "image", "prefetch"]
+    assert scheduler.stats()["gpt-4o"]["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_background_work_cannot_take_every_slot():
+    limiter = ModelLimiter("gpt-4o", max_concurrency=4, background_share=0.5)
+    for _ in range(2):
+        await limiter.acquire(BACKGROUND_LANE, "prewarm", 10)
+    blocked = asyncio.create_task(limiter.acquire(BACKGROUND_LANE, "prewarm", 10))
+    await asyncio.sleep(0)
+    assert not blocked.done()
+
+    await asyncio.wait_for(limiter.acquire("interactive", "user", 10), 1)
+    limiter.release(BACKGROUND_LANE)
+    await asyncio.wait_for(blocked, 1)
+
+
+@pytest.mark.asyncio
+async def test_flows_in_a_lane_are_served_round_robin():
+    limiter = ModelLimiter("gpt-4o", max_concurrency=1)
+    await limiter.acquire("interactive", "busy", 10)
+    order = []
+
+    async def acquire(flow, tag):
+        await limiter.acquire("interactive", flow, 10)
+        order.append(tag)
+        limiter.release("interactive")
+
+    tasks = [asyncio.create_task(acquire("busy", f"busy{i}")) for i in range(3)]
+    tasks.append(asyncio.create_task(acquire("quiet", "quiet")))
+    await asyncio.sleep(0)
+    limiter.release("interactive")
+    await asyncio.gather(*tasks)
+
+    assert order == ["busy0", "quiet", "busy1", "busy2"]
+
+
+@pytest.mark.asyncio
+async def test_spent_budget_holds_requests_until_reset():
+    limiter = ModelLimiter("gpt-4o", max_concurrency=4)
+    limiter.update_from_headers(
+        httpx.Headers({"x-ratelimit-remaining-requests": "1", "x-ratelimit-reset-requests": "50ms"}), 200
+    )
+    await limiter.acquire("interactive", "user", 10)
+    limiter.release("interactive")
+
+    held = asyncio.create_task(limiter.acquire("interactive", "user", 10))
+    await asyncio.sleep(0.01)
+    assert not held.done()
+    await asyncio.wait_for(held, 1)
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_response_pauses_the_model():
+    limiter = ModelLimiter("gpt-4o", max_concurrency=4)
+    limiter.update_from_headers(httpx.Headers({"retry-after-ms": "50"}), 429)
+    assert limiter.stats()["rate_limited"] == 1
+
+    held = asyncio.create_task(limiter.acquire("interactive", "user", 10))
+    await asyncio.sleep(0.01)
+    assert not held.done()
+    await asyncio.wait_for(held, 1)
+
+
+@pytest.mark.asyncio
+async def test_response_hook_updates_the_model_of_the_current_request():
+    scheduler = OpenAIScheduler(max_concurrency=2)
+    response = httpx.Response(
+        200, headers={"x-ratelimit-remaining-tokens": "5000", "x-ratelimit-reset-tokens": "6m0s"}
+    )
+
+    async def create(**kwargs):
+        await scheduler.record_response(response)
+        return "ok"
+
+    await scheduler.create(create, model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}], max_tokens=100)
+    await scheduler.record_response(response)  # outside a scheduled call: ignored
+
+    assert scheduler.stats()["gpt-4o-mini"]["remaining_tokens"] == 5000
+    assert "default" not in scheduler.stats()
+
+
+@pytest.mark.asyncio
+async def test_streaming_call_holds_slot_until_consumed():
+    scheduler = OpenAIScheduler(max_concurrency=1)
+
+    async def chunks():
+        for chunk in ("a", "b"):
+            yield chunk
+
+    async def create(**kwargs):
+        return chunks()
+
+    stream = await scheduler.create(create, model="gpt-image", stream=True)
+    assert scheduler.stats()["gpt-image"]["active"] == 1
+    assert [chunk async for chunk in stream] == ["a", "b"]
+    assert scheduler.stats()["gpt-image"]["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_call_and_cancelled_wait_release_their_slots():
+    scheduler = OpenAIScheduler(max_concurrency=1)
+
+    async def failing(**kwargs):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await scheduler.create(failing, model="gpt-4o")
+
+    gate = Gate()
+    running = asyncio.create_task(scheduler.create(gate.create, model="gpt-4o", tag="running"))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(scheduler.create(gate.create, model="gpt-4o", tag="cancelled"))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    gate.release.set()
+    assert await running == "running"
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    assert gate.calls == ["running"]
+    assert scheduler.stats()["gpt-4o"]["active"] == 0
+    assert scheduler.stats()["gpt-4o"]["queued_by_lane"]["interactive"] == 0
+
+
+@pytest.mark.asyncio
+async def test_recipe_completion_goes_through_scheduler(monkeypatch):
+    from mixologist.services import openai_service
+
+    scheduler = OpenAIScheduler(max_concurrency=1)
+    seen = {}
+
+    async def fake_create(**kwargs):
+        seen["active"] = scheduler.stats()[kwargs["model"]]["active"]
+        message = types.SimpleNamespace(
+            tool_calls=[types.SimpleNamespace(function=types.SimpleNamespace(arguments='{"drink_name": "Negroni"}'))]
+        )
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    fake_client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=fake_create)))
+    monkeypatch.setattr(openai_service, "async_client", fake_client)
+    monkeypatch.setattr(openai_service, "openai_scheduler", scheduler)
+
+    arguments = await openai_service._get_tool_arguments([{"role": "user", "content": "Negroni"}], "gpt-4o-mini", 0)
+
+    assert arguments["drink_name"] == "Negroni"
+    assert seen["active"] == 1
+    assert scheduler.stats()["gpt-4o-mini"]["granted_by_lane"]["interactive"] == 1
+
+
+@pytest.mark.asyncio
+async def test_flow_middleware_sets_client_flow_and_passes_messages_through():
+    from mixologist.services import openai_scheduler as scheduler_module
+
+    seen = []
+
+    async def inner(scope, receive, send):
+        seen.append(scheduler_module._flow.get())
+        await send({"type": "http.response.body", "body": b"frame"})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = scheduler_module.OpenAIFlowMiddleware(inner)
+    await middleware({"type": "http", "client": ("10.0.0.7", 5000)}, None, send)
+    await middleware({"type": "http", "client": None}, None, send)
+
+    assert seen == ["10.0.0.7", scheduler_module.DEFAULT_FLOW]
+    assert sent == [{"type": "http.response.body", "body": b"frame"}] * 2
+    assert scheduler_module._flow.get() == scheduler_module.DEFAULT_FLOW
@@ -113,3 +113,226 @@ def test_extract_visual_moments_blend():
     result = extract_visual_moments(step)
     assert result["action"] == "blend"
 
+
+
+@pytest.mark.asyncio
+async def test_get_cached_step_images_batches_lookups(monkeypatch):
+    from mixologist.services import openai_service
+
+    calls = []
+
+    async def fake_mappings(step_hashes):
+        calls.append(("mappings", step_hashes))
+        return {openai_service.step_image_hash("Stir gently"): "technique_stir"}
+
+    async def fake_get_many(cache_keys):
+        calls.append(("images", cache_keys))
+        return {"technique_stir": {"cache_key": "technique_stir", "data": b"img"}}
+
+    monkeypatch.setattr(openai_service, "get_step_image_mappings", fake_mappings)
+    monkeypatch.setattr(openai_service.image_store, "get_many", fake_get_many)
+
+    cached = await openai_service.get_cached_step_images(["Add ice", "Stir gently", "stir until cold"])
+
+    assert cached == {1: "aW1n", 2: "aW1n"}
+    assert [kind for kind, _ in calls] == ["mappings", "images"]
+
+
+def test_technique_library_keys_by_action_and_glass():
+    from mixologist.services import openai_service
+    from mixologist.services.catalog_prewarm import technique_library_items
+
+    assert openai_service.technique_library_key("Shake vigorously for 15 seconds") == "shake"
+    assert openai_service.technique_library_key("Double strain into a chilled coupe.") == "strain:coupe glass"
+    assert openai_service.technique_library_key("Salt the rim of a rocks glass") == "salt rim:rocks glass"
+    assert openai_service.technique_library_key("Garnish with a lime wheel") == "garnish:cocktail glass"
+    assert openai_service.technique_library_key("Add two dashes of bitters") is None
+
+    # The build command generates exactly the keys the method stream looks up
+    library_cache_keys = {openai_service.technique_library_cache_key(key) for key in openai_service.TECHNIQUE_LIBRARY}
+    assert {item.cache_key for item in technique_library_items()} == library_cache_keys
+
+
+@pytest.mark.asyncio
+async def test_method_stream_uses_library_subject_without_llm(monkeypatch):
+    from mixologist.services import openai_service
+
+    subjects = []
+
+    async def no_cache(step_text):
+        return None
+
+    async def fail_prompt(*args, **kwargs):
+        raise AssertionError("the prompt LLM should not be called for library techniques")
+
+    async def fake_specialized(subject, category, additional_context, cache_prefix):
+        subjects.append((subject, cache_prefix))
+        yield "aW1n"
+
+    async def fake_save_mapping(step_text, cache_key):
+        pass
+
+    monkeypatch.setattr(openai_service, "get_cached_step_image", no_cache)
+    monkeypatch.setattr(openai_service, "_build_method_prompt", fail_prompt)
+    monkeypatch.setattr(openai_service, "generate_specialized_image_stream", fake_specialized)
+    monkeypatch.setattr(openai_service, "save_step_image_mapping", fake_save_mapping)
+
+    chunks = [chunk async for chunk in openai_service.generate_method_image_stream("Stir until well chilled", 3)]
+
+    assert chunks == ["aW1n"]
+    assert subjects == [(openai_service.TECHNIQUE_LIBRARY["stir"], openai_service.TECHNIQUE_LIBRARY_PREFIX)]
+
+
+def _png_bytes(color):
+    import io
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGBA", (64, 64), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_infographic_composed_from_cached_components(monkeypatch):
+    import base64
+    import io
+    import types
+    from PIL import Image
+    from mixologist.services import openai_service
+    from mixologist.services.infographic_compositor import CANVAS_SIZE, render_infographic
+
+    requested = []
+    saved = {}
+
+    async def no_cache(cache_key):
+        return None
+
+    async def fake_get_many(cache_keys):
+        requested.append(cache_keys)
+        return {key: {"cache_key": key, "data": _png_bytes((200, 120, 40, 255))} for key in cache_keys}
+
+    async def local_compose(*args):
+        return render_infographic(*args)
+
+    async def fake_save(cache_key, b64_data):
+        saved[cache_key] = b64_data
+
+    async def fail_create(*args, **kwargs):
+        raise AssertionError("the image model should not be called when every component is cached")
+
+    fake_client = types.SimpleNamespace(responses=types.SimpleNamespace(create=fail_create))
+    monkeypatch.setattr(openai_service, "async_client", fake_client)
+    monkeypatch.setattr(openai_service, "INFOGRAPHIC_COMPOSITOR", True)
+    monkeypatch.setattr(openai_service, "get_cached_image", no_cache)
+    monkeypatch.setattr(openai_service.image_store, "get_many", fake_get_many)
+    monkeypatch.setattr(openai_service, "compose_infographic", local_compose)
+    monkeypatch.setattr(openai_service, "save_image_to_cache", fake_save)
+
+    chunks = [
+        chunk
+        async for chunk in openai_service.generate_image_stream(
+            "A whiskey sour",
+            "Whiskey Sour",
+            ingredients=["2 oz Bourbon", "0.75 oz Fresh Lemon Juice"],
+            serving_glass="Rocks",
+            steps=["Shake with ice", "Strain over fresh ice"],
+            garnish=["Lemon wheel"],
+        )
+    ]
+
+    assert len(chunks) == 1
+    assert list(saved.values()) == chunks
+    with Image.open(io.BytesIO(base64.b64decode(chunks[0]))) as image:
+        assert image.size == CANVAS_SIZE
+    # One batched lookup: two ingredients, the glass and the garnish
+    assert requested == [[
+        openai_service.generate_specialized_cache_key("Bourbon", "ingredients", "", "ingredient"),
+        openai_service.generate_specialized_cache_key("Lemon Juice", "ingredients", "", "ingredient"),
+        openai_service.generate_specialized_cache_key("rocks glass", "glassware", "", "glassware"),
+        openai_service.generate_specialized_cache_key("Lemon wheel", "garnish", "", "garnish"),
+    ]]
+
+
+@pytest.mark.asyncio
+async def test_infographic_not_composed_with_missing_component(monkeypatch):
+    from mixologist.services import openai_service
+
+    async def partial_get_many(cache_keys):
+        return {cache_keys[0]: {"cache_key": cache_keys[0], "data": _png_bytes((0, 0, 0, 255))}}
+
+    async def fail_compose(*args):
+        raise AssertionError("nothing should be composed without every component image")
+
+    monkeypatch.setattr(openai_service.image_store, "get_many", partial_get_many)
+    monkeypatch.setattr(openai_service, "compose_infographic", fail_compose)
+
+    composed = await openai_service.compose_cached_infographic(
+        "Daiquiri", [{"quantity": "2 oz", "name": "Rum"}], serving_glass="Coupe"
+    )
+
+    assert composed is None
+
+
+@pytest.mark.asyncio
+async def test_stream_recipe_fields_yields_fields_from_argument_deltas(monkeypatch):
+    import types
+    from mixologist.services import openai_service
+
+    arguments = json.dumps({"drink_name": "Gimlet", "steps": ["Shake", "Strain"], "rim": False})
+    requests = []
+
+    def chunk(fragment, index=0):
+        tool_call = types.SimpleNamespace(index=index, function=types.SimpleNamespace(arguments=fragment))
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(tool_calls=[tool_call]))])
+
+    async def fake_create(**kwargs):
+        requests.append(kwargs)
+
+        async def chunks():
+            for start in range(0, len(arguments), 5):
+                yield chunk(arguments[start:start + 5])
+
+        return chunks()
+
+    fake_client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=fake_create)))
+    monkeypatch.setattr(openai_service, "async_client", fake_client)
+
+    fields = [field async for field in openai_service.stream_recipe_fields([{"role": "user", "content": "Gimlet"}])]
+
+    assert fields == [("drink_name", "Gimlet"), ("steps", ["Shake", "Strain"]), ("rim", False)]
+    assert requests[0]["stream"] is True
+    assert requests[0]["tools"][0]["function"]["name"] == "get_recipe"
+    assert requests[0]["messages"][0]["role"] == "system"
+
+
+@pytest.mark.asyncio
+async def test_enrichment_sections_run_concurrently_and_keep_core_fields(monkeypatch):
+    import asyncio
+    import types
+    from mixologist.services import openai_service
+
+    started = []
+    release = asyncio.Event()
+
+    async def fake_create(**kwargs):
+        tool = kwargs["tools"][0]["function"]
+        started.append(tool["name"])
+        if len(started) == 3:
+            release.set()
+        await release.wait()
+        if tool["name"] == "get_recipe_pairings":
+            raise ValueError("upstream error")
+        # The model also repeats a core field, which must be dropped
+        arguments = {"drink_name": "Changed", "drink_history": "Old", "difficulty_rating": 2}
+        tool_call = types.SimpleNamespace(function=types.SimpleNamespace(arguments=json.dumps(arguments)))
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(tool_calls=[tool_call]))])
+
+    fake_client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=fake_create)))
+    monkeypatch.setattr(openai_service, "async_client", fake_client)
+
+    enrichments = await openai_service.enrich_recipe_arguments(
+        {"drink_name": "Gimlet", "steps": ["Shake"]}, ["background", "technique", "pairings"]
+    )
+
+    assert sorted(started) == ["get_recipe_background", "get_recipe_pairings", "get_recipe_technique"]
+    assert enrichments == {"background": {"drink_history": "Old"}, "technique": {"difficulty_rating": 2}}
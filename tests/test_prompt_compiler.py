@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import json
+
+from mixologist.services.openai_service import INGREDIENT_CATEGORIES, STYLE_CONSTANTS
+from mixologist.services.prompt_compiler import DEFAULT_PROMPT_RULES_PATH, PromptCompiler
+
+RULES = {
+    "version": 3,
+    "categories": {
+        "ingredients": {
+            "classify_with": "ingredient_categories",
+            "templates": {"spirits": "{subject} bottle", "default": "{subject}"},
+            "setting": "kitchen",
+        },
+    },
+    "ingredient_keywords": {"spirits": ["mezcal"]},
+}
+
+
+def test_compiles_from_rules_and_style_constants():
+    compiler = PromptCompiler(RULES, INGREDIENT_CATEGORIES, STYLE_CONSTANTS, enabled_categories={"ingredients", "equipment"})
+    assert compiler.version == 3
+    assert compiler.compile("Gin", "ingredients") == f"Gin bottle, kitchen, {STYLE_CONSTANTS['ingredients']}"
+    # Keywords from the rules extend INGREDIENT_CATEGORIES
+    assert compiler.compile("Mezcal", "ingredients").startswith("Mezcal bottle")
+    assert compiler.compile("Butterfly pea", "ingredients").startswith("Butterfly pea, kitchen")
+
+
+def test_toggle_requires_enabled_category_with_rules():
+    compiler = PromptCompiler(RULES, INGREDIENT_CATEGORIES, STYLE_CONSTANTS, enabled_categories={"equipment"})
+    assert not compiler.compiles("ingredients")
+    # Enabled, but there are no rules for it
+    assert not compiler.compiles("equipment")
+
+
+def test_bundled_rules_cover_ingredients_and_equipment(tmp_path):
+    compiler = PromptCompiler.from_file(DEFAULT_PROMPT_RULES_PATH, INGREDIENT_CATEGORIES, STYLE_CONSTANTS)
+    assert compiler.compiles("ingredients") and compiler.compiles("equipment")
+    assert "Campari" in compiler.compile("Campari", "ingredients")
+
+    missing = PromptCompiler.from_file(str(tmp_path / "missing.json"), INGREDIENT_CATEGORIES, STYLE_CONSTANTS)
+    assert not missing.compiles("ingredients")
+
+    with open(DEFAULT_PROMPT_RULES_PATH) as f:
+        assert json.load(f)["version"] >= 1
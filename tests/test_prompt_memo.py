@@ -0,0 +1,71 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import asyncio
+
+import pytest
+
+from mixologist.services.prompt_memo import PromptMemo, prompt_memo_key
+
+
+def _memo_with_fake_db(db):
+    memo = PromptMemo(max_entries=2)
+
+    async def load(key):
+        return db.get(key)
+
+    async def store(key, kind, model, version, prompt):
+        db[key] = prompt
+
+    memo._load = load
+    memo._store = store
+    return memo
+
+
+def test_key_normalizes_input_and_includes_version():
+    assert prompt_memo_key("food", "m", 1, "Fresh  Lime\n") == prompt_memo_key("food", "m", 1, "fresh lime")
+    assert prompt_memo_key("food", "m", 1, "lime") != prompt_memo_key("food", "m", 2, "lime")
+    assert prompt_memo_key("food", "m", 1, "lime") != prompt_memo_key("food", "other", 1, "lime")
+
+
+@pytest.mark.asyncio
+async def test_refines_once_then_serves_memory_and_db_tiers():
+    db = {}
+    calls = []
+
+    async def refine():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return "a lime on a cutting board"
+
+    memo = _memo_with_fake_db(db)
+    results = await asyncio.gather(*(memo.get_or_create("food", "m", 1, "Lime", refine) for _ in range(3)))
+    assert results == ["a lime on a cutting board"] * 3
+    assert len(calls) == 1
+    assert await memo.get_or_create("food", "m", 1, "lime", refine) == "a lime on a cutting board"
+    assert memo.stats()["memory_hits"] == 1
+
+    # A new process finds the rewrite in the database tier
+    restarted = _memo_with_fake_db(db)
+    assert await restarted.get_or_create("food", "m", 1, "Lime", refine) == "a lime on a cutting board"
+    assert len(calls) == 1
+    assert restarted.stats()["db_hits"] == 1
+
+    # A new prompt version refines again
+    await restarted.get_or_create("food", "m", 2, "Lime", refine)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_is_bounded():
+    memo = _memo_with_fake_db({})
+
+    async def refine():
+        return "prompt"
+
+    for value in ["a", "b", "c"]:
+        await memo.get_or_create("food", "m", 1, value, refine)
+    assert memo.stats()["entries"] == 2
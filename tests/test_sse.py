@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import base64
+import json
+
+from mixologist.services.sse import PARTIAL_IMAGE_FRAME, PayloadEventFrame, sse_event
+
+
+def test_payload_frame_matches_json_serialization():
+    payload = base64.b64encode(os.urandom(3000)).decode("ascii")
+    framed = b"".join(bytes(part) for part in PARTIAL_IMAGE_FRAME.frames(payload))
+    assert framed == sse_event({"type": "partial_image", "b64_data": payload})
+
+    frame = PayloadEventFrame(type="ingredient_image", ingredient_name="Crème de cassis", ingredient_index=2)
+    framed = b"".join(bytes(part) for part in frame.frames(payload.encode("ascii")))
+    assert framed.endswith(b"\n\n")
+    assert json.loads(framed[len(b"data: "):]) == {
+        "type": "ingredient_image",
+        "ingredient_name": "Crème de cassis",
+        "ingredient_index": 2,
+        "b64_data": payload,
+    }
+
+
+def test_payload_frame_without_other_fields():
+    framed = b"".join(bytes(part) for part in PayloadEventFrame("data").frames("QUJD"))
+    assert framed == b'data: {"data": "QUJD"}\n\n'